@@ -0,0 +1,177 @@
+"""
+Benchmarks of the regression fixtures, run with ``tox -e bench`` or ``pytest benchmarks``.
+
+Each benchmark creates the expected file of a check, then measures the check on the pass path
+(same data) and on the fail path (data with some differences), recording the wall time, the
+peak memory allocated (as traced by ``tracemalloc``) and the bytes written to disk.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+# Number of elements of the data checked by the benchmarks.
+SIZES = [10**i for i in range(2, 9)]
+
+# Width and height of the images checked by image_regression.
+IMAGE_SIZES = [(128, 128), (512, 512), (1024, 1024), (1920, 1080), (7680, 4320)]
+
+_results: list[dict[str, Any]] = []
+
+
+def pytest_addoption(parser: Any) -> None:
+    group = parser.getgroup("regressions benchmarks")
+    group.addoption(
+        "--bench-max-size",
+        type=float,
+        default=1e6,
+        help="Only run benchmarks with up to this number of elements (default: 1e6, the "
+        "largest size is 1e8).",
+    )
+    group.addoption(
+        "--bench-max-image-size",
+        type=int,
+        default=1920,
+        help="Only run image benchmarks with up to this width (default: 1920, the largest "
+        "size is 7680, an 8K image).",
+    )
+    group.addoption(
+        "--bench-json",
+        default=None,
+        metavar="PATH",
+        help="Write the results to PATH, as a JSON list with one object per measurement.",
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    config = metafunc.config
+    if "size" in metafunc.fixturenames:
+        max_size = config.getoption("bench_max_size")
+        metafunc.parametrize("size", [x for x in SIZES if x <= max_size])
+    if "image_size" in metafunc.fixturenames:
+        max_width = config.getoption("bench_max_image_size")
+        metafunc.parametrize(
+            "image_size",
+            [x for x in IMAGE_SIZES if x[0] <= max_width],
+            ids=[f"{w}x{h}" for w, h in IMAGE_SIZES if w <= max_width],
+        )
+
+
+def _disk_usage(path: Path) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class Benchmark:
+    """
+    Measures the pass and fail paths of a regression check.
+    """
+
+    def __init__(self, request: pytest.FixtureRequest, tmp_path: Path) -> None:
+        self.request = request
+        self.tmp_path = tmp_path
+
+    def __call__(
+        self,
+        check: Callable[..., None],
+        data: Any,
+        changed_data: Any,
+        size: int,
+        extension: str,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Benchmark ``check(data)`` against an expected file created from ``data`` itself, and
+        ``check(changed_data)``, which must fail.
+
+        :param size: number of elements of ``data``, recorded with the results.
+        :param extension: extension of the expected file.
+        :param kwargs: passed to ``check``.
+        """
+        __tracebackhide__ = True
+
+        expected_file = self.tmp_path / "expected" / f"expected{extension}"
+        kwargs["fullpath"] = expected_file
+        with pytest.raises(pytest.fail.Exception, match="File not found"):
+            check(data, **kwargs)
+        self._wait()
+        assert expected_file.is_file()
+
+        self._measure("pass", size, lambda: check(data, **kwargs))
+
+        def check_fail() -> None:
+            with pytest.raises(AssertionError):
+                check(changed_data, **kwargs)
+
+        self._measure("fail", size, check_fail)
+
+    def _wait(self) -> None:
+        # Wait for the work regression checks leave to background threads (HTML diffs, for
+        # example), so the written files are complete.
+        session = self.request.config.pluginmanager.get_plugin("regressions-session")
+        session.wait()
+
+    def _measure(self, path: str, size: int, fn: Callable[[], None]) -> None:
+        before = _disk_usage(self.tmp_path)
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        self._wait()
+        bytes_written = _disk_usage(self.tmp_path) - before
+
+        # tracemalloc slows down allocations a lot, so memory is measured in another run.
+        tracemalloc.start()
+        try:
+            fn()
+            self._wait()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        _results.append(
+            {
+                "benchmark": self.request.node.originalname,
+                "nodeid": self.request.node.nodeid,
+                "path": path,
+                "size": size,
+                "seconds": seconds,
+                "peak_memory_bytes": peak_memory,
+                "bytes_written": bytes_written,
+            }
+        )
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest, tmp_path: Path) -> Benchmark:
+    return Benchmark(request, tmp_path)
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    filename = session.config.getoption("bench_json")
+    if filename is not None:
+        Path(filename).write_text(json.dumps(_results, indent=2), encoding="UTF-8")
+
+
+def pytest_terminal_summary(terminalreporter: Any) -> None:
+    if not _results:
+        return
+    terminalreporter.write_sep("=", "regression benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<36} {'path':<5} {'size':>10} {'seconds':>9} "
+        f"{'peak memory':>12} {'written':>12}"
+    )
+    for result in _results:
+        terminalreporter.write_line(
+            f"{result['benchmark']:<36} {result['path']:<5} {result['size']:>10} "
+            f"{result['seconds']:>9.4f} {result['peak_memory_bytes']:>12} "
+            f"{result['bytes_written']:>12}"
+        )
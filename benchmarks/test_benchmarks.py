@@ -0,0 +1,192 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# Fraction of the elements changed to benchmark the fail path.
+CHANGED_FRACTION = 0.01
+
+
+def _values(size: int) -> Any:
+    return np.random.default_rng(0).random(size).round(6)
+
+
+def _changed(values: Any) -> Any:
+    changed = values.copy()
+    changed.flat[:: int(1 / CHANGED_FRACTION)] += 1.0
+    return changed
+
+
+def test_data_regression(data_regression, benchmark, size: int) -> None:
+    values = _values(size)
+    benchmark(
+        data_regression.check,
+        {"values": values.tolist()},
+        {"values": _changed(values).tolist()},
+        size=size,
+        extension=".yml",
+    )
+
+
+def test_file_regression(file_regression, benchmark, size: int) -> None:
+    lines = [f"line {i}: {value}" for i, value in enumerate(_values(size))]
+    changed_lines = list(lines)
+    changed_lines[:: int(1 / CHANGED_FRACTION)] = [
+        "changed " + x for x in lines[:: int(1 / CHANGED_FRACTION)]
+    ]
+    benchmark(
+        file_regression.check,
+        "\n".join(lines) + "\n",
+        "\n".join(changed_lines) + "\n",
+        size=size,
+        extension=".txt",
+    )
+
+
+def test_dataframe_regression(dataframe_regression, benchmark, size: int) -> None:
+    values = _values(size).reshape(-1, 4) if size >= 4 else _values(4).reshape(1, 4)
+    columns = ["a", "b", "c", "d"]
+    benchmark(
+        dataframe_regression.check,
+        pd.DataFrame(values, columns=columns),
+        pd.DataFrame(_changed(values), columns=columns),
+        size=size,
+        extension=".csv",
+    )
+
+
+def test_dataframe_regression_wide(dataframe_regression, benchmark, size: int) -> None:
+    # Ten rows, many columns.
+    values = _values(size).reshape(10, -1) if size >= 10 else _values(10).reshape(10, 1)
+    columns = [f"c{i}" for i in range(values.shape[1])]
+    benchmark(
+        dataframe_regression.check,
+        pd.DataFrame(values, columns=columns),
+        pd.DataFrame(_changed(values), columns=columns),
+        size=size,
+        extension=".csv",
+    )
+
+
+def test_dataframe_regression_parquet(
+    dataframe_regression, benchmark, size: int
+) -> None:
+    values = _values(size).reshape(-1, 4) if size >= 4 else _values(4).reshape(1, 4)
+    columns = ["a", "b", "c", "d"]
+    benchmark(
+        dataframe_regression.check,
+        pd.DataFrame(values, columns=columns),
+        pd.DataFrame(_changed(values), columns=columns),
+        size=size,
+        extension=".parquet",
+        format="parquet",
+    )
+
+
+def test_dataframe_regression_strings(
+    dataframe_regression, benchmark, size: int
+) -> None:
+    # Strings and categorical values, with missing values.
+    words = np.array([f"word{i}" for i in range(1000)], dtype=object)
+
+    def data_frame(values: Any) -> Any:
+        names = words[(values * 997).astype(int) % 1000]
+        names[1::97] = None
+        return pd.DataFrame(
+            {
+                "names": pd.Series(names, dtype="str"),
+                "types": pd.Categorical(names),
+            }
+        )
+
+    benchmark(
+        dataframe_regression.check,
+        data_frame(_values(size)),
+        data_frame(_changed(_values(size))),
+        size=size,
+        extension=".parquet",
+        format="parquet",
+    )
+
+
+def test_num_regression(num_regression, benchmark, size: int) -> None:
+    values = _values(size).reshape(4, -1)
+    benchmark(
+        num_regression.check,
+        {name: column for name, column in zip("abcd", values)},
+        {name: column for name, column in zip("abcd", _changed(values))},
+        size=size,
+        extension=".csv",
+    )
+
+
+def test_num_regression_ragged(num_regression, benchmark, size: int) -> None:
+    # A 2D array, and a shorter 1D array.
+    values = _values(size).reshape(-1, 10) if size >= 10 else _values(10).reshape(1, 10)
+
+    def data_dict(values: Any) -> dict[str, Any]:
+        return {"matrix": values[:, :-1], "tail": values[: len(values) // 2, -1]}
+
+    benchmark(
+        num_regression.check,
+        data_dict(values),
+        data_dict(_changed(values)),
+        size=size,
+        extension=".csv",
+    )
+
+
+def test_ndarrays_regression(ndarrays_regression, benchmark, size: int) -> None:
+    values = _values(size).reshape(-1, 10)
+    benchmark(
+        ndarrays_regression.check,
+        {"values": values, "ids": np.arange(len(values))},
+        {"values": _changed(values), "ids": np.arange(len(values))},
+        size=size,
+        extension=".npz",
+    )
+
+
+def test_ndarrays_regression_stored(ndarrays_regression, benchmark, size: int) -> None:
+    values = _values(size).reshape(-1, 10)
+    benchmark(
+        ndarrays_regression.check,
+        {"values": values, "ids": np.arange(len(values))},
+        {"values": _changed(values), "ids": np.arange(len(values))},
+        size=size,
+        extension=".npz",
+        codec="stored",
+    )
+
+
+def test_ndarrays_regression_lzma_shuffle(
+    ndarrays_regression, benchmark, size: int
+) -> None:
+    values = _values(size).reshape(-1, 10)
+    benchmark(
+        ndarrays_regression.check,
+        {"values": values, "ids": np.arange(len(values))},
+        {"values": _changed(values), "ids": np.arange(len(values))},
+        size=size,
+        extension=".npz",
+        codec="lzma",
+        shuffle=True,
+    )
+
+
+def test_image_regression(
+    image_regression, benchmark, image_size: tuple[int, int]
+) -> None:
+    width, height = image_size
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    changed_pixels = pixels.copy()
+    changed_pixels[: height // 4] = 255 - changed_pixels[: height // 4]
+    benchmark(
+        image_regression.check,
+        Image.fromarray(pixels),
+        Image.fromarray(changed_pixels),
+        size=width * height,
+        extension=".png",
+    )
@@ -37,6 +37,7 @@ setup(
             "pillow",
             "pyarrow",
             "pre-commit",
+            "pytest-xdist",
             "restructuredtext-lint",
             "tox",
         ],
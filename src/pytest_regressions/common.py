@@ -1,31 +1,50 @@
+import contextlib
 import difflib
+import io
+import lzma
 import os
+import tempfile
 from collections.abc import Callable
 from collections.abc import MutableMapping
 from collections.abc import MutableSequence
 from dataclasses import dataclass
+from functools import partial
+from html import escape
 from pathlib import Path
 from typing import Any
 from typing import Optional
-from typing import TYPE_CHECKING
 from typing import TypeVar
 from typing import Union
 
 import pytest
+from pytest_datadir.plugin import LazyDataDir
 
-if TYPE_CHECKING:
-    from pytest_datadir.plugin import LazyDataDir
+from .compression import compress
+from .compression import compression_extension
+from .compression import open_decompressed
+from .diff import html_diff
+from .diff import unified_diff
+from .durations import check_timer
+from .durations import timed
+from .session import atomic_write
+from .session import current_session
+from .store import content_digest
 
 
 def import_error_message(libname: str) -> str:
     return f"'{libname}' library is an optional dependency and must be installed explicitly when the fixture 'check' is used"
 
 
+# Maximum number of lines of the diff shown when text files differ.
+_MAX_DIFF_LINES = 500
+
+
 def check_text_files(
     obtained_fn: "os.PathLike[str]",
     expected_fn: "os.PathLike[str]",
     fix_callback: Callable[[list[str]], list[str]] = lambda x: x,
     encoding: str | None = None,
+    compression: str | None = None,
 ) -> None:
     """
     Compare two files contents. If the files differ, show the diff and write a nice HTML
@@ -37,6 +56,9 @@ def check_text_files(
 
     :param encoding: encoding used to open the files.
 
+    :param compression: compression of the expected file (see
+        ``compression.COMPRESSIONS``), which is decompressed while it is read.
+
     :param fix_callback:
         A callback to "fix" the contents of the obtained (first) file.
         This callback receives a list of strings (lines) and must also return a list of lines,
@@ -48,43 +70,197 @@ def check_text_files(
     obtained_fn = Path(obtained_fn)
     expected_fn = Path(expected_fn)
     obtained_lines = fix_callback(obtained_fn.read_text(encoding=encoding).splitlines())
-    expected_lines = expected_fn.read_text(encoding=encoding).splitlines()
+    _check_text_lines(obtained_lines, obtained_fn, expected_fn, encoding, compression)
+
+
+def check_text_contents(
+    obtained_text: str,
+    obtained_fn: "os.PathLike[str]",
+    expected_fn: "os.PathLike[str]",
+    fix_callback: Callable[[list[str]], list[str]] = lambda x: x,
+    encoding: str | None = None,
+    compression: str | None = None,
+) -> None:
+    """
+    Same as :func:`check_text_files`, but compares the given text instead of the contents of
+    ``obtained_fn``, which is only used to name the obtained file in the diff (it does not
+    need to exist).
+
+    :param obtained_text: the obtained text, as it would be read from ``obtained_fn``.
+    """
+    __tracebackhide__ = True
+
+    obtained_lines = fix_callback(obtained_text.splitlines())
+    _check_text_lines(
+        obtained_lines, Path(obtained_fn), Path(expected_fn), encoding, compression
+    )
+
+
+def _check_text_lines(
+    obtained_lines: list[str],
+    obtained_fn: Path,
+    expected_fn: Path,
+    encoding: str | None,
+    compression: str | None,
+) -> None:
+    __tracebackhide__ = True
+
+    with timed("load"):
+        if compression is not None:
+            # Compressed files are compared while they are decompressed, and only read
+            # entirely when there are differences to report.
+            if _text_lines_equal(obtained_lines, expected_fn, compression, encoding):
+                return
+            with _open_text(expected_fn, compression, encoding) as f:
+                expected_lines = f.read().splitlines()
+        else:
+            expected_lines = expected_fn.read_text(encoding=encoding).splitlines()
 
     if obtained_lines != expected_lines:
-        diff_lines = list(
-            difflib.unified_diff(expected_lines, obtained_lines, lineterm="")
+        with timed("report"):
+            _report_text_differences(
+                obtained_lines, obtained_fn, expected_lines, expected_fn
+            )
+
+
+def _open_text(
+    filename: Path, compression: str, encoding: str | None
+) -> io.TextIOWrapper:
+    f = open_decompressed(filename, compression)
+    return io.TextIOWrapper(f, encoding=encoding)  # type: ignore[arg-type]
+
+
+def _text_lines_equal(
+    lines: list[str], filename: Path, compression: str, encoding: str | None
+) -> bool:
+    """
+    Return True if the lines of the compressed file ``filename`` are ``lines``, reading it
+    line by line.
+    """
+    index = 0
+    with _open_text(filename, compression, encoding) as f:
+        for line in f:
+            # Same lines `str.splitlines()` would give, as line boundaries other than
+            # newlines may appear inside a line of the file.
+            for expected_line in line.splitlines():
+                if index >= len(lines) or lines[index] != expected_line:
+                    return False
+                index += 1
+    return index == len(lines)
+
+
+def _report_text_differences(
+    obtained_lines: list[str],
+    obtained_fn: Path,
+    expected_lines: list[str],
+    expected_fn: Path,
+) -> None:
+    __tracebackhide__ = True
+
+    diff = unified_diff(expected_lines, obtained_lines, max_lines=_MAX_DIFF_LINES)
+
+    # The HTML diff takes longer than the comparison itself, so during a test session it
+    # is rendered in the background, and is guaranteed to exist when the session ends.
+    html_fn = obtained_fn.with_suffix(".diff.html")
+    html_msg = str(html_fn)
+    html_args = (
+        html_fn,
+        expected_lines,
+        obtained_lines,
+        str(expected_fn),
+        str(obtained_fn),
+        diff.total_line_count <= _MAX_DIFF_LINES,
+    )
+    session = current_session()
+    if session is not None:
+        session.submit(_write_html_diff_in_background, *html_args)
+    else:
+        try:
+            _write_html_diff(*html_args)
+        except Exception as e:
+            html_msg = "(failed to generate html diff: %s)" % e
+
+    msg = ["FILES DIFFER:", str(expected_fn), str(obtained_fn)]
+    msg += ["HTML DIFF: %s" % html_msg]
+    msg += diff.lines
+    if diff.truncated:
+        msg += [
+            "...",
+            f"Diff too big, showing {diff.shown_hunk_count} of {diff.hunk_count} hunks "
+            f"({diff.removed_line_count} lines removed and {diff.added_line_count} "
+            f"lines added in total).",
+        ]
+    raise AssertionError("\n".join(msg))
+
+
+# difflib.HtmlDiff shows the whole files and scales quadratically, so it is only used for
+# files up to this number of lines.
+_MAX_HTML_DIFF_FILE_LINES = 2000
+
+
+def _write_html_diff(
+    html_fn: Path,
+    expected_lines: list[str],
+    obtained_lines: list[str],
+    expected_desc: str,
+    obtained_desc: str,
+    small_diff: bool,
+) -> None:
+    if (
+        small_diff
+        and len(expected_lines) <= _MAX_HTML_DIFF_FILE_LINES
+        and len(obtained_lines) <= _MAX_HTML_DIFF_FILE_LINES
+    ):
+        contents = difflib.HtmlDiff().make_file(
+            fromlines=expected_lines,
+            fromdesc=expected_desc,
+            tolines=obtained_lines,
+            todesc=obtained_desc,
         )
-        if len(diff_lines) <= 500:
-            html_fn = obtained_fn.with_suffix(".diff.html")
-            try:
-                differ = difflib.HtmlDiff()
-                html_diff = differ.make_file(
-                    fromlines=expected_lines,
-                    fromdesc=str(expected_fn),
-                    tolines=obtained_lines,
-                    todesc=str(obtained_fn),
-                )
-            except Exception as e:
-                html_msg = "(failed to generate html diff: %s)" % e
-            else:
-                html_fn.write_text(html_diff, encoding="UTF-8")
-                html_msg = str(html_fn)
+    else:
+        contents = html_diff(
+            expected_lines, obtained_lines, expected_desc, obtained_desc
+        )
+    html_fn.write_text(contents, encoding="UTF-8")
+
+
+def _write_html_diff_in_background(html_fn: Path, *args: Any) -> None:
+    try:
+        _write_html_diff(html_fn, *args)
+    except Exception as e:
+        # There is no test to fail anymore, so leave the error in the file itself.
+        with contextlib.suppress(OSError):
+            html_fn.write_text(
+                "failed to generate html diff: %s" % escape(str(e)), encoding="UTF-8"
+            )
 
-            diff = ["FILES DIFFER:", str(expected_fn), str(obtained_fn)]
-            diff += ["HTML DIFF: %s" % html_msg]
-            diff += diff_lines
-            raise AssertionError("\n".join(diff))
-        else:
-            # difflib has exponential scaling and for thousands of lines it starts to take minutes to render
-            # the HTML diff.
-            msg = [
-                "Files are different, but diff is too big ({} lines)".format(
-                    len(diff_lines)
-                ),
-                f"- obtained: {obtained_fn}",
-                f"- expected: {expected_fn}",
-            ]
-            raise AssertionError("\n".join(msg))
+
+_COMPARE_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_contents_equal(
+    filename: Path, contents: bytes, compression: str | None = None
+) -> bool:
+    """
+    Return True if ``filename`` contains exactly ``contents``.
+
+    The file sizes are compared first, and the file is then read in chunks, so large files
+    are never loaded into memory at once. If ``compression`` is given, the file is
+    decompressed while it is read.
+    """
+    try:
+        if compression is None and filename.stat().st_size != len(contents):
+            return False
+        view = memoryview(contents)
+        offset = 0
+        with open_decompressed(filename, compression) as f:
+            while chunk := f.read(_COMPARE_CHUNK_SIZE):
+                if view[offset : offset + len(chunk)] != chunk:
+                    return False
+                offset += len(chunk)
+        return offset == len(contents)
+    except (OSError, EOFError, lzma.LZMAError):
+        return False
 
 
 @dataclass(frozen=True)
@@ -92,6 +268,11 @@ class _ResolvedCheckPaths:
     expected: Path
     source: Path
     basename: str
+    expected_exists: bool
+    # If `expected` is in the temporary data directory of the test.
+    expected_in_datadir: bool
+    # Digest of the expected file, when it is in the content store.
+    expected_digest: str | None = None
 
 
 def resolve_check_paths(
@@ -118,19 +299,62 @@ def resolve_check_paths(
             basename = ""
         basename += re.sub(r"[\W]", "_", request.node.name)
 
+    name = basename + extension
     if fullpath:
-        expected = source = Path(fullpath)
+        source = Path(fullpath)
     else:
-        expected = datadir / (basename + extension)
-        source = original_datadir / (basename + extension)
-    return _ResolvedCheckPaths(expected=expected, source=source, basename=basename)
+        source = original_datadir / name
+
+    session = current_session()
+    if session is not None and session.store is not None:
+        digest = session.store.digest(source)
+        if digest is not None:
+            blob = session.store.blob_path(digest, extension)
+            session.flush(blob)
+            return _ResolvedCheckPaths(
+                expected=blob,
+                source=source,
+                basename=basename,
+                expected_exists=session.is_file(blob),
+                expected_in_datadir=False,
+                expected_digest=digest,
+            )
+
+    if session is not None:
+        # The file may have been regenerated earlier in the session and still be being
+        # written.
+        session.flush(source)
+        source_exists = session.is_file(source)
+    else:
+        source_exists = source.is_file()
+
+    read_in_place = request.config.getoption("regressions_read_in_place", False)
+    expected_in_datadir = True
+    if fullpath or (read_in_place and source_exists):
+        expected = source
+        expected_exists = source_exists
+        expected_in_datadir = False
+    else:
+        # Copied into the temporary directory of the test if the source exists.
+        expected = datadir / name
+        expected_exists = expected.is_file()
+        if source_exists and not expected_exists and session is not None:
+            # Removed during the session.
+            session.forget_file(source)
+    return _ResolvedCheckPaths(
+        expected=expected,
+        source=source,
+        basename=basename,
+        expected_exists=expected_exists,
+        expected_in_datadir=expected_in_datadir,
+    )
 
 
 def perform_regression_check(
     datadir: "LazyDataDir",
     original_datadir: Path,
     request: pytest.FixtureRequest,
-    check_fn: Callable[[Path, Path], None],
+    check_fn: Callable[[Path, Path], None] | None,
     dump_fn: Callable[[Path], None],
     extension: str,
     basename: str | None = None,
@@ -139,6 +363,11 @@ def perform_regression_check(
     with_test_class_names: bool = False,
     obtained_filename: Optional["os.PathLike[str]"] = None,
     dump_aux_fn: Callable[[Path], list[str]] = lambda filename: [],
+    obtained_contents: bytes | None = None,
+    check_contents_fn: Callable[[bytes, Path, Path], None] | None = None,
+    compression: str | None = None,
+    check_data_fn: Callable[[Path, Path], None] | None = None,
+    check_regen_fn: Callable[[Path], None] | None = None,
 ) -> None:
     """
     First run of this check will generate a expected file. Following attempts will always try to
@@ -152,7 +381,8 @@ def perform_regression_check(
     :param check_fn: A function that receives as arguments, respectively, absolute path to
         obtained file and absolute path to expected file. It must assert if contents of file match.
         Function can safely assume that obtained file is already dumped and only care about
-        comparison.
+        comparison. May be ``None`` if ``check_data_fn``, or ``check_contents_fn`` with
+        ``obtained_contents``, is given, as it is then never called.
     :param dump_fn: A function that receive an absolute file path as argument. Implementor
         must dump file in this path.
     :param dump_aux_fn: A function that receives the same file path as ``dump_fn``, but may
@@ -164,19 +394,91 @@ def perform_regression_check(
         the basename.
     :param obtained_filename: complete path to use to write the obtained file. By
         default will prepend `.obtained` before the file extension.
+    :param obtained_contents: the contents ``dump_fn`` writes, if the caller already
+        serialized them to bytes. When the expected file contains exactly these bytes the check
+        passes right away: the obtained file is not written and ``check_fn`` is not called.
+        Only pass this when byte-identical contents always mean the check succeeds.
+    :param check_contents_fn: Same as ``check_fn``, but compares ``obtained_contents`` in
+        memory instead of reading the obtained file back. It receives, respectively, the obtained
+        contents, the path where the obtained file will be written if the check fails, and the
+        path to the expected file. When given (together with ``obtained_contents``), the obtained
+        file is only written if this function raises ``AssertionError``.
+    :param compression: if given, the expected file is compressed with it (see
+        ``compression.COMPRESSIONS``), and its extension gets the suffix of the compression.
+        ``dump_fn`` and ``obtained_contents`` are still uncompressed, as is the obtained file,
+        so ``check_fn`` and ``check_contents_fn`` must decompress the expected file, with
+        this compression whatever its extension (a ``fullpath`` is used as given).
+    :param check_data_fn: Same as ``check_contents_fn``, for callers that compare data they
+        hold in memory without serializing it to ``obtained_contents``. It receives,
+        respectively, the path where the obtained file will be written if the check fails,
+        and the path to the expected file.
+    :param check_regen_fn: A function called with the path to the existing expected file
+        before it is regenerated (with ``--force-regen`` or ``--regen-all``), which may fail
+        the check (with ``pytest.fail``) to keep the file as it is.
     ..see: `data_regression.Check` for `basename` and `fullpath` arguments.
     """
     __tracebackhide__ = True
 
-    paths = resolve_check_paths(
-        datadir=datadir,
-        original_datadir=original_datadir,
-        request=request,
-        extension=extension,
-        basename=basename,
-        fullpath=fullpath,
-        with_test_class_names=with_test_class_names,
-    )
+    assert check_fn is not None or (
+        check_data_fn is not None
+        or (check_contents_fn is not None and obtained_contents is not None)
+    ), "pass check_fn, unless the contents or data are compared in memory"
+
+    with check_timer(request):
+        _perform_regression_check(
+            datadir=datadir,
+            original_datadir=original_datadir,
+            request=request,
+            check_fn=check_fn,
+            dump_fn=dump_fn,
+            extension=extension,
+            basename=basename,
+            fullpath=fullpath,
+            force_regen=force_regen,
+            with_test_class_names=with_test_class_names,
+            obtained_filename=obtained_filename,
+            dump_aux_fn=dump_aux_fn,
+            obtained_contents=obtained_contents,
+            check_contents_fn=check_contents_fn,
+            compression=compression,
+            check_data_fn=check_data_fn,
+            check_regen_fn=check_regen_fn,
+        )
+
+
+def _perform_regression_check(
+    datadir: "LazyDataDir",
+    original_datadir: Path,
+    request: pytest.FixtureRequest,
+    check_fn: Callable[[Path, Path], None] | None,
+    dump_fn: Callable[[Path], None],
+    extension: str,
+    basename: str | None,
+    fullpath: Optional["os.PathLike[str]"],
+    force_regen: bool,
+    with_test_class_names: bool,
+    obtained_filename: Optional["os.PathLike[str]"],
+    dump_aux_fn: Callable[[Path], list[str]],
+    obtained_contents: bytes | None,
+    check_contents_fn: Callable[[bytes, Path, Path], None] | None,
+    compression: str | None,
+    check_data_fn: Callable[[Path, Path], None] | None,
+    check_regen_fn: Callable[[Path], None] | None,
+) -> None:
+    __tracebackhide__ = True
+
+    # Extension of the expected file, which may be compressed, unlike the obtained file.
+    expected_extension = extension + compression_extension(compression)
+    with timed("resolve"):
+        paths = resolve_check_paths(
+            datadir=datadir,
+            original_datadir=original_datadir,
+            request=request,
+            extension=expected_extension,
+            basename=basename,
+            fullpath=fullpath,
+            with_test_class_names=with_test_class_names,
+        )
     filename = paths.expected
     source_filename = paths.source
     basename = paths.basename
@@ -188,38 +490,128 @@ def perform_regression_check(
             msg += [f"- {x}" for x in aux_files]
         return "\n".join(msg)
 
+    session = current_session()
+    store = session.store if session is not None else None
+
+    def dumped_contents() -> bytes:
+        if obtained_contents is not None:
+            return obtained_contents
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_filename = Path(temp_dir) / ("contents" + extension)
+            dump_fn(temp_filename)
+            return temp_filename.read_bytes()
+
+    def stored_contents(contents: bytes) -> bytes:
+        return compress(contents, compression) if compression is not None else contents
+
+    def write_source() -> None:
+        __tracebackhide__ = True
+        if check_regen_fn is not None and paths.expected_exists:
+            check_regen_fn(filename)
+        # Writes into the data directory are atomic, and happen in the background when the
+        # contents are known.
+        with timed("dump"):
+            if session is not None and store is not None:
+                contents = dumped_contents()
+                # Blobs are named after the uncompressed contents, which is what the fast
+                # path below compares.
+                session.write_stored_file(
+                    source_filename,
+                    contents,
+                    expected_extension,
+                    stored_contents=stored_contents(contents),
+                )
+            elif compression is not None or (
+                session is not None and obtained_contents is not None
+            ):
+                contents = stored_contents(dumped_contents())
+                if session is not None:
+                    session.write_file(source_filename, contents)
+                else:
+                    atomic_write(source_filename, lambda f: f.write_bytes(contents))
+            else:
+                atomic_write(source_filename, dump_fn)
+                if session is not None:
+                    session.record_written_file(source_filename)
+
+    def write_aux(filename: Path) -> list[str]:
+        with timed("aux"):
+            return dump_aux_fn(filename)
+
     force_regen = force_regen or request.config.getoption("force_regen")
     regen_all = request.config.getoption("regen_all")
     if regen_all:
-        source_filename.parent.mkdir(parents=True, exist_ok=True)
-        dump_fn(source_filename)
-        dump_aux_fn(source_filename)
-    elif not filename.is_file():
-        source_filename.parent.mkdir(parents=True, exist_ok=True)
-        dump_fn(source_filename)
-        aux_created = dump_aux_fn(source_filename)
+        write_source()
+        write_aux(source_filename)
+    elif not paths.expected_exists:
+        write_source()
+        aux_created = write_aux(source_filename)
 
         msg = make_location_message(
             "File not found in data directory, created:", source_filename, aux_created
         )
         pytest.fail(msg)
     else:
-        if obtained_filename is None:
-            if fullpath:
-                obtained_filename = (datadir / basename).with_suffix(
-                    ".obtained" + extension
-                )
-            else:
-                obtained_filename = filename.with_suffix(".obtained" + extension)
-
-        dump_fn(Path(obtained_filename))
+        if obtained_contents is not None:
+            with timed("compare"):
+                if paths.expected_digest is not None:
+                    # In the content store the digest of the expected file is known, so
+                    # it does not even need to be read.
+                    equal = content_digest(obtained_contents) == paths.expected_digest
+                else:
+                    equal = _file_contents_equal(
+                        filename, obtained_contents, compression
+                    )
+            if equal:
+                return
+
+        with timed("resolve"):
+            if obtained_filename is None:
+                obtained_dir = request.config.getoption("regressions_obtained_dir")
+                if obtained_dir:
+                    obtained_filename = _obtained_dir_path(
+                        Path(obtained_dir),
+                        request,
+                        original_datadir,
+                        basename,
+                        extension,
+                    )
+                elif not paths.expected_in_datadir:
+                    # Expected file read in place: obtained files still go to the
+                    # temporary data directory.
+                    obtained_filename = (datadir / basename).with_suffix(
+                        ".obtained" + extension
+                    )
+                else:
+                    uncompressed = str(filename).removesuffix(
+                        compression_extension(compression)
+                    )
+                    obtained_filename = Path(uncompressed).with_suffix(
+                        ".obtained" + extension
+                    )
+            obtained_filename = Path(obtained_filename)
 
         try:
-            check_fn(Path(obtained_filename), Path(filename))
+            if check_contents_fn is not None and obtained_contents is not None:
+                check_data_fn = partial(check_contents_fn, obtained_contents)
+            if check_data_fn is not None:
+                try:
+                    with timed("compare"):
+                        check_data_fn(obtained_filename, filename)
+                except AssertionError:
+                    with timed("dump"):
+                        dump_fn(obtained_filename)
+                    raise
+            else:
+                with timed("dump"):
+                    dump_fn(obtained_filename)
+                assert check_fn is not None
+                with timed("compare"):
+                    check_fn(obtained_filename, Path(filename))
         except AssertionError:
             if force_regen:
-                dump_fn(source_filename)
-                aux_created = dump_aux_fn(source_filename)
+                write_source()
+                aux_created = write_aux(source_filename)
                 msg = make_location_message(
                     "Files differ and --force-regen set, regenerating file at:",
                     source_filename,
@@ -227,10 +619,38 @@ def perform_regression_check(
                 )
                 pytest.fail(msg)
             else:
-                dump_aux_fn(Path(obtained_filename))
+                write_aux(obtained_filename)
                 raise
 
 
+def _obtained_dir_path(
+    obtained_dir: Path,
+    request: pytest.FixtureRequest,
+    original_datadir: Path,
+    basename: str,
+    extension: str,
+) -> Path:
+    """
+    Path of the obtained file when ``--regressions-obtained-dir`` is given: the data directory
+    layout relative to the root directory is mirrored inside ``obtained_dir``, so checks from
+    different test modules never share a file (nor checks from different pytest-xdist workers,
+    which use a subdirectory each).
+    """
+    try:
+        relative = original_datadir.relative_to(request.config.rootpath)
+    except ValueError:
+        relative = Path(original_datadir.name)
+    session = current_session()
+    if session is not None and session.worker_id is not None:
+        # Each pytest-xdist worker gets its own directory.
+        relative = session.worker_id / relative
+    result = (obtained_dir / relative / (basename + extension)).with_suffix(
+        ".obtained" + extension
+    )
+    result.parent.mkdir(parents=True, exist_ok=True)
+    return result
+
+
 T = TypeVar("T", bound=Union[MutableSequence[Any], MutableMapping[Any, Any]])
 
 
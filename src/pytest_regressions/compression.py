@@ -0,0 +1,73 @@
+"""
+Compressed expected files, enabled with the ``compression`` argument of the text based fixtures
+or ``--regressions-compression``.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+
+import pytest
+
+# Supported compressions, mapped to the extension added to the expected files.
+COMPRESSIONS = {
+    "gzip": ".gz",
+    "bz2": ".bz2",
+    "xz": ".xz",
+}
+
+
+def resolve_compression(
+    request: pytest.FixtureRequest, compression: str | None
+) -> str | None:
+    """
+    Compression of the expected file of a check: the given ``compression``, or the default
+    of the session if it is None. ``"none"`` disables compression.
+    """
+    if compression is None:
+        compression = request.config.getoption("regressions_compression", None)
+    if compression is None or compression == "none":
+        return None
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            "Invalid compression {!r}, must be one of: {}".format(
+                compression, ", ".join(["none", *COMPRESSIONS])
+            )
+        )
+    return compression
+
+
+def compression_extension(compression: str | None) -> str:
+    return COMPRESSIONS[compression] if compression is not None else ""
+
+
+def compress(contents: bytes, compression: str) -> bytes:
+    """
+    Compress ``contents``. The result only depends on ``contents``, so regenerating an
+    expected file with the same contents does not change it.
+    """
+    if compression == "gzip":
+        # mtime=0: no timestamp in the header.
+        return gzip.compress(contents, compresslevel=6, mtime=0)
+    elif compression == "bz2":
+        return bz2.compress(contents)
+    else:
+        assert compression == "xz", compression
+        return lzma.compress(contents)
+
+
+def open_decompressed(path: Path, compression: str | None) -> io.BufferedIOBase:
+    """
+    Open ``path`` for reading, decompressing it while it is read.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(path, "rb")
+    elif compression == "bz2":
+        return bz2.open(path, "rb")
+    elif compression == "xz":
+        return lzma.open(path, "rb")
+    else:
+        assert compression is None, compression
+        return path.open("rb")
@@ -0,0 +1,444 @@
+"""
+Schemas of the CSV files of ``dataframe_regression`` and ``num_regression``.
+
+Schemas are stored in a small JSON file next to the expected CSV file (``test_foo.schema.json``
+for ``test_foo.csv``), with the data types of its columns. CSV files with a schema are read
+with these types instead of inferring them from the text, which is faster (with the
+multi-threaded ``pyarrow`` parser, when installed) and keeps the types which can not be
+inferred, like strings which look like numbers or columns with only missing values. The types
+also let long files be read in chunks of rows (see :func:`iter_csv`), as the types of the
+columns then do not depend on the values of each chunk. Long files without a schema are read
+in chunks with the types inferred from their first rows (see :func:`inferred_schema`).
+
+Requires pandas.
+"""
+
+import functools
+import io
+import json
+import os
+from collections.abc import Collection
+from collections.abc import Iterator
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+SCHEMA_EXTENSION = ".schema.json"
+
+SCHEMA_VERSION = 1
+
+# Parser of pandas for the floats of CSV files without a schema, which may have been written
+# with 17 significant digits (as ``%.17g``) before floats were written as ``repr``: the
+# default parser may read both texts of the same float as different values.
+EXACT_FLOAT_PRECISION = "round_trip"
+
+# Approximate size of the text of the chunks of rows read by ``iter_csv``.
+CHUNK_BYTES = 32 * 1024 * 1024
+
+
+def schema_filename(filename: "os.PathLike[str]", compression_extension: str) -> Path:
+    """
+    Return the schema file of a CSV file, maybe compressed (like ``test_foo.csv.gz``).
+    """
+    name = os.fspath(filename).removesuffix(compression_extension).removesuffix(".csv")
+    return Path(name + SCHEMA_EXTENSION)
+
+
+@functools.cache
+def _column_type(dtype: Any) -> Any:
+    """
+    Return the type of a column in the schema: the name of its data type, or its categories
+    for categorical columns. Numeric columns backed by pyarrow (like ``float64[pyarrow]``)
+    are read with the NumPy type of their values, nullable for booleans and integers, as
+    pyarrow parses them (see ``_arrow_type``). Columns of other types are read as strings,
+    as pandas infers their text.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories
+        if categories.dtype.kind in "biuf" or all(
+            isinstance(x, str) for x in categories
+        ):
+            return {
+                "categories": categories.tolist(),
+                "ordered": bool(dtype.ordered),
+            }
+    elif isinstance(dtype, np.dtype):
+        if dtype.kind in "biufO":
+            return dtype.name
+    elif isinstance(dtype, pd.ArrowDtype):
+        numpy_dtype = dtype.numpy_dtype
+        if numpy_dtype.kind == "f":
+            return numpy_dtype.name
+        elif numpy_dtype.kind in "biu":
+            return str(_nullable_dtype(numpy_dtype.name))
+    elif isinstance(dtype, pd.StringDtype) or (
+        # Nullable booleans, integers and floats (like ``Int64``).
+        dtype.kind in "biuf"
+        and isinstance(dtype, pd.api.extensions.ExtensionDtype)
+        and not isinstance(dtype, (pd.SparseDtype, pd.ArrowDtype))
+    ):
+        return str(dtype)
+    return "str"
+
+
+def csv_schema(data_frame: Any) -> dict[str, Any] | None:
+    """
+    Return the schema of the CSV file written for ``data_frame``, or ``None`` if its columns
+    are not a single row of unique names in the CSV file.
+    """
+    import pandas as pd
+
+    if isinstance(data_frame.columns, pd.MultiIndex):
+        return None
+    index_names = ["" if x is None else str(x) for x in data_frame.index.names]
+    names = index_names + [str(x) for x in data_frame.columns]
+    if len(set(names)) != len(names):
+        return None
+    index_dtypes = (
+        data_frame.index.dtypes
+        if isinstance(data_frame.index, pd.MultiIndex)
+        else [data_frame.index.dtype]
+    )
+    dtypes = [*index_dtypes, *data_frame.dtypes]
+    return {
+        "version": SCHEMA_VERSION,
+        "index_columns": len(index_names),
+        "columns": [
+            {"name": name, "type": _column_type(dtype)}
+            for name, dtype in zip(names, dtypes)
+        ],
+    }
+
+
+def arrays_schema(arrays: Mapping[str, Any], index: Any) -> dict[str, Any] | None:
+    """
+    Return the schema of the CSV file written by :func:`.csv_writer.arrays_to_csv`, or
+    ``None`` if the names of its columns are not unique.
+
+    The columns of the arrays shorter than the index have their ``length``, so they are
+    read without their missing values.
+    """
+    import numpy as np
+
+    from .csv_writer import array_column_names
+
+    rows = len(index)
+    columns = [{"name": "", "type": _column_type(np.asarray(index).dtype)}]
+    for name, array in arrays.items():
+        for column_name in array_column_names(name, array):
+            column = {"name": column_name, "type": _column_type(array.dtype)}
+            if len(array) != rows:
+                column["length"] = len(array)
+            columns.append(column)
+    names = [column["name"] for column in columns]
+    if len(set(names)) != len(names):
+        return None
+    return {"version": SCHEMA_VERSION, "index_columns": 1, "columns": columns}
+
+
+def inferred_schema(contents: bytes, rows: int) -> dict[str, Any]:
+    """
+    Return the schema of a CSV file without one, with the types pandas infers from its
+    first ``rows`` rows, to read it in chunks like ``contents`` (see :func:`iter_csv`).
+
+    All the columns are read as columns, as ``pd.read_csv`` reads files without a schema.
+    Integer columns are read as floats, as whole floats are written without decimals, and
+    the next rows may have decimals or missing values.
+    """
+    import numpy as np
+    import pandas as pd
+
+    data_frame = pd.read_csv(io.BytesIO(contents), nrows=rows)
+    columns = []
+    for i, (name, dtype) in enumerate(data_frame.dtypes.items()):
+        if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+            dtype = np.dtype(np.float64)
+        columns.append(
+            {
+                "name": "" if name == f"Unnamed: {i}" else str(name),
+                "type": _column_type(dtype),
+            }
+        )
+    return {"version": SCHEMA_VERSION, "index_columns": 0, "columns": columns}
+
+
+def dump_schema(schema: dict[str, Any]) -> bytes:
+    """
+    Serialize a schema to JSON, with a line per column, so it is easy to compare.
+    """
+    lines = ["{"]
+    for key, value in schema.items():
+        if key != "columns":
+            lines.append(f"  {json.dumps(key)}: {json.dumps(value)},")
+    lines.append('  "columns": [')
+    lines.append(
+        ",\n".join(
+            "    " + json.dumps(column, ensure_ascii=False)
+            for column in schema["columns"]
+        )
+    )
+    lines += ["  ]", "}", ""]
+    return "\n".join(lines).encode("utf-8")
+
+
+def load_schema(filename: Path) -> dict[str, Any] | None:
+    """
+    Load a schema file, or return ``None`` if it does not exist or is not a schema known by
+    this version.
+    """
+    try:
+        schema = json.loads(filename.read_bytes())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(schema, dict) or schema.get("version") != SCHEMA_VERSION:
+        return None
+    return schema
+
+
+def column_names(schema: dict[str, Any]) -> list[str]:
+    """
+    Return the names of the columns of a CSV file as pandas reads them, which names the ones
+    without a name (like the index, usually) after their position, as ``Unnamed: 0``.
+    """
+    return [
+        column["name"] or f"Unnamed: {i}" for i, column in enumerate(schema["columns"])
+    ]
+
+
+def _pandas_dtype(column: dict[str, Any]) -> Any:
+    import pandas as pd
+
+    column_type = column["type"]
+    if isinstance(column_type, dict):
+        return pd.CategoricalDtype(
+            column_type["categories"], ordered=column_type["ordered"]
+        )
+    if "length" in column:
+        # Shorter than the file, with missing values after their length.
+        return _nullable_dtype(column_type)
+    return _named_dtype(column_type)
+
+
+@functools.cache
+def _nullable_dtype(name: str) -> Any:
+    import numpy as np
+    import pandas as pd
+
+    dtype = _named_dtype(name)
+    if isinstance(dtype, np.dtype) and dtype.kind in "biu":
+        # Like ``Int64`` for ``int64``.
+        return pd.array(np.zeros(0, dtype=dtype)).dtype
+    return dtype
+
+
+@functools.cache
+def _named_dtype(name: str) -> Any:
+    # Cached, as wide data frames have many columns of the same types.
+    import numpy as np
+    import pandas as pd
+
+    dtype = pd.api.types.pandas_dtype(name)
+    if isinstance(dtype, np.dtype) and dtype.kind == "U":
+        # ``"str"`` before pandas 3.
+        return np.dtype(object)
+    return dtype
+
+
+def _arrow_type(dtype: Any) -> Any:
+    """
+    Return the type of the values of a column of ``dtype`` as parsed by pyarrow, which are
+    converted to ``dtype`` after being read.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    numpy_dtype = getattr(dtype, "numpy_dtype", dtype)
+    if isinstance(numpy_dtype, np.dtype) and numpy_dtype.kind in "biuf":
+        return pa.from_numpy_dtype(numpy_dtype)
+    return pa.string()
+
+
+def _read_csv_with_pyarrow(
+    source: Any, header: list[str], dtypes: list[Any], all_columns: bool
+) -> Any:
+    import pyarrow.csv
+
+    # Unlike ``pd.read_csv(engine="pyarrow", dtype=...)``, which infers the types of the
+    # values before converting them, values which do not have the type of their column
+    # are errors.
+    convert_options = pyarrow.csv.ConvertOptions(
+        column_types=dict(zip(header, map(_arrow_type, dtypes))),
+        include_columns=None if all_columns else header,
+        strings_can_be_null=True,
+    )
+    table = pyarrow.csv.read_csv(source, convert_options=convert_options)
+    if table.column_names != header:
+        raise ValueError("different columns")
+    # Converted as a whole, as converting wide tables column by column is slow.
+    data_frame = table.rename_columns([str(i) for i in range(len(header))]).to_pandas()
+    for i, (dtype, converted) in enumerate(zip(dtypes, data_frame.dtypes)):
+        if converted != dtype:
+            data_frame.isetitem(i, data_frame.iloc[:, i].astype(dtype))
+    return data_frame
+
+
+def _open(source: Path | bytes, compression: str | None) -> Any:
+    from .compression import open_decompressed
+
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    elif compression is not None:
+        return open_decompressed(source, compression)
+    else:
+        return str(source)
+
+
+def _selected_columns(
+    schema: dict[str, Any], columns: Collection[str] | None
+) -> tuple[list[int], list[Any]]:
+    """
+    Return the positions of the columns of the schema which are read, with their types.
+    """
+    names = column_names(schema)
+    if columns is not None:
+        columns = set(columns)
+    selected = [
+        i
+        for i, name in enumerate(names)
+        if columns is None or i < schema["index_columns"] or name in columns
+    ]
+    dtypes = [_pandas_dtype(schema["columns"][i]) for i in selected]
+    return selected, dtypes
+
+
+def parses_floats_exactly() -> bool:
+    """
+    Return whether :func:`read_csv` parses floats exactly, which it does with ``pyarrow``.
+
+    The C parser of pandas, used otherwise and by :func:`iter_csv`, may give floats which
+    differ in their last bit (it is several times faster than its exact ``round_trip``
+    parser), so the obtained and expected files must both be read with it to be compared.
+    Both files are then written by :mod:`.csv_writer`, as they have a schema, so equal
+    floats have the same text, and are read alike.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ModuleNotFoundError:
+        return False
+    return True
+
+
+def read_csv(
+    source: Path | bytes,
+    schema: dict[str, Any],
+    columns: Collection[str] | None = None,
+    compression: str | None = None,
+) -> Any:
+    """
+    Read a CSV file with the types of its schema, with the multi-threaded ``pyarrow`` parser
+    if it is installed.
+
+    :param source: the path of the file, or its contents.
+    :param columns: names of the columns to read (see :func:`column_names`), besides the
+        index columns. Defaults to all the columns, which must be the columns of the file.
+    :param compression: compression of the file.
+    :raise ValueError: if the file does not match its schema.
+    """
+    import pandas as pd
+
+    f = _open(source, compression)
+    names = column_names(schema)
+    selected, dtypes = _selected_columns(schema, columns)
+
+    # Without ``columns``, all the columns of the file must be in the schema, as they are
+    # all compared.
+    try:
+        if parses_floats_exactly():
+            data_frame = _read_csv_with_pyarrow(
+                f,
+                [schema["columns"][i]["name"] for i in selected],
+                dtypes,
+                all_columns=columns is None,
+            )
+        else:
+            keys = [names[i] for i in selected]
+            data_frame = pd.read_csv(
+                f,
+                dtype=dict(zip(keys, dtypes)),
+                usecols=None if columns is None else keys,
+                memory_map=isinstance(f, str),
+            )
+            if list(data_frame.columns) != keys:
+                raise ValueError("different columns")
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"CSV file does not match its schema: {e}") from e
+    finally:
+        if not isinstance(f, str):
+            f.close()
+    data_frame.columns = [names[i] for i in selected]
+    return data_frame
+
+
+def chunk_rows(contents: bytes) -> int:
+    """
+    Return the number of rows of the chunks of about ``CHUNK_BYTES`` bytes of CSV files like
+    ``contents``, from the average size of its rows.
+    """
+    rows = max(contents.count(b"\n"), 1)
+    return max(CHUNK_BYTES * rows // max(len(contents), 1), 1)
+
+
+def iter_csv(
+    source: Path | bytes,
+    schema: dict[str, Any],
+    rows: int,
+    columns: Collection[str] | None = None,
+    compression: str | None = None,
+    exact: bool = False,
+) -> Iterator[Any]:
+    """
+    Same as :func:`read_csv`, but read the file in chunks of ``rows`` rows (see
+    :func:`chunk_rows`), so only a chunk of the file is in memory at a time.
+
+    The chunks are parsed by pandas, even when ``pyarrow`` is installed: its streaming
+    reader reads ahead many blocks of bytes, and fails on rows larger than a block. Files
+    are not memory-mapped, so their pages are not kept in memory either.
+
+    At least one chunk is returned, empty if the file has no rows. The rows of each chunk
+    are indexed from 0.
+
+    :param exact: parse floats exactly, with the slower ``round_trip`` parser of pandas,
+        for files without a schema (see :data:`EXACT_FLOAT_PRECISION`).
+
+    :raise ValueError: if the file does not match its schema, maybe after some chunks.
+    """
+    import pandas as pd
+
+    f = _open(source, compression)
+    names = column_names(schema)
+    selected, dtypes = _selected_columns(schema, columns)
+    keys = [names[i] for i in selected]
+    try:
+        with pd.read_csv(
+            f,
+            dtype=dict(zip(keys, dtypes)),
+            usecols=None if columns is None else keys,
+            chunksize=rows,
+            float_precision=EXACT_FLOAT_PRECISION if exact else None,
+        ) as reader:
+            while True:
+                try:
+                    data_frame = next(reader, None)
+                    if data_frame is not None and list(data_frame.columns) != keys:
+                        raise ValueError("different columns")
+                except (TypeError, KeyError, ValueError) as e:
+                    raise ValueError(f"CSV file does not match its schema: {e}") from e
+                if data_frame is None:
+                    break
+                yield data_frame.reset_index(drop=True)
+    finally:
+        if not isinstance(f, str):
+            f.close()
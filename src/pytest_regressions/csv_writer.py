@@ -0,0 +1,143 @@
+"""
+Writing of the CSV files of ``dataframe_regression`` and ``num_regression``.
+
+Floats are written as the shortest text that reads back as the same value (as ``repr``),
+instead of with 17 significant digits, which is shorter and faster to write: pandas formats
+each value with a ``float_format`` in Python, while ``repr`` is mapped over whole columns
+here, and the rows are joined in chunks.
+
+Requires NumPy and pandas.
+"""
+
+import os
+from collections.abc import Mapping
+from typing import Any
+
+import numpy as np
+
+# Rows of the data frames formatted at a time, to bound the memory used by their text.
+CHUNK_ROWS = 64 * 1024
+
+# Whole floats below this are written without exponent by ``repr``, as ``3.0``.
+_MAX_POSITIONAL = 1e16
+
+
+def format_floats(values: Any) -> list[str]:
+    """
+    Format floats as the shortest text that reads back as the same ``float64`` value, as
+    ``repr`` does, but without the ``.0`` of whole numbers and with NaN as an empty string, as
+    pandas writes missing values in CSV files.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    # ``repr`` is faster than the vectorized formatting of NumPy (``x.astype(str)``), which
+    # gives the same text.
+    result = list(map(float.__repr__, x.tolist()))
+    for i in np.flatnonzero(np.isnan(x)).tolist():
+        result[i] = ""
+    # Signaling NaNs warn in ``trunc``.
+    with np.errstate(invalid="ignore"):
+        whole = (x == np.trunc(x)) & (np.abs(x) < _MAX_POSITIONAL)
+    for i in np.flatnonzero(whole).tolist():
+        result[i] = result[i][:-2]
+    return result
+
+
+def _is_numeric(dtype: Any) -> bool:
+    return isinstance(dtype, np.dtype) and dtype.kind in "biuf"
+
+
+def _format_values(values: Any) -> list[str]:
+    if values.dtype.kind == "f":
+        return format_floats(values)
+    return list(map(str, values.tolist()))
+
+
+def to_csv(data_frame: Any) -> str:
+    """
+    Write ``data_frame`` as ``data_frame.to_csv()`` would, except for the format of floats
+    (see :func:`format_floats`).
+
+    Data frames whose index and columns are all booleans, integers or floats are written
+    here, one chunk of rows at a time, with the columns of each data type formatted
+    together, and the others by pandas, with their float columns formatted here first.
+    """
+    import pandas as pd
+
+    dtypes = list(data_frame.dtypes)
+    index = data_frame.index
+    if (
+        isinstance(index, pd.MultiIndex)
+        or not _is_numeric(index.dtype)
+        or not all(_is_numeric(dtype) for dtype in dtypes)
+    ):
+        formatted = data_frame.copy(deep=False)
+        for i, dtype in enumerate(dtypes):
+            if _is_numeric(dtype) and dtype.kind == "f":
+                values = data_frame.iloc[:, i].to_numpy()
+                formatted.isetitem(i, np.array(format_floats(values), dtype=object))
+        result: str = formatted.to_csv(float_format="%.17g")
+        return result
+
+    blocks: dict[Any, list[int]] = {}
+    for i, dtype in enumerate(dtypes):
+        blocks.setdefault(dtype, []).append(i)
+    index_values = index.to_numpy()
+    parts = [data_frame.iloc[:0].to_csv()]
+    for start in range(0, len(data_frame), CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        cells = np.empty((len(index_values[start:stop]), len(dtypes) + 1), dtype=object)
+        cells[:, 0] = _format_values(index_values[start:stop])
+        for positions in blocks.values():
+            values = data_frame.iloc[start:stop, positions].to_numpy()
+            text = np.array(_format_values(values.ravel()), dtype=object)
+            cells[:, np.add(positions, 1)] = text.reshape(values.shape)
+        parts.append(os.linesep.join(map(",".join, cells.tolist())))
+        parts.append(os.linesep)
+    return "".join(parts)
+
+
+def array_column_names(name: str, array: Any) -> list[str]:
+    """
+    Return the names of the columns of an array in the CSV files written by
+    :func:`arrays_to_csv`: its name for 1-D arrays, and ``name[0]``, ``name[1]``... for the
+    columns of 2-D arrays.
+    """
+    if array.ndim == 1:
+        return [name]
+    return [f"{name}[{j}]" for j in range(array.shape[1])]
+
+
+def arrays_to_csv(arrays: Mapping[str, Any], index: Any) -> str:
+    """
+    Write 1-D and 2-D arrays of booleans, integers or floats as the columns of a CSV file
+    (see :func:`array_column_names`), as :func:`to_csv` would write a data frame with them
+    as columns, without copying them into one.
+
+    The cells of the arrays shorter than ``index`` are left empty, as missing values.
+    """
+    import pandas as pd
+
+    names = [
+        x for name, array in arrays.items() for x in array_column_names(name, array)
+    ]
+    index_values = np.asarray(index)
+    parts = [pd.DataFrame(columns=names).to_csv()]
+    for start in range(0, len(index_values), CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        cells = np.full(
+            (len(index_values[start:stop]), len(names) + 1), "", dtype=object
+        )
+        cells[:, 0] = _format_values(index_values[start:stop])
+        column = 1
+        for array in arrays.values():
+            values = array[start:stop]
+            if values.ndim == 1:
+                values = values[:, np.newaxis]
+            text = np.array(_format_values(values.ravel()), dtype=object)
+            cells[: len(values), column : column + values.shape[1]] = text.reshape(
+                values.shape
+            )
+            column += values.shape[1]
+        parts.append(os.linesep.join(map(",".join, cells.tolist())))
+        parts.append(os.linesep)
+    return "".join(parts)
@@ -1,18 +1,27 @@
+import importlib
+import io
 import os
+import re
 from collections.abc import Callable
 from collections.abc import MutableMapping
 from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import IO
 from typing import Optional
 from typing import TYPE_CHECKING
 
 import pytest
 import yaml
 
+from .common import check_text_contents
 from .common import check_text_files
 from .common import perform_regression_check
 from .common import round_digits_in_data
+from .compression import open_decompressed
+from .compression import resolve_compression
+from .durations import timed
+from .durations import timed_check
 
 if TYPE_CHECKING:
     from pytest_datadir.plugin import LazyDataDir
@@ -23,6 +32,8 @@ class DataRegressionFixture:
     Implementation of `data_regression` fixture.
     """
 
+    THRESHOLD = 100  # Max. Number of differences reported by structural comparisons
+
     def __init__(
         self,
         datadir: "LazyDataDir",
@@ -35,12 +46,18 @@ class DataRegressionFixture:
         self.force_regen = False
         self.with_test_class_names = False
 
+    @timed_check
     def check(
         self,
         data_dict: MutableMapping[Any, Any],
         basename: str | None = None,
         fullpath: Optional["os.PathLike[str]"] = None,
         round_digits: int | None = None,
+        compression: str | None = None,
+        *,
+        structural: bool = False,
+        tolerances: dict[str, dict[str, float]] | None = None,
+        default_tolerance: dict[str, float] | None = None,
     ) -> None:
         """
         Checks the given dict against a previously recorded version, or generate a new file.
@@ -58,6 +75,30 @@ class DataRegressionFixture:
         :param round_digits:
             If given, round all floats in the dict to the given number of digits.
 
+        :param compression: compress the expected file with ``"gzip"``, ``"bz2"`` or
+            ``"xz"`` (adding ``.gz``, ``.bz2`` or ``.xz`` to its extension), or ``"none"``.
+            Defaults to the ``--regressions-compression`` option.
+
+        :param structural: compare the obtained and expected data as trees, instead of
+            their YAML text, and report their differences by key path, like
+            ``config.values[3]: obtained 1.5, expected 1.25``. The comparison stops after
+            the first ``THRESHOLD`` (100) differences. Enabled by ``tolerances`` and
+            ``default_tolerance``.
+
+        :param tolerances: dict mapping key paths, as reported, to tolerance settings for
+            the numbers in the data at these paths. Example::
+
+                tolerances={'config.values': dict(atol=1e-2)}
+
+        :param default_tolerance: dict mapping the default tolerance of the numbers for the
+            current check call. Example::
+
+                default_tolerance=dict(atol=1e-7, rtol=1e-18).
+
+            If not provided, the numbers are compared exactly (but integers and floats with
+            the same value are equal), unless they have tolerances. Missing ``atol`` or
+            ``rtol`` settings default to the ones of numpy's ``isclose`` function.
+
         ``basename`` and ``fullpath`` are exclusive.
         """
         __tracebackhide__ = True
@@ -65,36 +106,115 @@ class DataRegressionFixture:
         if round_digits is not None:
             round_digits_in_data(data_dict, round_digits)
 
+        compression = resolve_compression(self.request, compression)
+
+        with timed("dump"):
+            stream = io.BytesIO()
+            dump_yaml(data_dict, stream)
+            dumped_str = stream.getvalue()
+
         def dump(filename: Path) -> None:
             """Dump dict contents to the given filename"""
-
-            dumped_str = yaml.dump_all(
-                [data_dict],
-                Dumper=RegressionYamlDumper,
-                default_flow_style=False,
-                allow_unicode=True,
-                indent=2,
-                encoding="utf-8",
-            )
             with filename.open("wb") as f:
                 f.write(dumped_str)
 
+        def check_contents(
+            contents: bytes, obtained_filename: Path, expected_filename: Path
+        ) -> None:
+            check_text_contents(
+                contents.decode("UTF-8"),
+                obtained_filename,
+                expected_filename,
+                encoding="UTF-8",
+                compression=compression,
+            )
+
+        def check_tree_contents(
+            contents: bytes, obtained_filename: Path, expected_filename: Path
+        ) -> None:
+            self._check_tree_contents(
+                contents,
+                obtained_filename,
+                expected_filename,
+                compression,
+                tolerances,
+                default_tolerance,
+            )
+
+        def check_tree_files(obtained_filename: Path, expected_filename: Path) -> None:
+            check_tree_contents(
+                obtained_filename.read_bytes(), obtained_filename, expected_filename
+            )
+
+        check_fn: Callable[[Path, Path], None] = partial(
+            check_text_files, encoding="UTF-8", compression=compression
+        )
+        if structural or tolerances is not None or default_tolerance is not None:
+            check_contents = check_tree_contents
+            check_fn = check_tree_files
+
         perform_regression_check(
             datadir=self.datadir,
             original_datadir=self.original_datadir,
             request=self.request,
-            check_fn=partial(check_text_files, encoding="UTF-8"),
+            check_fn=check_fn,
             dump_fn=dump,
             extension=".yml",
             basename=basename,
             fullpath=fullpath,
             force_regen=self.force_regen,
             with_test_class_names=self.with_test_class_names,
+            obtained_contents=dumped_str,
+            check_contents_fn=check_contents,
+            compression=compression,
         )
 
     # non-PEP 8 alias used internally at ESSS
     Check = check
 
+    def _check_tree_contents(
+        self,
+        obtained_contents: bytes,
+        obtained_filename: Path,
+        expected_filename: Path,
+        compression: str | None,
+        tolerances: dict[str, dict[str, float]] | None,
+        default_tolerance: dict[str, float] | None,
+    ) -> None:
+        """
+        Compare the data of the obtained YAML contents with the data of the expected file,
+        as trees (see ``tree_diff``).
+
+        The obtained data is loaded back from its contents, so both have the same types,
+        like the ones given by custom representers.
+        """
+        from .tree_diff import tree_diff
+
+        __tracebackhide__ = True
+
+        with timed("load"):
+            obtained_data = load_yaml(obtained_contents)
+            with open_decompressed(expected_filename, compression) as f:
+                expected_data = load_yaml(f)
+
+        diff = tree_diff(
+            obtained_data,
+            expected_data,
+            tolerances,
+            default_tolerance,
+            max_differences=self.THRESHOLD,
+        )
+        if diff.differences:
+            with timed("report"):
+                msg = ["DATA DIFFERS:", str(expected_filename), str(obtained_filename)]
+                msg += [str(x) for x in diff.differences]
+                if diff.truncated:
+                    msg.append(
+                        f"Only showing the first {len(diff.differences)} differences."
+                    )
+                msg.append("To update values, use --force-regen option.")
+                raise AssertionError("\n".join(msg))
+
 
 class RegressionYamlDumper(yaml.SafeDumper):
     """
@@ -125,3 +245,115 @@ class RegressionYamlDumper(yaml.SafeDumper):
         yaml.add_multi_representer(
             data_type, multi_representer=representer_fn, Dumper=cls
         )
+
+
+if yaml.__with_libyaml__:
+
+    class CRegressionYamlDumper(yaml.cyaml.CEmitter, RegressionYamlDumper):
+        """
+        Same as ``RegressionYamlDumper``, whose representers it looks up, but emitting the
+        YAML documents with libyaml, which is several times faster.
+
+        It does not emit all the documents exactly as ``RegressionYamlDumper`` does, so it
+        is only used by ``dump_yaml`` for the documents which are emitted alike.
+        """
+
+        def __init__(self, stream: IO[bytes], **kwargs: Any) -> None:
+            # Initialized as ``yaml.CSafeDumper``, with the emitter of libyaml.
+            yaml.CSafeDumper.__init__(self, stream, **kwargs)
+
+
+# Tags of the standard YAML types, written as by both emitters.
+_STANDARD_TAG_PREFIX = "tag:yaml.org,2002:"
+
+# Characters written as they are by both emitters, without escaping or line breaks.
+_PRINTABLE_RE = re.compile("[\x20-\x7e\xa0-\ud7ff\ue000-\ufefe\uff00-\ufffd]*")
+
+
+def _use_libyaml() -> bool:
+    """
+    Return whether the YAML documents are written and read with libyaml: if PyYAML is built
+    with it, and ``yaml`` was not imported again since (as by the inline runs of
+    ``pytester``), its extension module only handling the node classes of the first import.
+    """
+    if not yaml.__with_libyaml__:
+        return False
+    return importlib.import_module("yaml._yaml").ScalarNode is yaml.ScalarNode
+
+
+def _emitted_alike(node: Any) -> bool:
+    """
+    Return whether the YAML ``node`` is emitted exactly alike by the pure Python emitter of
+    PyYAML and by libyaml.
+
+    They differ on the scalars with standard tags only when they have other characters than
+    the printable ones, which are escaped in double-quoted scalars broken into lines
+    differently, and on the keys which are not short and simple, like empty or long keys,
+    written as ``? key`` by one emitter only.
+    """
+    values = []
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if not node.tag.startswith(_STANDARD_TAG_PREFIX):
+            return False
+        if isinstance(node, yaml.ScalarNode):
+            if node.style is not None:
+                return False
+            values.append(node.value)
+        elif isinstance(node, yaml.MappingNode):
+            for key, value in node.value:
+                if not isinstance(key, yaml.ScalarNode):
+                    return False
+                # libyaml limits simple keys by their size in bytes.
+                max_length = 120 if key.value.isascii() else 30
+                if not 0 < len(key.value) <= max_length:
+                    return False
+                nodes.append(key)
+                nodes.append(value)
+        else:
+            nodes.extend(node.value)
+    return _PRINTABLE_RE.fullmatch("".join(values)) is not None
+
+
+def dump_yaml(data: Any, stream: IO[bytes]) -> None:
+    """
+    Dump ``data`` as a YAML document into ``stream``, encoded as UTF-8, as written by
+    ``data_regression``.
+
+    The data is represented by ``RegressionYamlDumper`` (with the custom representers, see
+    ``add_custom_yaml_representer``), and written by libyaml when PyYAML is built with it
+    and the document is emitted alike by both (see ``_emitted_alike``), so the written files
+    do not depend on it.
+    """
+    options = dict(
+        default_flow_style=False,
+        allow_unicode=True,
+        indent=2,
+        encoding="utf-8",
+    )
+    dumper: Any
+    if _use_libyaml():
+        dumper = CRegressionYamlDumper(stream, **options)
+        node = dumper.represent_data(data)
+        if not _emitted_alike(node):
+            dumper.dispose()
+            dumper = RegressionYamlDumper(stream, **options)
+    else:
+        dumper = RegressionYamlDumper(stream, **options)
+        node = dumper.represent_data(data)
+    try:
+        dumper.open()
+        dumper.serialize(node)
+        dumper.close()
+    finally:
+        dumper.dispose()
+
+
+def load_yaml(stream: bytes | io.BufferedIOBase) -> Any:
+    """
+    Load a YAML document written by ``dump_yaml``, with libyaml if PyYAML is built with it.
+    """
+    if _use_libyaml():
+        return yaml.load(stream, Loader=yaml.CSafeLoader)
+    return yaml.load(stream, Loader=yaml.SafeLoader)
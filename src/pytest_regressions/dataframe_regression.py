@@ -1,6 +1,15 @@
+import io
 import os
+from collections.abc import Callable
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
+from functools import cache
+from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import NamedTuple
 from typing import Optional
 from typing import TYPE_CHECKING
 
@@ -8,10 +17,162 @@ import pytest
 
 from .common import import_error_message
 from .common import perform_regression_check
+from .common import resolve_check_paths
+from .compression import compression_extension
+from .compression import resolve_compression
+from .durations import timed
+from .durations import timed_check
+from .session import atomic_write
+from .session import current_session
 
 if TYPE_CHECKING:
     from pytest_datadir.plugin import LazyDataDir
 
+# Formats of the expected files, mapped to their extensions.
+DATAFRAME_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+
+
+class _ArrowColumns(Mapping[str, Any]):
+    """
+    The columns of a Parquet or Feather file, as pandas series, which are only read (from
+    the memory-mapped file) when accessed, so the columns of large files are loaded one at
+    a time.
+    """
+
+    def __init__(self, filename: Path) -> None:
+        try:
+            import pyarrow.feather
+            import pyarrow.parquet
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("PyArrow"))
+
+        self._filename = filename
+        self._table = None
+        if filename.suffix == ".parquet":
+            schema = pyarrow.parquet.read_schema(filename, memory_map=True)
+        else:
+            # Columns of uncompressed Feather files are read without copies from the
+            # memory-mapped file, so the table is cheap to open.
+            self._table = pyarrow.feather.read_table(filename, memory_map=True)
+            schema = self._table.schema
+        self._names = list(schema.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, key: str) -> Any:
+        import pyarrow.parquet
+
+        if key not in self._names:
+            raise KeyError(key)
+        if self._table is not None:
+            table = self._table.select([key])
+        else:
+            table = pyarrow.parquet.read_table(
+                self._filename, columns=[key], memory_map=True
+            )
+        # Converted as a table, whose metadata restores the extension types of pandas
+        # (like ``Int64`` or ``string``).
+        return table.to_pandas().iloc[:, 0]
+
+
+class _ColumnDifferences(NamedTuple):
+    """
+    Differences between an obtained and an expected column.
+    """
+
+    # Number of rows of the columns.
+    size: int
+    # Positions of the differing rows, with their obtained and expected values.
+    rows: Any
+    obtained: Any
+    expected: Any
+    # Table of the first differences, shown in the report.
+    table: Any
+
+
+def _not_equal_categoricals(obtained: Any, expected: Any) -> Any:
+    """
+    Compare two categorical arrays by their values, whatever their categories, comparing
+    their codes instead of the values.
+    """
+    import numpy as np
+
+    if obtained.categories.equals(expected.categories):
+        expected_codes = expected.codes
+    else:
+        # Codes of the expected values in the obtained categories, -2 for the values
+        # which are not obtained categories.
+        indexer = obtained.categories.get_indexer(expected.categories)
+        indexer = np.where(indexer == -1, -2, indexer)
+        expected_codes = np.where(expected.codes == -1, -1, indexer[expected.codes])
+    return obtained.codes != expected_codes
+
+
+def _not_close_extension_arrays(
+    obtained: Any, expected: Any, tolerance_args: dict[str, float]
+) -> Any:
+    """
+    Compare pandas extension arrays with vectorized kernels on the arrays underlying them:
+    codes of categorical arrays, data and masks of nullable numbers, and Arrow arrays (like
+    the ``str`` arrays of pandas 3). Missing values are only equal to missing values.
+
+    :return: A mask of the elements which are not close, or ``None`` if the arrays have no
+        such kernel, and are to be compared as objects.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obtained, pd.Categorical) and isinstance(expected, pd.Categorical):
+        return _not_equal_categoricals(obtained, expected)
+
+    dtypes = (obtained.dtype, expected.dtype)
+    if all(
+        isinstance(dtype, pd.api.extensions.ExtensionDtype)
+        and dtype.kind in "biuf"
+        and hasattr(dtype, "numpy_dtype")
+        for dtype in dtypes
+    ):
+        # Nullable booleans, integers and floats (like ``Int64``).
+        obtained_na = np.asarray(obtained.isna())
+        expected_na = np.asarray(expected.isna())
+        obtained_data = obtained.to_numpy(
+            dtype=obtained.dtype.numpy_dtype, na_value=obtained.dtype.numpy_dtype.type()
+        )
+        expected_data = expected.to_numpy(
+            dtype=expected.dtype.numpy_dtype, na_value=expected.dtype.numpy_dtype.type()
+        )
+        if "f" in (obtained_data.dtype.kind, expected_data.dtype.kind):
+            not_close = ~np.isclose(
+                obtained_data, expected_data, equal_nan=True, **tolerance_args
+            )
+        else:
+            not_close = obtained_data != expected_data
+        return (obtained_na != expected_na) | (not_close & ~obtained_na & ~expected_na)
+
+    if not all(hasattr(array, "__arrow_array__") for array in (obtained, expected)):
+        return None
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ModuleNotFoundError:
+        return None
+    try:
+        obtained_arrow = pa.array(obtained)
+        expected_arrow = pa.array(expected)
+        not_equal = pc.fill_null(pc.not_equal(obtained_arrow, expected_arrow), True)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+        return None
+    both_null = pc.and_(pc.is_null(obtained_arrow), pc.is_null(expected_arrow))
+    return pc.and_not(not_equal, both_null).to_numpy(zero_copy_only=False)
+
 
 class DataFrameRegressionFixture:
     """
@@ -21,6 +182,8 @@ class DataFrameRegressionFixture:
     DISPLAY_PRECISION = 17  # Decimal places
     DISPLAY_WIDTH = 1000  # Max. Chars on outputs
     DISPLAY_MAX_COLUMNS = 1000  # Max. Number of columns (see #3)
+    THRESHOLD = 100  # Max. Number of differences shown for each column
+    CHUNKED_CSV_SIZE = 256 * 1024 * 1024  # Min. Size of CSV files compared in chunks
 
     def __init__(
         self,
@@ -51,7 +214,7 @@ class DataFrameRegressionFixture:
     ) -> None:
         """
         Check if data type of obtained and expected columns are the same. Fail if not.
-        Helper method used in _check_fn method.
+        Helper method used in _check_data_frames method.
         """
         try:
             import numpy as np
@@ -79,7 +242,7 @@ class DataFrameRegressionFixture:
     def _check_data_shapes(self, obtained_column: Any, expected_column: Any) -> None:
         """
         Check if obtained and expected columns have the same size.
-        Helper method used in _check_fn method.
+        Helper method used in _check_data_frames method.
         """
         __tracebackhide__ = True
 
@@ -93,9 +256,207 @@ class DataFrameRegressionFixture:
             )
             raise AssertionError(error_msg)
 
-    def _check_fn(self, obtained_filename: Path, expected_filename: Path) -> None:
+    def _check_data_fn(
+        self, obtained_data: Any, obtained_filename: Path, expected_filename: Path
+    ) -> None:
         """
-        Check if dict contents dumped to a file match the contents in expected file.
+        Check the obtained data frame against the expected file, used for the Parquet and
+        Feather formats, which keep the data types of the columns.
+
+        The columns of the expected file are only read when they are compared.
+        """
+        __tracebackhide__ = True
+
+        expected_data = _ArrowColumns(expected_filename)
+        self._check_data_frames(obtained_data, expected_data, obtained_filename)
+
+    def _check_contents_fn(
+        self,
+        obtained_contents: bytes,
+        obtained_filename: Path,
+        expected_filename: Path,
+        obtained_schema: dict[str, Any] | None = None,
+        expected_schema_filename: Path | None = None,
+        compression: str | None = None,
+    ) -> None:
+        """
+        Check the obtained CSV contents, parsed from memory, against the expected file,
+        decompressed with ``compression``.
+
+        When both the obtained and expected files have a schema, they are read with the
+        types of their columns, and only the expected columns which are also obtained are
+        read. Otherwise, the types are inferred from both files.
+
+        Files larger than ``CHUNKED_CSV_SIZE`` are read and compared in chunks of rows
+        (see ``_check_data_frame_chunks``), which is slower, but needs memory for a chunk
+        of each file only, besides the obtained contents. Without a schema, both files are
+        read with the types inferred from the first chunk of the obtained file (see
+        ``inferred_schema``), and read whole when the next chunks do not fit them.
+
+        Without a schema, the floats of both files are parsed exactly, as the expected file
+        may have been written with another text for them (see ``EXACT_FLOAT_PRECISION``).
+        """
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        from .csv_schema import chunk_rows
+        from .csv_schema import column_names
+        from .csv_schema import EXACT_FLOAT_PRECISION
+        from .csv_schema import inferred_schema
+        from .csv_schema import iter_csv
+        from .csv_schema import load_schema
+        from .csv_schema import read_csv
+
+        __tracebackhide__ = True
+
+        expected_schema = None
+        if obtained_schema is not None and expected_schema_filename is not None:
+            with timed("load"):
+                expected_schema = load_schema(expected_schema_filename)
+        if (
+            obtained_schema is not None
+            and max(len(obtained_contents), expected_filename.stat().st_size)
+            > self.CHUNKED_CSV_SIZE
+        ):
+            # Long files are read and compared a chunk at a time, with their schemas, or
+            # else with the types inferred from the first chunk of the obtained file.
+            rows = chunk_rows(obtained_contents)
+            schemas: list[tuple[Any, Any, list[str] | None, bool]] = []
+            if expected_schema is not None:
+                schemas.append(
+                    (
+                        obtained_schema,
+                        expected_schema,
+                        column_names(obtained_schema),
+                        False,
+                    )
+                )
+            with timed("load"):
+                schema = inferred_schema(obtained_contents, rows)
+            schemas.append((schema, schema, None, True))
+            for (
+                obtained_chunks_schema,
+                expected_chunks_schema,
+                columns,
+                exact,
+            ) in schemas:
+                try:
+                    self._check_data_frame_chunks(
+                        iter_csv(
+                            obtained_contents,
+                            obtained_chunks_schema,
+                            rows,
+                            exact=exact,
+                        ),
+                        iter_csv(
+                            expected_filename,
+                            expected_chunks_schema,
+                            rows,
+                            columns=columns,
+                            compression=compression,
+                            exact=exact,
+                        ),
+                        obtained_filename,
+                    )
+                    return
+                except ValueError:
+                    # Out of date schema, or types which do not fit the next chunks.
+                    pass
+            # Inferring the types of both files instead.
+            expected_schema = None
+
+        with timed("load"):
+            obtained_data = None
+            if obtained_schema is not None and expected_schema is not None:
+                try:
+                    obtained_data = read_csv(obtained_contents, obtained_schema)
+                    expected_data = read_csv(
+                        expected_filename,
+                        expected_schema,
+                        columns=list(obtained_data.columns),
+                        compression=compression,
+                    )
+                except ValueError:
+                    # Out of date schema, inferring the types of both files instead.
+                    obtained_data = None
+            if obtained_data is None:
+                obtained_data = pd.read_csv(
+                    io.BytesIO(obtained_contents),
+                    float_precision=EXACT_FLOAT_PRECISION,
+                )
+                expected_data = pd.read_csv(
+                    str(expected_filename),
+                    memory_map=True,
+                    compression=compression,
+                    float_precision=EXACT_FLOAT_PRECISION,
+                )
+        self._check_data_frames(obtained_data, expected_data, obtained_filename)
+
+    def _dump_schema_fn(
+        self,
+        schema: dict[str, Any] | None,
+        source_schema: Path,
+        compression_extension: str,
+        filename: Path,
+    ) -> list[str]:
+        """
+        Write the schema of a CSV file next to it, as an auxiliary file of the check.
+
+        :param source_schema: schema file of the expected file in the data directory,
+            written like the expected file, into the content store if it is enabled (other
+            schema files are of obtained files).
+        """
+        from .csv_schema import dump_schema
+        from .csv_schema import SCHEMA_EXTENSION
+        from .csv_schema import schema_filename
+
+        if schema is None:
+            return []
+        contents = dump_schema(schema)
+        schema_file = schema_filename(filename, compression_extension)
+        session = current_session()
+        if schema_file == source_schema and session is not None:
+            if session.store is not None:
+                session.write_stored_file(schema_file, contents, SCHEMA_EXTENSION)
+            else:
+                session.write_file(schema_file, contents)
+        else:
+            atomic_write(schema_file, lambda f: f.write_bytes(contents))
+        return [str(schema_file)]
+
+    def _check_data_frames(
+        self, obtained_data: Any, expected_data: Any, obtained_filename: Path
+    ) -> None:
+        """
+        Compare the obtained and expected data frames, as loaded from their files (or, for
+        the expected data, a mapping of its columns).
+
+        The report shows the first ``THRESHOLD`` differences of each column. If there are
+        more, all of them are written to an NPZ file next to the obtained file (see
+        ``_dump_differences``).
+        """
+        __tracebackhide__ = True
+
+        differences_dict, warn_diffs = self._compare_data_frames(
+            obtained_data, expected_data
+        )
+        self._report_differences(differences_dict, warn_diffs, obtained_filename)
+
+    def _check_data_frame_chunks(
+        self,
+        obtained_chunks: Iterable[Any],
+        expected_chunks: Iterable[Any],
+        obtained_filename: Path,
+    ) -> None:
+        """
+        Same as ``_check_data_frames``, but compares data frames read in chunks of rows, so
+        only a chunk of each is in memory at a time.
+
+        The chunks of both data frames may have different sizes: the rows they have in
+        common are compared together, and the differences of all of them are accumulated
+        into the report.
         """
         try:
             import numpy as np
@@ -108,11 +469,91 @@ class DataFrameRegressionFixture:
 
         __tracebackhide__ = True
 
-        obtained_data = pd.read_csv(str(obtained_filename))
-        expected_data = pd.read_csv(str(expected_filename))
+        chunk_differences: dict[Any, list[_ColumnDifferences]] = {}
+        warn_diffs = False
+        obtained_iter = iter(obtained_chunks)
+        expected_iter = iter(expected_chunks)
+        obtained_chunk = next(obtained_iter, None)
+        expected_chunk = next(expected_iter, None)
+        offset = 0
+        while obtained_chunk is not None and expected_chunk is not None:
+            size = min(len(obtained_chunk), len(expected_chunk))
+            # Indexed as in the whole data frames, for the report.
+            index = pd.RangeIndex(offset, offset + size)
+            differences_dict, chunk_warn_diffs = self._compare_data_frames(
+                obtained_chunk.iloc[:size].set_axis(index),
+                expected_chunk.iloc[:size].set_axis(index),
+            )
+            warn_diffs |= chunk_warn_diffs
+            for k, differences in differences_dict.items():
+                chunk_differences.setdefault(k, []).append(
+                    differences._replace(rows=differences.rows + offset)
+                )
+            offset += size
+            obtained_chunk = obtained_chunk.iloc[size:]
+            expected_chunk = expected_chunk.iloc[size:]
+            if len(obtained_chunk) == 0:
+                obtained_chunk = next(obtained_iter, None)
+            if len(expected_chunk) == 0:
+                expected_chunk = next(expected_iter, None)
+
+        if obtained_chunk is not None or expected_chunk is not None:
+            obtained_size = offset
+            if obtained_chunk is not None:
+                obtained_size += len(obtained_chunk) + sum(map(len, obtained_iter))
+            expected_size = offset
+            if expected_chunk is not None:
+                expected_size += len(expected_chunk) + sum(map(len, expected_iter))
+            error_msg = (
+                "Obtained and expected data shape are not the same.\n"
+                "Obtained: %s\n"
+                "Expected: %s\n" % ((obtained_size,), (expected_size,))
+            )
+            raise AssertionError(error_msg)
+
+        differences_dict = {}
+        for k, differences_list in chunk_differences.items():
+            differences_dict[k] = _ColumnDifferences(
+                size=offset,
+                rows=np.concatenate([x.rows for x in differences_list]),
+                obtained=np.concatenate([x.obtained for x in differences_list]),
+                expected=np.concatenate([x.expected for x in differences_list]),
+                table=pd.concat([x.table for x in differences_list]).iloc[
+                    : self.THRESHOLD
+                ],
+            )
+        self._report_differences(differences_dict, warn_diffs, obtained_filename)
+
+    def _compare_data_frames(
+        self,
+        obtained_data: Any,
+        expected_data: Any,
+        equal_columns: Collection[Any] = (),
+    ) -> tuple[dict[Any, "_ColumnDifferences"], bool]:
+        """
+        Compare the columns of the obtained and expected data frames (or mappings of their
+        columns).
 
-        comparison_tables_dict = {}
+        :param equal_columns: columns already known to be equal, which are not compared.
+        :return: The differences of the columns which are not equal, and whether any of
+            them has values whose differences cannot be computed.
+        """
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        __tracebackhide__ = True
+
+        equal_columns = set(equal_columns)
+        if isinstance(expected_data, pd.DataFrame):
+            equal_columns |= self._equal_numeric_columns(obtained_data, expected_data)
+
+        differences_dict = {}
+        warn_diffs = False
         for k in obtained_data.keys():
+            if k in equal_columns:
+                continue
             obtained_column = obtained_data[k]
             expected_column = expected_data.get(k)
 
@@ -129,71 +570,319 @@ class DataFrameRegressionFixture:
                 error_msg += "To update values, use --force-regen option.\n\n"
                 raise AssertionError(error_msg)
 
+            differences = self._compare_columns(k, obtained_column, expected_column)
+            if differences is not None:
+                differences_dict[k] = differences
+                # Objects, strings and categorical values.
+                warn_diffs |= obtained_column.dtype.kind == "O"
+        return differences_dict, warn_diffs
+
+    def _report_differences(
+        self,
+        differences_dict: dict[Any, "_ColumnDifferences"],
+        warn_diffs: bool,
+        obtained_filename: Path,
+    ) -> None:
+        """
+        Fail with a report of the differences of the columns, if any.
+        """
+        __tracebackhide__ = True
+
+        if len(differences_dict) > 0:
+            with timed("report"):
+                error_msg = "Values are not sufficiently close.\n"
+                error_msg += "To update values, use --force-regen option.\n\n"
+                for k, differences in differences_dict.items():
+                    error_msg += f"{k}:\n{differences.table}\n"
+                    error_msg += self._differences_summary(differences)
+                    error_msg += "\n"
+                filename = obtained_filename.with_suffix(".mismatches.npz")
+                if any(len(x.rows) > self.THRESHOLD for x in differences_dict.values()):
+                    self._dump_differences(filename, differences_dict)
+                    error_msg += f"All the differences were written to: {filename}\n\n"
+                else:
+                    # Written by a previous failure.
+                    filename.unlink(missing_ok=True)
+                if warn_diffs:
+                    error_msg += (
+                        "WARNING: diffs for this kind of data type cannot be computed."
+                    )
+                raise AssertionError(error_msg)
+
+    def _differences_summary(self, differences: "_ColumnDifferences") -> str:
+        """
+        Summarize the differences of a column: their number, and statistics of the errors
+        for numbers.
+        """
+        import numpy as np
+
+        count = len(differences.rows)
+        pct = 100 * count / differences.size
+        summary = (
+            f"  Number of differences: {count} / {differences.size} ({pct:.1f}%)\n"
+        )
+        if count > self.THRESHOLD:
+            summary += f"  Only showing first {self.THRESHOLD} differences.\n"
+
+        obtained = differences.obtained
+        expected = differences.expected
+        if (
+            count <= 1
+            or obtained.dtype.kind not in "iuf"
+            or expected.dtype.kind not in "iuf"
+        ):
+            return summary
+        # Missing values on either side have no error.
+        with np.errstate(invalid="ignore", over="ignore"):
+            abs_errors = np.abs(obtained.astype(float) - expected.astype(float))
+        abs_errors = abs_errors[~np.isnan(abs_errors)]
+        if len(abs_errors) == 0:
+            return summary
+        summary += "  Statistics are computed for differing elements only.\n"
+        summary += "  Stats for abs(obtained - expected):\n"
+        summary += f"    Max:     {abs_errors.max()}\n"
+        summary += f"    Mean:    {abs_errors.mean()}\n"
+        summary += f"    Median:  {np.median(abs_errors)}\n"
+
+        nonzero = expected != 0
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            rel_errors = np.abs(
+                (obtained[nonzero].astype(float) - expected[nonzero])
+                / expected[nonzero]
+            )
+        rel_errors = rel_errors[~np.isnan(rel_errors)]
+        if len(rel_errors) == 0:
+            summary += "  Relative errors are not reported because all expected values are zero.\n"
+        else:
+            summary += "  Stats for abs(obtained - expected) / abs(expected):\n"
+            summary += f"    Max:     {rel_errors.max()}\n"
+            summary += f"    Mean:    {rel_errors.mean()}\n"
+            summary += f"    Median:  {np.median(rel_errors)}\n"
+        return summary
+
+    def _dump_differences(
+        self, filename: Path, differences_dict: dict[Any, "_ColumnDifferences"]
+    ) -> None:
+        """
+        Write all the differences to an NPZ file, with the ``{column}.rows`` (positions of
+        the differing rows), ``{column}.obtained`` and ``{column}.expected`` arrays of
+        each differing column. Values which are not numbers are written as strings.
+        """
+        import numpy as np
+
+        from .npz import write_npz
+
+        def as_array(values: Any) -> Any:
+            if values.dtype.kind == "O":
+                return values.astype(str)
+            return values
+
+        arrays = {}
+        for k, differences in differences_dict.items():
+            arrays[f"{k}.rows"] = differences.rows
+            arrays[f"{k}.obtained"] = as_array(differences.obtained)
+            arrays[f"{k}.expected"] = as_array(differences.expected)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with filename.open("wb") as f:
+            write_npz(f, arrays)
+
+    def _equal_numeric_columns(
+        self, obtained_data: Any, expected_data: Any
+    ) -> set[Any]:
+        """
+        Find the numeric columns of the obtained data frame which are equal to the expected
+        ones, up to their tolerances.
+
+        Columns with the same data types and tolerances are compared together, as 2-D
+        arrays, so wide data frames are not compared one column at a time: only the other
+        columns are left to ``_compare_columns``, which also reports the differences.
+        """
+        import numpy as np
+
+        if (
+            len(obtained_data) != len(expected_data)
+            or not obtained_data.columns.is_unique
+            or not expected_data.columns.is_unique
+        ):
+            return set()
+
+        expected_dtypes = expected_data.dtypes.to_dict()
+        blocks: dict[tuple[Any, ...], list[int]] = {}
+        for i, (k, obtained_dtype) in enumerate(obtained_data.dtypes.items()):
+            expected_dtype = expected_dtypes.get(k)
+            if not all(
+                isinstance(dtype, np.dtype) and dtype.kind in "biuf"
+                for dtype in (obtained_dtype, expected_dtype)
+            ):
+                continue
+            # Columns of different types are left to ``_check_data_types``, unless they
+            # are both numbers.
+            if obtained_dtype != expected_dtype and "b" in (
+                obtained_dtype.kind,
+                expected_dtype.kind,
+            ):
+                continue
             tolerance_args = self._tolerances_dict.get(k, self._default_tolerance)
+            block_key = (
+                obtained_dtype,
+                expected_dtype,
+                tuple(sorted(tolerance_args.items())),
+            )
+            blocks.setdefault(block_key, []).append(i)
+
+        equal_columns = set()
+        for (obtained_dtype, _, tolerance_items), positions in blocks.items():
+            keys = obtained_data.columns[positions]
+            obtained_values = obtained_data.iloc[:, positions].to_numpy()
+            expected_values = expected_data.iloc[
+                :, expected_data.columns.get_indexer(keys)
+            ].to_numpy()
+            if obtained_dtype.kind == "f":
+                not_close_mask = ~np.isclose(
+                    obtained_values,
+                    expected_values,
+                    equal_nan=True,
+                    **dict(tolerance_items),
+                )
+            else:
+                not_close_mask = obtained_values != expected_values
+            equal_columns.update(keys[~not_close_mask.any(axis=0)])
+        return equal_columns
 
-            self._check_data_types(k, obtained_column, expected_column)
-            self._check_data_shapes(obtained_column, expected_column)
+    def _compare_columns(
+        self, k: Any, obtained_column: Any, expected_column: Any
+    ) -> "_ColumnDifferences | None":
+        """
+        Compare an obtained column with the expected one.
 
-            if np.issubdtype(obtained_column.values.dtype.type, np.inexact):
+        :return: The differences, or ``None`` if the columns are equal, up to their
+            tolerances.
+        """
+        try:
+            import numpy as np
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("NumPy"))
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        __tracebackhide__ = True
+
+        tolerance_args = self._tolerances_dict.get(k, self._default_tolerance)
+
+        self._check_data_types(k, obtained_column, expected_column)
+        self._check_data_shapes(obtained_column, expected_column)
+
+        # Extension arrays (categorical columns, which keep their type in Parquet and
+        # Feather files, nullable numbers and strings) are compared natively.
+        not_close_mask = _not_close_extension_arrays(
+            obtained_column.array, expected_column.array, tolerance_args
+        )
+        if not_close_mask is None:
+            obtained_values = obtained_column.values
+            expected_values = expected_column.values
+            if np.issubdtype(obtained_values.dtype.type, np.inexact):
                 not_close_mask = ~np.isclose(
-                    obtained_column.values,
-                    expected_column.values,
+                    obtained_values,
+                    expected_values,
                     equal_nan=True,
                     **tolerance_args,
                 )
             else:
-                not_close_mask = obtained_column.values != expected_column.values
+                not_close_mask = obtained_values != expected_values
                 # If Empty/NaN data is expected, then the values are equal:
                 not_close_mask[
-                    np.logical_and(
-                        pd.isna(obtained_column.values), pd.isna(expected_column.values)
-                    )
+                    np.logical_and(pd.isna(obtained_values), pd.isna(expected_values))
                 ] = False
 
-            if np.any(not_close_mask):
-                diff_ids = np.where(not_close_mask)[0]
-                diff_obtained_data = obtained_column[diff_ids]
-                diff_expected_data = expected_column[diff_ids]
-                if obtained_column.values.dtype == bool:
-                    diffs = np.logical_xor(obtained_column, expected_column)[diff_ids]
-                elif (
-                    obtained_column.values.dtype == object
-                    or obtained_column.values.dtype == "str"
-                ):
-                    diffs = diff_obtained_data.copy()
-                    diffs[:] = "?"
-                else:
-                    diffs = np.abs(obtained_column - expected_column)[diff_ids]
+        if not np.any(not_close_mask):
+            return None
 
-                comparison_table = pd.concat(
-                    [diff_obtained_data, diff_expected_data, diffs], axis=1
-                )
-                comparison_table.columns = [f"obtained_{k}", f"expected_{k}", "diff"]
-                comparison_tables_dict[k] = comparison_table
-
-        if len(comparison_tables_dict) > 0:
-            error_msg = "Values are not sufficiently close.\n"
-            error_msg += "To update values, use --force-regen option.\n\n"
-            for k, comparison_table in comparison_tables_dict.items():
-                error_msg += f"{k}:\n{comparison_table}\n\n"
-            if (
-                obtained_column.values.dtype == object
-                or obtained_column.values.dtype == "str"
-            ):
-                error_msg += (
-                    "WARNING: diffs for this kind of data type cannot be computed."
-                )
-            raise AssertionError(error_msg)
+        diff_ids = np.flatnonzero(not_close_mask)
+
+        # Only the first differences are shown.
+        shown_ids = diff_ids[: self.THRESHOLD]
+        diff_obtained_data = obtained_column.iloc[shown_ids]
+        diff_expected_data = expected_column.iloc[shown_ids]
+        if obtained_column.dtype.kind == "b":
+            diffs = np.logical_xor(diff_obtained_data, diff_expected_data)
+        elif obtained_column.dtype.kind == "O":
+            # Objects, strings and categorical values.
+            diff_obtained_data = diff_obtained_data.astype(object)
+            diff_expected_data = diff_expected_data.astype(object)
+            diffs = diff_obtained_data.copy()
+            diffs[:] = "?"
+        else:
+            diffs = np.abs(diff_obtained_data - diff_expected_data)
 
-    def _dump_fn(self, data_object: Any, filename: Path) -> None:
+        comparison_table = pd.concat(
+            [diff_obtained_data, diff_expected_data, diffs], axis=1
+        )
+        comparison_table.columns = [f"obtained_{k}", f"expected_{k}", "diff"]
+        return _ColumnDifferences(
+            size=len(obtained_column),
+            rows=diff_ids,
+            obtained=obtained_column.iloc[diff_ids].to_numpy(),
+            expected=expected_column.iloc[diff_ids].to_numpy(),
+            table=comparison_table,
+        )
+
+    def _serialize_fn(self, data_object: Any, format: str = "csv") -> bytes:
         """
-        Dump dict contents to the given filename
+        Serialize the data frame to the contents of a file in the given format.
+
+        In Parquet and Feather files, the index is stored as the first column, as in CSV
+        files.
         """
-        data_object.to_csv(
-            str(filename),
-            float_format=f"%.{DataFrameRegressionFixture.DISPLAY_PRECISION}g",
-        )
+        if format == "csv":
+            from .csv_writer import to_csv
+
+            return to_csv(data_object).encode("utf-8")
 
+        try:
+            import pyarrow as pa
+            import pyarrow.feather
+            import pyarrow.parquet
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("PyArrow"))
+
+        table = pa.Table.from_pandas(data_object.reset_index(), preserve_index=False)
+        buffer = pa.BufferOutputStream()
+        if format == "parquet":
+            pyarrow.parquet.write_table(table, buffer)
+        else:
+            # Uncompressed, so the columns can be read without copies from the
+            # memory-mapped file.
+            pyarrow.feather.write_feather(table, buffer, compression="uncompressed")
+        return bytes(buffer.getvalue().to_pybytes())
+
+    def _csv_schema_fn(self, data_object: Any) -> dict[str, Any] | None:
+        """
+        Return the schema of the CSV file of the data frame (see ``csv_schema``).
+        """
+        from .csv_schema import csv_schema
+
+        return csv_schema(data_object)
+
+    def _resolve_format(self, format: str | None) -> str:
+        """
+        Format of the expected file of a check: the given ``format``, or the default of the
+        session if it is None.
+        """
+        if format is None:
+            format = self.request.config.getoption("regressions_dataframe_format", None)
+        if format is None:
+            return "csv"
+        if format not in DATAFRAME_FORMATS:
+            raise ValueError(
+                "Invalid format {!r}, must be one of: {}".format(
+                    format, ", ".join(DATAFRAME_FORMATS)
+                )
+            )
+        return format
+
+    @timed_check
     def check(
         self,
         data_frame: Any,
@@ -201,6 +890,9 @@ class DataFrameRegressionFixture:
         fullpath: Optional["os.PathLike[str]"] = None,
         tolerances: dict[str, dict[str, float]] | None = None,
         default_tolerance: dict[str, float] | None = None,
+        *,
+        compression: str | None = None,
+        format: str | None = None,
     ) -> None:
         """
         Checks a pandas dataframe, containing only numeric data, against a previously recorded version, or generate a new file.
@@ -237,6 +929,27 @@ class DataFrameRegressionFixture:
 
             If not provided, will use defaults from numpy's ``isclose`` function.
 
+        :param compression: compress the expected file with ``"gzip"``, ``"bz2"`` or
+            ``"xz"`` (adding ``.gz``, ``.bz2`` or ``.xz`` to its extension), or ``"none"``.
+            Defaults to the ``--regressions-compression`` option. Only supported by the
+            ``"csv"`` format.
+
+        :param format: format of the expected file:
+
+            * ``"csv"``: a CSV file, with floats written as the shortest text which reads
+              back as the same value. The data types of the columns are written to a schema
+              file next to it (``test_foo.schema.json``), so it is read with these types
+              instead of inferring them. Files larger than ``CHUNKED_CSV_SIZE`` (256 MiB)
+              are read and compared in chunks of rows, so only the obtained data, its
+              CSV text and a chunk of each file are in memory.
+            * ``"parquet"`` or ``"feather"``: a Parquet or Feather file (requires
+              ``pyarrow``), smaller and faster to read, which keeps the data types of the
+              columns (like ``float32`` or categorical columns). Expected files are
+              memory-mapped, and their columns are loaded one at a time as they are
+              compared.
+
+            Defaults to the ``--regressions-dataframe-format`` option, or ``"csv"``.
+
         ``basename`` and ``fullpath`` are exclusive.
         """
         try:
@@ -244,8 +957,6 @@ class DataFrameRegressionFixture:
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("Pandas"))
 
-        import functools
-
         __tracebackhide__ = True
 
         assert isinstance(data_frame, pd.DataFrame), (
@@ -261,6 +972,8 @@ class DataFrameRegressionFixture:
                 continue
 
             # Arrays of strings are supported.
+            if isinstance(array.dtype, pd.StringDtype):
+                continue
             if (array.dtype.kind == "O") and (type(array.iloc[0]) is str):
                 continue
             # Rejected: timedelta, objects, zero-terminated bytes, unicode strings and raw data
@@ -277,18 +990,120 @@ class DataFrameRegressionFixture:
             default_tolerance = {}
         self._default_tolerance = default_tolerance
 
-        dump_fn = functools.partial(self._dump_fn, data_frame)
+        self._perform_check(data_frame, basename, fullpath, compression, format)
+
+    def _perform_check(
+        self,
+        data_object: Any,
+        basename: str | None,
+        fullpath: Optional["os.PathLike[str]"],
+        compression: str | None,
+        format: str | None,
+    ) -> None:
+        """
+        Check the data frame (or other data, see ``_serialize_fn``), once validated, against
+        its expected file in the given format.
+        """
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        __tracebackhide__ = True
+
+        format = self._resolve_format(format)
+        check_contents_fn: Callable[[bytes, Path, Path], None] | None = None
+        check_data_fn = None
+        dump_aux_fn: Callable[[Path], list[str]] = lambda filename: []
+        if format == "csv":
+            from .csv_schema import SCHEMA_EXTENSION
+            from .csv_schema import schema_filename
+
+            compression = resolve_compression(self.request, compression)
+            with timed("dump"):
+                contents = self._serialize_fn(data_object)
+                schema = self._csv_schema_fn(data_object)
+
+            @cache
+            def resolve_schema_paths() -> Any:
+                # The schema file is looked up like the expected file, but only when it is
+                # read or written, not when the expected file has the obtained contents.
+                with timed("resolve"):
+                    return resolve_check_paths(
+                        datadir=self.datadir,
+                        original_datadir=self.original_datadir,
+                        request=self.request,
+                        extension=SCHEMA_EXTENSION,
+                        basename=basename,
+                        fullpath=(
+                            schema_filename(
+                                fullpath, compression_extension(compression)
+                            )
+                            if fullpath
+                            else None
+                        ),
+                        with_test_class_names=self._with_test_class_names,
+                    )
+
+            def check_csv_contents(
+                obtained_contents: bytes,
+                obtained_filename: Path,
+                expected_filename: Path,
+            ) -> None:
+                __tracebackhide__ = True
+                schema_paths = resolve_schema_paths()
+                # Compared as read back from the CSV contents, like the expected data.
+                self._check_contents_fn(
+                    obtained_contents,
+                    obtained_filename,
+                    expected_filename,
+                    obtained_schema=schema,
+                    expected_schema_filename=(
+                        schema_paths.expected if schema_paths.expected_exists else None
+                    ),
+                    compression=compression,
+                )
+
+            def dump_csv_schema(filename: Path) -> list[str]:
+                return self._dump_schema_fn(
+                    schema,
+                    resolve_schema_paths().source,
+                    compression_extension(compression),
+                    filename,
+                )
+
+            check_contents_fn = check_csv_contents
+            dump_aux_fn = dump_csv_schema
+        else:
+            # The session default compression only applies to CSV files.
+            if compression not in (None, "none"):
+                raise ValueError(
+                    f"Compression is only supported by the csv format, not {format!r}"
+                )
+            compression = None
+            obtained_data = data_object.reset_index()
+            with timed("dump"):
+                contents = self._serialize_fn(data_object, format)
+            check_data_fn = partial(self._check_data_fn, obtained_data)
+
+        def dump_fn(filename: Path) -> None:
+            filename.write_bytes(contents)
 
         with pd.option_context(*self._pandas_display_options):
             perform_regression_check(
                 datadir=self.datadir,
                 original_datadir=self.original_datadir,
                 request=self.request,
-                check_fn=self._check_fn,
+                check_fn=None,
                 dump_fn=dump_fn,
-                extension=".csv",
+                extension=DATAFRAME_FORMATS[format],
                 basename=basename,
                 fullpath=fullpath,
                 force_regen=self._force_regen,
                 with_test_class_names=self._with_test_class_names,
+                obtained_contents=contents,
+                check_contents_fn=check_contents_fn,
+                check_data_fn=check_data_fn,
+                compression=compression,
+                dump_aux_fn=dump_aux_fn,
             )
@@ -0,0 +1,507 @@
+"""
+Line-based diff used to report text differences.
+
+:mod:`difflib` scales quadratically with the number of lines, which makes it unusable for
+large reference files. Here lines are first mapped to integers, then common prefixes and
+suffixes are stripped and the remaining lines are aligned with the patience algorithm (using
+lines that are unique on both sides as anchors), falling back to Myers' algorithm with a
+bounded number of edits between anchors. The output format is the same as
+:func:`difflib.unified_diff`.
+"""
+
+import bisect
+from collections import Counter
+from collections.abc import Iterator
+from collections.abc import Sequence
+from dataclasses import dataclass
+from html import escape
+
+# Opcodes, in the same format as difflib.SequenceMatcher.get_opcodes().
+Opcode = tuple[str, int, int, int, int]
+
+# Maximum number of edits Myers' algorithm explores in a region without unique lines before
+# giving up and reporting the whole region as replaced.
+MAX_EDITS = 200
+
+# After a change, the next equal lines are first searched within this many lines, requiring
+# this many consecutive equal lines.
+SYNC_WINDOW = 64
+SYNC_LINES = 3
+
+
+@dataclass(frozen=True)
+class UnifiedDiff:
+    """
+    The first hunks of a unified diff, together with totals for the whole diff.
+    """
+
+    lines: list[str]
+    hunk_count: int
+    shown_hunk_count: int
+    removed_line_count: int
+    added_line_count: int
+    # Number of lines the full unified diff would have, including the file headers.
+    total_line_count: int
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.lines) < self.total_line_count
+
+
+def unified_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromfile: str = "",
+    tofile: str = "",
+    n: int = 3,
+    max_lines: int | None = None,
+) -> UnifiedDiff:
+    """
+    Compute the unified diff between the lines ``a`` and ``b``.
+
+    :param n: number of context lines around each change.
+    :param max_lines: if given, only the hunks that fit in this number of lines are included in
+        ``lines``; if not even the first hunk fits, only its first lines are included. Totals
+        are always computed for the whole diff.
+    """
+    groups = list(group_opcodes(diff_opcodes(a, b), n))
+
+    lines = [f"--- {fromfile}", f"+++ {tofile}"]
+    total_line_count = len(lines)
+    shown_hunk_count = 0
+    removed = added = 0
+    for group in groups:
+        hunk_line_count = 1
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                hunk_line_count += i2 - i1
+            else:
+                removed += i2 - i1
+                added += j2 - j1
+                hunk_line_count += (i2 - i1) + (j2 - j1)
+        total_line_count += hunk_line_count
+
+        if max_lines is None or total_line_count <= max_lines:
+            lines += format_unified_hunk(group, a, b)
+            shown_hunk_count += 1
+        elif shown_hunk_count == 0:
+            # Even the first hunk does not fit: show only its first lines.
+            lines += format_unified_hunk(group, a, b)[: max(max_lines - len(lines), 1)]
+            shown_hunk_count = 1
+
+    return UnifiedDiff(
+        lines=lines,
+        hunk_count=len(groups),
+        shown_hunk_count=shown_hunk_count,
+        removed_line_count=removed,
+        added_line_count=added,
+        total_line_count=total_line_count,
+    )
+
+
+_HTML_TEMPLATE = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{fromdesc} vs {todesc}</title>
+<style type="text/css">
+    table.diff {{font-family: monospace; border-collapse: collapse; border: medium}}
+    td {{white-space: pre-wrap; vertical-align: top; padding: 0 4px}}
+    td.diff_num {{text-align: right; color: #888}}
+    .diff_header {{background-color: #e0e0e0}}
+    .diff_sep {{background-color: #c0c0c0}}
+    .diff_add {{background-color: #aaffaa}}
+    .diff_chg {{background-color: #ffff77}}
+    .diff_sub {{background-color: #ffaaaa}}
+</style>
+</head>
+<body>
+<table class="diff" summary="Differences">
+<thead><tr class="diff_header"><th colspan="2">{fromdesc}</th><th colspan="2">{todesc}</th></tr></thead>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+
+def html_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromdesc: str = "",
+    todesc: str = "",
+    n: int = 5,
+) -> str:
+    """
+    Render the differences between the lines ``a`` and ``b`` as a side-by-side HTML table.
+
+    Unlike :class:`difflib.HtmlDiff`, only the changes and ``n`` lines of context around them
+    are shown and no intraline differences are computed, so this takes time proportional to
+    the size of the diff.
+    """
+
+    def row(i: int, left: str | None, j: int, right: str | None, css: str) -> str:
+        cells = []
+        for number, text in ((i, left), (j, right)):
+            if text is None:
+                cells.append('<td class="diff_num"></td><td></td>')
+            else:
+                css_attr = f' class="{css}"' if css else ""
+                cells.append(
+                    f'<td class="diff_num">{number}</td>'
+                    f"<td{css_attr}>{escape(text)}</td>"
+                )
+        return "<tr>" + "".join(cells) + "</tr>"
+
+    rows = []
+    for group in group_opcodes(diff_opcodes(a, b), n):
+        rows.append('<tr class="diff_sep"><td colspan="4">&#8942;</td></tr>')
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    rows.append(row(i + 1, a[i], j + 1, b[j], ""))
+                continue
+            css = {"replace": "diff_chg", "delete": "diff_sub", "insert": "diff_add"}[
+                tag
+            ]
+            for k in range(max(i2 - i1, j2 - j1)):
+                left = i1 + k < i2
+                right = j1 + k < j2
+                rows.append(
+                    row(
+                        i1 + k + 1,
+                        a[i1 + k] if left else None,
+                        j1 + k + 1,
+                        b[j1 + k] if right else None,
+                        css,
+                    )
+                )
+
+    return _HTML_TEMPLATE.format(
+        fromdesc=escape(fromdesc), todesc=escape(todesc), rows="\n".join(rows)
+    )
+
+
+def diff_opcodes(a: Sequence[str], b: Sequence[str]) -> list[Opcode]:
+    """
+    Return the opcodes that transform ``a`` into ``b``, in the same format as
+    :meth:`difflib.SequenceMatcher.get_opcodes`.
+    """
+    # Only the lines between the common prefix and suffix need to be aligned.
+    a = list(a)
+    b = list(b)
+    prefix = _common_prefix_length(a, b, 0, len(a), 0, len(b))
+    suffix = _common_suffix_length(a, b, prefix, len(a), prefix, len(b))
+    a_lines = a[prefix : len(a) - suffix]
+    b_lines = b[prefix : len(b) - suffix]
+    middle_blocks = _matching_blocks(list(map(hash, a_lines)), list(map(hash, b_lines)))
+    if not all(
+        a_lines[i : i + size] == b_lines[j : j + size] for i, j, size in middle_blocks
+    ):
+        # Hash collision: number the distinct lines instead.
+        ids: dict[str, int] = {}
+        a_ids = [ids.setdefault(line, len(ids)) for line in a_lines]
+        b_ids = [ids.setdefault(line, len(ids)) for line in b_lines]
+        middle_blocks = _matching_blocks(a_ids, b_ids)
+
+    blocks = [(0, 0, prefix)]
+    blocks += [(i + prefix, j + prefix, size) for i, j, size in middle_blocks]
+    blocks.append((len(a) - suffix, len(b) - suffix, suffix))
+
+    opcodes: list[Opcode] = []
+    i = j = 0
+    for mi, mj, size in blocks + [(len(a), len(b), 0)]:
+        if i < mi and j < mj:
+            opcodes.append(("replace", i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(("delete", i, mi, j, mj))
+        elif j < mj:
+            opcodes.append(("insert", i, mi, j, mj))
+        if size:
+            opcodes.append(("equal", mi, mi + size, mj, mj + size))
+        i, j = mi + size, mj + size
+    return opcodes
+
+
+def group_opcodes(opcodes: list[Opcode], n: int = 3) -> Iterator[list[Opcode]]:
+    """
+    Group opcodes into hunks with up to ``n`` lines of context, like
+    :meth:`difflib.SequenceMatcher.get_grouped_opcodes`.
+    """
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    group: list[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def format_unified_hunk(
+    group: list[Opcode], a: Sequence[str], b: Sequence[str]
+) -> list[str]:
+    """
+    Format a group of opcodes as a unified diff hunk (without line terminators).
+    """
+    first, last = group[0], group[-1]
+    lines = [
+        "@@ -{} +{} @@".format(
+            _format_range(first[1], last[2]), _format_range(first[3], last[4])
+        )
+    ]
+    for tag, i1, i2, j1, j2 in group:
+        if tag == "equal":
+            lines += [" " + line for line in a[i1:i2]]
+            continue
+        lines += ["-" + line for line in a[i1:i2]]
+        lines += ["+" + line for line in b[j1:j2]]
+    return lines
+
+
+def _format_range(start: int, stop: int) -> str:
+    """Convert a range to the "ed" format, as done by difflib."""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _matching_blocks(a: list[int], b: list[int]) -> list[tuple[int, int, int]]:
+    """
+    Return the sorted ``(i, j, size)`` blocks of lines of ``a`` and ``b`` aligned by the diff.
+    """
+    blocks: list[tuple[int, int, int]] = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        a0, a1, b0, b1 = regions.pop()
+
+        size = _common_prefix_length(a, b, a0, a1, b0, b1)
+        if size:
+            blocks.append((a0, b0, size))
+            a0 += size
+            b0 += size
+        size = _common_suffix_length(a, b, a0, a1, b0, b1)
+        if size:
+            a1 -= size
+            b1 -= size
+            blocks.append((a1, b1, size))
+        if a0 == a1 or b0 == b1:
+            continue
+
+        # Changes are usually sparse: resynchronize on the closest run of equal lines and
+        # align the gap before it separately, without looking at the whole region.
+        sync = _find_sync(a, b, a0, a1, b0, b1)
+        if sync is not None:
+            i, j = sync
+            regions.append((a0, i, b0, j))
+            regions.append((i, a1, j, b1))
+            continue
+
+        anchors = _unique_anchors(a, b, a0, a1, b0, b1)
+        if anchors:
+            # Consecutive anchors are merged into a single block, and the regions between
+            # them are aligned separately.
+            prev_i, prev_j = a0, b0
+            anchor_blocks: list[tuple[int, int, int]] = []
+            for i, j in anchors:
+                if i == prev_i and j == prev_j and anchor_blocks:
+                    bi, bj, size = anchor_blocks[-1]
+                    anchor_blocks[-1] = (bi, bj, size + 1)
+                else:
+                    regions.append((prev_i, i, prev_j, j))
+                    anchor_blocks.append((i, j, 1))
+                prev_i, prev_j = i + 1, j + 1
+            regions.append((prev_i, a1, prev_j, b1))
+            blocks += anchor_blocks
+        else:
+            for i, j in _myers_matches(a, b, a0, a1, b0, b1, MAX_EDITS):
+                blocks.append((i, j, 1))
+
+    blocks.sort()
+    merged: list[tuple[int, int, int]] = []
+    for i, j, size in blocks:
+        if merged:
+            bi, bj, bsize = merged[-1]
+            if bi + bsize == i and bj + bsize == j:
+                merged[-1] = (bi, bj, bsize + size)
+                continue
+        merged.append((i, j, size))
+    return merged
+
+
+def _common_prefix_length(
+    a: Sequence[object], b: Sequence[object], a0: int, a1: int, b0: int, b1: int
+) -> int:
+    """
+    Length of the common prefix of the regions, comparing slices of growing size so most of
+    the work happens in C.
+    """
+    limit = min(a1 - a0, b1 - b0)
+    length = 0
+    step = 1
+    while length < limit:
+        step = min(step, limit - length)
+        if a[a0 + length : a0 + length + step] == b[b0 + length : b0 + length + step]:
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step = 1
+    return length
+
+
+def _common_suffix_length(
+    a: Sequence[object], b: Sequence[object], a0: int, a1: int, b0: int, b1: int
+) -> int:
+    """Same as :func:`_common_prefix_length`, for the common suffix."""
+    limit = min(a1 - a0, b1 - b0)
+    length = 0
+    step = 1
+    while length < limit:
+        step = min(step, limit - length)
+        if a[a1 - length - step : a1 - length] == b[b1 - length - step : b1 - length]:
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step = 1
+    return length
+
+
+def _find_sync(
+    a: list[int], b: list[int], a0: int, a1: int, b0: int, b1: int
+) -> tuple[int, int] | None:
+    """
+    Find the closest ``(i, j)`` in the first ``SYNC_WINDOW`` lines of the regions where
+    ``SYNC_LINES`` lines are equal on both sides, if any.
+    """
+    first_index: dict[int, int] = {}
+    for i in range(a0, min(a1, a0 + SYNC_WINDOW)):
+        first_index.setdefault(a[i], i)
+    best = None
+    best_distance = 2 * SYNC_WINDOW
+    for j in range(b0, min(b1, b0 + SYNC_WINDOW)):
+        i = first_index.get(b[j], -1)
+        if i < 0 or (i - a0) + (j - b0) >= best_distance:
+            continue
+        size = min(SYNC_LINES, a1 - i, b1 - j)
+        if a[i : i + size] == b[j : j + size]:
+            best = (i, j)
+            best_distance = (i - a0) + (j - b0)
+    return best
+
+
+def _unique_anchors(
+    a: list[int], b: list[int], a0: int, a1: int, b0: int, b1: int
+) -> list[tuple[int, int]]:
+    """
+    Lines that appear exactly once in both regions, keeping the longest sequence of them that
+    appears in the same order on both sides (patience diff).
+    """
+    a_counts = Counter(a[a0:a1])
+    b_counts = Counter(b[b0:b1])
+    b_positions = {
+        line: j
+        for j, line in enumerate(b[b0:b1], b0)
+        if b_counts[line] == 1 and a_counts[line] == 1
+    }
+    candidates = [
+        (i, b_positions[line])
+        for i, line in enumerate(a[a0:a1], a0)
+        if line in b_positions
+    ]
+    if not candidates:
+        return []
+    if all(j1 < j2 for (_, j1), (_, j2) in zip(candidates, candidates[1:])):
+        return candidates
+
+    # Longest increasing subsequence of the ``j`` indexes.
+    tails: list[int] = []
+    tail_indexes: list[int] = []
+    previous: list[int] = []
+    for index, (_, j) in enumerate(candidates):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[position] = j
+            tail_indexes[position] = index
+        previous.append(tail_indexes[position - 1] if position > 0 else -1)
+
+    result = []
+    index = tail_indexes[-1]
+    while index >= 0:
+        result.append(candidates[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+
+def _myers_matches(
+    a: list[int], b: list[int], a0: int, a1: int, b0: int, b1: int, max_edits: int
+) -> list[tuple[int, int]]:
+    """
+    Align the regions with Myers' O(ND) algorithm. If more than ``max_edits`` edits are
+    needed, no lines are matched, meaning the whole region is reported as replaced.
+    """
+    n = a1 - a0
+    m = b1 - b0
+    max_d = min(n + m, max_edits)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, offset, n, m, a0, b0)
+    return []
+
+
+def _myers_backtrack(
+    trace: list[list[int]], offset: int, n: int, m: int, a0: int, b0: int
+) -> list[tuple[int, int]]:
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((a0 + x, b0 + y))
+        x, y = prev_x, prev_y
+    return matches
@@ -0,0 +1,169 @@
+"""
+Time spent by regression checks in each of their phases, reported by
+``--regressions-durations``.
+"""
+
+import functools
+import time
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import TypeVar
+
+import pytest
+
+from .session import current_session
+
+# Phases of a check, in the order they are reported.
+PHASES = ("resolve", "dump", "load", "compare", "aux", "report")
+
+
+@dataclass
+class CheckDurations:
+    """
+    Durations of the phases of a single regression check, in seconds. Time not spent in a
+    specific phase is counted as ``"other"``.
+    """
+
+    fixture: str
+    nodeid: str
+    phases: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+
+class _CheckTimer:
+    def __init__(self, durations: CheckDurations) -> None:
+        self.durations = durations
+        # Phases being timed, innermost last, as [phase, start, time spent in nested phases].
+        self.stack: list[list[Any]] = []
+
+    def start(self, phase: str) -> None:
+        self.stack.append([phase, time.perf_counter(), 0.0])
+
+    def stop(self) -> None:
+        phase, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        # Time of nested phases is only counted in them.
+        self.durations.phases[phase] = (
+            self.durations.phases.get(phase, 0.0) + elapsed - nested
+        )
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+
+_current_timer: ContextVar[_CheckTimer | None] = ContextVar(
+    "_current_timer", default=None
+)
+
+
+@contextmanager
+def check_timer(request: pytest.FixtureRequest) -> Iterator[None]:
+    """
+    Time a regression check, if ``--regressions-durations`` was given. Nested calls (for
+    example a fixture check calling another) are counted as part of the outermost check.
+    """
+    if (
+        _current_timer.get() is not None
+        or request.config.getoption("regressions_durations", None) is None
+    ):
+        yield
+        return
+
+    fixture = getattr(request, "fixturename", None) or "perform_regression_check"
+    durations = CheckDurations(fixture=fixture, nodeid=request.node.nodeid)
+    timer = _CheckTimer(durations)
+    token = _current_timer.set(timer)
+    timer.start("other")
+    try:
+        yield
+    finally:
+        timer.stop()
+        _current_timer.reset(token)
+        session = current_session()
+        if session is not None:
+            session.check_durations.append(durations)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Count the time spent in the body as ``phase`` of the current check, if it is being timed.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    timer.start(phase)
+    try:
+        yield
+    finally:
+        timer.stop()
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def timed_check(method: F) -> F:
+    """
+    Decorator for the ``check`` methods of the fixtures, timing them with :func:`check_timer`.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        __tracebackhide__ = True
+        with check_timer(self.request):
+            return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def write_durations_summary(
+    terminalreporter: Any, check_durations: list[CheckDurations], count: int
+) -> None:
+    """
+    Write the ``count`` slowest checks (all of them if ``count`` is 0) and the totals of each
+    fixture, in the style of pytest's ``--durations``.
+    """
+
+    def format_phases(phases: dict[str, float]) -> str:
+        formatted = ", ".join(
+            f"{phase} {phases[phase]:.3f}s"
+            for phase in (*PHASES, "other")
+            if phases.get(phase, 0.0) >= 0.0005
+        )
+        return f" ({formatted})" if formatted else ""
+
+    slowest = sorted(check_durations, key=lambda x: x.total, reverse=True)
+    if count > 0:
+        title = f"slowest {count} regression checks"
+        slowest = slowest[:count]
+    else:
+        title = "slowest regression checks"
+    terminalreporter.write_sep("=", title)
+    for durations in slowest:
+        terminalreporter.write_line(
+            f"{durations.total:.2f}s {durations.fixture} {durations.nodeid}"
+            + format_phases(durations.phases)
+        )
+
+    totals: dict[str, tuple[int, dict[str, float]]] = {}
+    for durations in check_durations:
+        check_count, phases = totals.get(durations.fixture, (0, {}))
+        for phase, elapsed in durations.phases.items():
+            phases[phase] = phases.get(phase, 0.0) + elapsed
+        totals[durations.fixture] = (check_count + 1, phases)
+    terminalreporter.write_sep("=", "regression checks duration by fixture")
+    for fixture, (check_count, phases) in sorted(
+        totals.items(), key=lambda x: sum(x[1][1].values()), reverse=True
+    ):
+        terminalreporter.write_line(
+            f"{sum(phases.values()):.2f}s {fixture}, {check_count} "
+            f"check{'' if check_count == 1 else 's'}" + format_phases(phases)
+        )
@@ -7,9 +7,12 @@ from typing import TYPE_CHECKING
 
 import pytest
 
+from .common import check_text_contents
 from .common import check_text_files
 from .common import perform_regression_check
-from .common import resolve_check_paths
+from .compression import open_decompressed
+from .compression import resolve_compression
+from .durations import timed_check
 
 if TYPE_CHECKING:
     from pytest_datadir.plugin import LazyDataDir
@@ -32,6 +35,7 @@ class FileRegressionFixture:
         self.force_regen = False
         self.with_test_class_names = False
 
+    @timed_check
     def check(
         self,
         contents: str | bytes,
@@ -43,6 +47,7 @@ class FileRegressionFixture:
         binary: bool = False,
         obtained_filename: Optional["os.PathLike[str]"] = None,
         check_fn: Callable[[Path, Path], None] | None = None,
+        compression: str | None = None,
     ) -> None:
         """
         Checks the contents against a previously recorded version, or generate a new file.
@@ -56,6 +61,10 @@ class FileRegressionFixture:
         :param check_fn: a function with signature ``(obtained_filename, expected_filename)`` that should raise
             AssertionError if both files differ.
             If not given, use internal function which compares text using :py:mod:`difflib`.
+            When the expected file is compressed, it receives the compressed file.
+        :param compression: compress the expected file with ``"gzip"``, ``"bz2"`` or
+            ``"xz"`` (adding ``.gz``, ``.bz2`` or ``.xz`` to its extension), or ``"none"``.
+            Defaults to the ``--regressions-compression`` option.
         """
         __tracebackhide__ = True
 
@@ -79,12 +88,15 @@ class FileRegressionFixture:
                 type(contents).__name__
             )
 
+        compression = resolve_compression(self.request, compression)
         user_supplied_check_fn = check_fn is not None
         if check_fn is None:
             if binary:
 
                 def check_fn(obtained_filename: Path, expected_filename: Path) -> None:
-                    if obtained_filename.read_bytes() != expected_filename.read_bytes():
+                    with open_decompressed(expected_filename, compression) as f:
+                        expected_contents = f.read()
+                    if obtained_filename.read_bytes() != expected_contents:
                         raise AssertionError(
                             "Binary files {} and {} differ.".format(
                                 obtained_filename, expected_filename
@@ -92,39 +104,47 @@ class FileRegressionFixture:
                         )
 
             else:
-                check_fn = partial(check_text_files, encoding=encoding)
+                check_fn = partial(
+                    check_text_files, encoding=encoding, compression=compression
+                )
 
         def dump_fn(filename: Path) -> None:
             mode = "wb" if binary else "w"
             with open(str(filename), mode, encoding=encoding, newline=newline) as f:
                 f.write(contents)
 
-        if (
-            not user_supplied_check_fn
-            and not self.force_regen
-            and not self.request.config.getoption("force_regen")
-            and not self.request.config.getoption("regen_all")
-        ):
-            expected_path = resolve_check_paths(
-                datadir=self.datadir,
-                original_datadir=self.original_datadir,
-                request=self.request,
-                extension=extension,
-                basename=basename,
-                fullpath=fullpath,
-                with_test_class_names=self.with_test_class_names,
-            ).expected
-            if expected_path.is_file():
-                if binary:
-                    assert isinstance(contents, bytes)
-                    contents_bytes = contents
-                else:
-                    assert isinstance(contents, str)
-                    contents_bytes = contents.encode(encoding or "utf-8")
-                # If the expected paths matches the given contents exactly,
-                # we can skip all the diff/match machinery (#240).
-                if expected_path.read_bytes() == contents_bytes:
-                    return
+        obtained_contents = None
+        check_contents_fn: Callable[[bytes, Path, Path], None] | None = None
+        if not user_supplied_check_fn:
+            if binary:
+                assert isinstance(contents, bytes)
+                # Binary contents that are not byte-identical always fail, so there is
+                # nothing to gain from comparing them in memory.
+                obtained_contents = contents
+            else:
+                assert isinstance(contents, str)
+                text = contents
+                # Same newline translation done by open() when dump_fn writes the file.
+                write_newline = os.linesep if newline is None else newline
+                written_text = (
+                    text
+                    if write_newline in ("", "\n")
+                    else text.replace("\n", write_newline)
+                )
+                obtained_contents = written_text.encode(encoding or "utf-8")
+
+                def check_contents_fn(
+                    obtained_contents: bytes,
+                    obtained_filename: Path,
+                    expected_filename: Path,
+                ) -> None:
+                    check_text_contents(
+                        text,
+                        obtained_filename,
+                        expected_filename,
+                        encoding=encoding,
+                        compression=compression,
+                    )
 
         assert check_fn is not None
         perform_regression_check(
@@ -139,6 +159,9 @@ class FileRegressionFixture:
             force_regen=self.force_regen,
             with_test_class_names=self.with_test_class_names,
             obtained_filename=obtained_filename,
+            obtained_contents=obtained_contents,
+            check_contents_fn=check_contents_fn,
+            compression=compression,
         )
 
     # non-PEP 8 alias used internally at ESSS
@@ -3,6 +3,7 @@ import os
 from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import IO
 from typing import Optional
 from typing import TYPE_CHECKING
 from typing import Union
@@ -11,6 +12,8 @@ import pytest
 
 from .common import import_error_message
 from .common import perform_regression_check
+from .durations import timed
+from .durations import timed_check
 
 if TYPE_CHECKING:
     from pytest_datadir.plugin import LazyDataDir
@@ -34,7 +37,7 @@ class ImageRegressionFixture:
         self.force_regen = False
         self.with_test_class_names = False
 
-    def _load_image(self, filename: "os.PathLike[str]") -> Any:
+    def _load_image(self, filename: Union["os.PathLike[str]", IO[bytes]]) -> Any:
         """
         Reads the image from the given file and convert it to RGB if necessary.
         This is necessary to be used with the ImageChops module operations.
@@ -46,7 +49,9 @@ class ImageRegressionFixture:
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("Pillow"))
 
-        img = Image.open(str(filename), "r")
+        img = Image.open(
+            filename if isinstance(filename, io.IOBase) else str(filename), "r"
+        )
         if img.mode not in ("L" or "RGB"):
             return img.convert("RGB")
         else:
@@ -85,6 +90,7 @@ class ImageRegressionFixture:
         expected_file: Path,
         expect_equal: bool,
         diff_threshold: float,
+        obtained_contents: bytes | None = None,
     ) -> None:
         """
         Compare two image by computing the differences spatially, pixel by pixel.
@@ -105,6 +111,10 @@ class ImageRegressionFixture:
             The maximum percentage of difference accepted.
             A value between 0.0 and 100.0
 
+        :param obtained_contents:
+            If given, the obtained image is read from these PNG contents instead of
+            ``obtained_file``, which is then only used in error messages.
+
         :raises AssertionError:
             raised if they are actually different and expect_equal is False or
             if they are equal and expect_equal is True.
@@ -116,8 +126,12 @@ class ImageRegressionFixture:
 
         __tracebackhide__ = True
 
-        obtained_img = self._load_image(obtained_file)
-        expected_img = self._load_image(expected_file)
+        with timed("load"):
+            if obtained_contents is not None:
+                obtained_img = self._load_image(io.BytesIO(obtained_contents))
+            else:
+                obtained_img = self._load_image(obtained_file)
+            expected_img = self._load_image(expected_file)
 
         def check_result(equal: bool, manhattan_distance: float | None) -> None:
             if equal != expect_equal:
@@ -140,6 +154,7 @@ class ImageRegressionFixture:
         equal = manhattan_distance <= diff_threshold
         check_result(equal, manhattan_distance)
 
+    @timed_check
     def check(
         self,
         image_data: Union[bytes, "Image.Image"],
@@ -171,13 +186,28 @@ class ImageRegressionFixture:
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("Pillow"))
 
-        def dump_fn(target: Path) -> None:
+        with timed("dump"):
             if isinstance(image_data, Image.Image):
                 image = image_data
             else:
                 image = Image.open(io.BytesIO(image_data))
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG")
+            contents = buffer.getvalue()
 
-            image.save(str(target), "PNG")
+        def dump_fn(target: Path) -> None:
+            target.write_bytes(contents)
+
+        def check_contents_fn(
+            obtained_contents: bytes, obtained_file: Path, expected_file: Path
+        ) -> None:
+            self._check_images_manhattan_distance(
+                obtained_file,
+                expected_file,
+                diff_threshold=diff_threshold,
+                expect_equal=expect_equal,
+                obtained_contents=obtained_contents,
+            )
 
         perform_regression_check(
             datadir=self.datadir,
@@ -194,4 +224,7 @@ class ImageRegressionFixture:
             fullpath=fullpath,
             force_regen=self.force_regen,
             with_test_class_names=self.with_test_class_names,
+            # Identical images only pass the check when they are expected to be equal.
+            obtained_contents=contents if expect_equal else None,
+            check_contents_fn=check_contents_fn,
         )
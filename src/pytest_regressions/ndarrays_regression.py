@@ -1,7 +1,14 @@
+import io
+import math
 import os
 import zipfile
+from collections.abc import Iterator
+from collections.abc import Sequence
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import IO
 from typing import Optional
 from typing import TYPE_CHECKING
 
@@ -9,10 +16,14 @@ import pytest
 
 from .common import import_error_message
 from .common import perform_regression_check
+from .durations import timed
+from .durations import timed_check
 
 if TYPE_CHECKING:
     from pytest_datadir.plugin import LazyDataDir
 
+    from .npz import NpzFile
+
 
 class NDArraysRegressionFixture:
     """
@@ -22,6 +33,10 @@ class NDArraysRegressionFixture:
     THRESHOLD = 100
     ROWFORMAT = "{:>15s}  {:>20s}  {:>20s}  {:>20s}\n"
 
+    # Arrays are compared in chunks of about this number of elements, so memory-mapped
+    # arrays are never entirely loaded into memory.
+    COMPARE_CHUNK_SIZE = 1024 * 1024
+
     def __init__(
         self,
         datadir: "LazyDataDir",
@@ -30,6 +45,7 @@ class NDArraysRegressionFixture:
     ) -> None:
         self._tolerances_dict: dict[str, dict[str, float]] = {}
         self._default_tolerance: dict[str, float] = {}
+        self._keys: Sequence[str] | None = None
 
         self.request = request
         self.datadir = datadir
@@ -42,7 +58,7 @@ class NDArraysRegressionFixture:
     ) -> None:
         """
         Check if data type of obtained and expected arrays are the same. Fail if not.
-        Helper method used in _check_fn method.
+        Helper method used in _check_data_fn method.
         """
         try:
             import numpy as np
@@ -77,7 +93,7 @@ class NDArraysRegressionFixture:
     ) -> None:
         """
         Check if obtained and expected arrays have the same size.
-        Helper method used in _check_fn method.
+        Helper method used in _check_data_fn method.
         """
         __tracebackhide__ = True
 
@@ -90,9 +106,53 @@ class NDArraysRegressionFixture:
             )
             raise AssertionError(error_msg)
 
-    def _check_fn(self, obtained_filename: Path, expected_filename: Path) -> None:
+    def _check_data_fn(
+        self,
+        data_dict: dict[str, Any],
+        obtained_filename: Path,
+        expected_filename: Path,
+    ) -> None:
+        """
+        Check the obtained arrays against the expected file, comparing them directly,
+        without serializing them.
+
+        The expected arrays are read one at a time, and only after the keys, shapes and
+        dtypes of all of them (read from the headers of their ``.npy`` data) are checked.
+        """
+        try:
+            from .npz import NpzFile
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("NumPy"))
+
+        __tracebackhide__ = True
+
+        with open(expected_filename, "rb") as f:
+            with timed("load"), self._load_errors(expected_filename):
+                expected_data = NpzFile(f, expected_filename)
+            with expected_data:
+                self._check_arrays(data_dict, expected_data, expected_filename)
+
+    @contextmanager
+    def _load_errors(self, filename: Path) -> Iterator[None]:
+        """
+        Report the errors of reading an invalid NPZ file ``filename``.
+        """
+        try:
+            yield
+        except (zipfile.BadZipFile, ValueError) as e:
+            raise OSError(
+                f"NPZ file {filename} could not be loaded. Corrupt file?"
+            ) from e
+
+    def _check_arrays(
+        self,
+        obtained_data: dict[str, Any],
+        expected_data: "NpzFile",
+        expected_filename: Path,
+    ) -> None:
         """
-        Check if dict contents dumped to a file match the contents in expected file.
+        Compare the obtained arrays with the expected ones, of the NPZ file
+        ``expected_filename``.
         """
         try:
             import numpy as np
@@ -101,182 +161,250 @@ class NDArraysRegressionFixture:
 
         __tracebackhide__ = True
 
-        # Turn result of np.load into a dictionary, such that the files are closed immediately.
-        expected_data = self._load_fn(expected_filename)
-        obtained_data = self._load_fn(obtained_filename)
+        obtained_keys = list(obtained_data)
+        expected_keys = list(expected_data)
+        if self._keys is not None:
+            obtained_keys = [k for k in obtained_keys if k in self._keys]
+            expected_keys = [k for k in expected_keys if k in self._keys]
 
         # Check mismatches in the keys.
-        if set(obtained_data) != set(expected_data):
+        if set(obtained_keys) != set(expected_keys):
             error_msg = (
                 "They keys in the obtained results differ from the expected results.\n"
             )
             error_msg += "  Matching keys: "
-            error_msg += str(list(set(obtained_data) & set(expected_data)))
+            error_msg += str(list(set(obtained_keys) & set(expected_keys)))
             error_msg += "\n"
             error_msg += "  New in obtained: "
-            error_msg += str(list(set(obtained_data) - set(expected_data)))
+            error_msg += str(list(set(obtained_keys) - set(expected_keys)))
             error_msg += "\n"
             error_msg += "  Missing from obtained: "
-            error_msg += str(list(set(expected_data) - set(obtained_data)))
+            error_msg += str(list(set(expected_keys) - set(obtained_keys)))
             error_msg += "\n"
             error_msg += "To update values, use --force-regen option.\n\n"
             raise AssertionError(error_msg)
 
+        # Check the dtypes and shapes of all the arrays before reading any of them.
+        with timed("load"), self._load_errors(expected_filename):
+            expected_headers = {k: expected_data.header(k) for k in obtained_keys}
+        for k in obtained_keys:
+            self._check_data_types(k, obtained_data[k], expected_headers[k])
+            self._check_data_shapes(k, obtained_data[k], expected_headers[k])
+
         # Compare the contents of the arrays.
         comparison_tables_dict = {}
-        for k, obtained_array in obtained_data.items():
-            expected_array = expected_data[k]
+        for k in obtained_keys:
+            obtained_array = obtained_data[k]
+            with timed("load"), self._load_errors(expected_filename):
+                expected_array = expected_data[k]
             tolerance_args = self._tolerances_dict.get(k, self._default_tolerance)
 
-            self._check_data_types(k, obtained_array, expected_array)
-            self._check_data_shapes(k, obtained_array, expected_array)
-
-            if np.issubdtype(obtained_array.dtype, np.inexact):
-                not_close_mask = ~np.isclose(
-                    obtained_array,
-                    expected_array,
-                    equal_nan=True,
-                    **tolerance_args,
-                )
-            else:
-                not_close_mask = obtained_array != expected_array
-
-            if np.any(not_close_mask):
-                diff_ids: Any
-                if not_close_mask.ndim == 0:
-                    diff_ids = [()]
-                else:
-                    diff_ids = np.array(
-                        np.nonzero(not_close_mask)
-                    ).T  # type: ignore[unreachable]
+            differences = self._find_differences(
+                obtained_array, expected_array, tolerance_args
+            )
+            if differences is not None:
                 comparison_tables_dict[k] = (
                     expected_array.size,
                     expected_array.shape,
-                    diff_ids,
-                    obtained_array[not_close_mask],
-                    expected_array[not_close_mask],
+                    *differences,
                 )
+            # Only the differing values are kept.
+            del expected_array
 
         if len(comparison_tables_dict) > 0:
-            error_msg = "Values are not sufficiently close.\n"
-            error_msg += "To update values, use --force-regen option.\n\n"
-            for k, (
-                size,
-                shape,
-                diff_ids,
-                obtained_array,
-                expected_array,
-            ) in comparison_tables_dict.items():
-                # Summary
-                error_msg += f"{k}:\n  Shape: {shape}\n"
-                pct = 100 * len(diff_ids) / size
-                error_msg += (
-                    f"  Number of differences: {len(diff_ids)} / {size} ({pct:.1f}%)\n"
-                )
-                if np.issubdtype(obtained_array.dtype, np.number) and len(diff_ids) > 1:
-                    error_msg += (
-                        "  Statistics are computed for differing elements only.\n"
-                    )
+            with timed("report"):
+                error_msg = "Values are not sufficiently close.\n"
+                error_msg += "To update values, use --force-regen option.\n\n"
+                for k, (
+                    size,
+                    shape,
+                    diff_ids,
+                    obtained_array,
+                    expected_array,
+                ) in comparison_tables_dict.items():
+                    # Summary
+                    error_msg += f"{k}:\n  Shape: {shape}\n"
+                    pct = 100 * len(diff_ids) / size
+                    error_msg += f"  Number of differences: {len(diff_ids)} / {size} ({pct:.1f}%)\n"
+                    if (
+                        np.issubdtype(obtained_array.dtype, np.number)
+                        and len(diff_ids) > 1
+                    ):
+                        error_msg += (
+                            "  Statistics are computed for differing elements only.\n"
+                        )
 
-                    abs_errors = abs(obtained_array - expected_array)
-                    error_msg += "  Stats for abs(obtained - expected):\n"
-                    error_msg += f"    Max:     {abs_errors.max()}\n"
-                    error_msg += f"    Mean:    {abs_errors.mean()}\n"
-                    error_msg += f"    Median:  {np.median(abs_errors)}\n"
-
-                    expected_nonzero = np.array(np.nonzero(expected_array)).T
-                    rel_errors = abs(
-                        (
-                            obtained_array[expected_nonzero]
-                            - expected_array[expected_nonzero]
+                        abs_errors = abs(obtained_array - expected_array)
+                        error_msg += "  Stats for abs(obtained - expected):\n"
+                        error_msg += f"    Max:     {abs_errors.max()}\n"
+                        error_msg += f"    Mean:    {abs_errors.mean()}\n"
+                        error_msg += f"    Median:  {np.median(abs_errors)}\n"
+
+                        expected_nonzero = np.array(np.nonzero(expected_array)).T
+                        rel_errors = abs(
+                            (
+                                obtained_array[expected_nonzero]
+                                - expected_array[expected_nonzero]
+                            )
+                            / expected_array[expected_nonzero]
                         )
-                        / expected_array[expected_nonzero]
-                    )
-                    if len(rel_errors) == 0:
-                        error_msg += "  Relative errors are not reported because all expected values are zero.\n"
-                    else:
+                        if len(rel_errors) == 0:
+                            error_msg += "  Relative errors are not reported because all expected values are zero.\n"
+                        else:
+                            error_msg += f"  Stats for abs(obtained - expected) / abs(expected):\n"
+                            if len(rel_errors) != len(abs_errors):
+                                pct = 100 * len(rel_errors) / len(abs_errors)
+                                error_msg += f"    Number of (differing) non-zero expected results: {len(rel_errors)} / {len(abs_errors)} ({pct:.1f}%)\n"
+                                error_msg += f"    Relative errors are computed for the non-zero expected results.\n"
+                            else:
+                                rel_errors = abs(
+                                    (obtained_array - expected_array) / expected_array
+                                )
+                            error_msg += f"    Max:     {rel_errors.max()}\n"
+                            error_msg += f"    Mean:    {rel_errors.mean()}\n"
+                            error_msg += f"    Median:  {np.median(rel_errors)}\n"
+
+                    # Details results
+                    error_msg += "  Individual errors:\n"
+                    if len(diff_ids) > self.THRESHOLD:
                         error_msg += (
-                            f"  Stats for abs(obtained - expected) / abs(expected):\n"
+                            f"    Only showing first {self.THRESHOLD} mismatches.\n"
                         )
-                        if len(rel_errors) != len(abs_errors):
-                            pct = 100 * len(rel_errors) / len(abs_errors)
-                            error_msg += f"    Number of (differing) non-zero expected results: {len(rel_errors)} / {len(abs_errors)} ({pct:.1f}%)\n"
-                            error_msg += f"    Relative errors are computed for the non-zero expected results.\n"
-                        else:
-                            rel_errors = abs(
-                                (obtained_array - expected_array) / expected_array
-                            )
-                        error_msg += f"    Max:     {rel_errors.max()}\n"
-                        error_msg += f"    Mean:    {rel_errors.mean()}\n"
-                        error_msg += f"    Median:  {np.median(rel_errors)}\n"
-
-                # Details results
-                error_msg += "  Individual errors:\n"
-                if len(diff_ids) > self.THRESHOLD:
-                    error_msg += (
-                        f"    Only showing first {self.THRESHOLD} mismatches.\n"
-                    )
-                    diff_ids = diff_ids[: self.THRESHOLD]
-                    obtained_array = obtained_array[: self.THRESHOLD]
-                    expected_array = expected_array[: self.THRESHOLD]
-                error_msg += self.ROWFORMAT.format(
-                    "Index",
-                    "Obtained",
-                    "Expected",
-                    "Difference",
-                )
-                for diff_id, obtained, expected in zip(
-                    diff_ids, obtained_array, expected_array
-                ):
-                    diff_id_str = ", ".join(str(i) for i in diff_id)
-                    if len(diff_id) != 1:
-                        diff_id_str = f"({diff_id_str})"
+                        diff_ids = diff_ids[: self.THRESHOLD]
+                        obtained_array = obtained_array[: self.THRESHOLD]
+                        expected_array = expected_array[: self.THRESHOLD]
                     error_msg += self.ROWFORMAT.format(
-                        diff_id_str,
-                        str(obtained),
-                        str(expected),
-                        (
-                            str(obtained - expected)
-                            if isinstance(obtained, np.number)
-                            else ""
-                        ),
+                        "Index",
+                        "Obtained",
+                        "Expected",
+                        "Difference",
                     )
-                error_msg += "\n"
+                    for diff_id, obtained, expected in zip(
+                        diff_ids, obtained_array, expected_array
+                    ):
+                        diff_id_str = ", ".join(str(i) for i in diff_id)
+                        if len(diff_id) != 1:
+                            diff_id_str = f"({diff_id_str})"
+                        error_msg += self.ROWFORMAT.format(
+                            diff_id_str,
+                            str(obtained),
+                            str(expected),
+                            (
+                                str(obtained - expected)
+                                if isinstance(obtained, np.number)
+                                else ""
+                            ),
+                        )
+                    error_msg += "\n"
 
-            raise AssertionError(error_msg)
+                raise AssertionError(error_msg)
 
-    def _load_fn(self, filename: Path) -> dict[str, Any]:
+    def _find_differences(
+        self, obtained_array: Any, expected_array: Any, tolerance_args: dict[str, float]
+    ) -> tuple[Any, Any, Any] | None:
         """
-        Load dict contents from the given filename.
+        Return the indices of the elements of the arrays that are not close, with their
+        obtained and expected values, or None if all elements are close.
+
+        Arrays are compared in chunks of rows, so memory-mapped arrays are read a chunk at a
+        time.
         """
         try:
             import numpy as np
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("NumPy"))
 
-        try:
-            # Open the file with a context manager manually, because np.load does not
-            # follow such good practices internally, causing avoidable error messages
-            # in the unit tests.
-            with open(filename, "rb") as f:
-                result = dict(np.load(f))
-        except (zipfile.BadZipFile, ValueError) as e:
-            raise OSError(
-                f"NPZ file {filename} could not be loaded. Corrupt file?"
-            ) from e
-        return result
+        def not_close(obtained: Any, expected: Any) -> Any:
+            if np.issubdtype(obtained_array.dtype, np.inexact):
+                return ~np.isclose(
+                    obtained,
+                    expected,
+                    equal_nan=True,
+                    **tolerance_args,
+                )
+            else:
+                return obtained != expected
+
+        if obtained_array.ndim == 0:
+            not_close_mask = not_close(obtained_array, expected_array)
+            if not np.any(not_close_mask):
+                return None
+            return (
+                [()],
+                obtained_array[not_close_mask],
+                expected_array[not_close_mask],
+            )
+
+        row_size = math.prod(obtained_array.shape[1:])
+        chunk_rows = max(1, self.COMPARE_CHUNK_SIZE // max(1, row_size))
+        diff_ids = []
+        obtained_values = []
+        expected_values = []
+        for start in range(0, obtained_array.shape[0], chunk_rows):
+            obtained_chunk = np.asarray(obtained_array[start : start + chunk_rows])
+            expected_chunk = np.asarray(expected_array[start : start + chunk_rows])
+            not_close_mask = not_close(obtained_chunk, expected_chunk)
+            if np.any(not_close_mask):
+                chunk_diff_ids = np.array(np.nonzero(not_close_mask)).T
+                chunk_diff_ids[:, 0] += start
+                diff_ids.append(chunk_diff_ids)
+                obtained_values.append(obtained_chunk[not_close_mask])
+                expected_values.append(expected_chunk[not_close_mask])
+        if not diff_ids:
+            return None
+        return (
+            np.concatenate(diff_ids),
+            np.concatenate(obtained_values),
+            np.concatenate(expected_values),
+        )
 
-    def _dump_fn(self, data_dict: dict[str, Any], filename: Path) -> None:
+    def _check_regen_fn(
+        self, data_dict: dict[str, Any], expected_filename: Path
+    ) -> None:
         """
-        Dump dict contents to the given filename.
+        Fail instead of regenerating an expected file checked with ``keys``, if it has arrays
+        which are not in ``data_dict`` (like the ones of other tests sharing the file).
+        """
+        from .npz import NpzFile
+
+        __tracebackhide__ = True
+
+        with open(expected_filename, "rb") as f:
+            with self._load_errors(expected_filename), NpzFile(
+                f, expected_filename
+            ) as expected_data:
+                other_keys = sorted(set(expected_data) - set(data_dict))
+        if other_keys:
+            pytest.fail(
+                f"Expected file {expected_filename} not regenerated, as it has arrays "
+                f"which are not in the dictionary: {other_keys}\n"
+                "Regenerate it with a check of all of its arrays."
+            )
+
+    def _dump_fn(
+        self, f: IO[bytes], data_dict: dict[str, Any], codec: str, shuffle: bool
+    ) -> None:
+        """
+        Dump dict contents into ``f`` as an NPZ file.
         """
         try:
-            import numpy as np
+            from .npz import write_npz
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("NumPy"))
 
-        np.savez_compressed(str(filename), **data_dict)
+        write_npz(f, data_dict, codec=codec, shuffle=shuffle)
 
+    def _serialize_fn(
+        self, data_dict: dict[str, Any], codec: str = "zlib", shuffle: bool = False
+    ) -> bytes:
+        """
+        Serialize dict contents to the contents of an NPZ file.
+        """
+        buffer = io.BytesIO()
+        self._dump_fn(buffer, data_dict, codec, shuffle)
+        return buffer.getvalue()
+
+    @timed_check
     def check(
         self,
         data_dict: dict[str, Any],
@@ -284,6 +412,9 @@ class NDArraysRegressionFixture:
         fullpath: Optional["os.PathLike[str]"] = None,
         tolerances: dict[str, dict[str, float]] | None = None,
         default_tolerance: dict[str, float] | None = None,
+        codec: str = "zlib",
+        shuffle: bool = False,
+        keys: Sequence[str] | None = None,
     ) -> None:
         """
         Checks a dictionary of NumPy ndarrays, containing only numeric data, against a previously recorded version, or generate a new file.
@@ -322,6 +453,30 @@ class NDArraysRegressionFixture:
 
             If not provided, will use defaults from numpy's ``isclose`` function.
 
+        :param codec: compression of the arrays in the NPZ file:
+
+            * ``"zlib"`` (as ``np.savez_compressed``), ``"bz2"`` or ``"lzma"``, optionally
+              with a compression level, like ``"zlib:1"`` (fast) or ``"lzma:9"`` (small).
+              Arrays are compressed in parallel threads.
+            * ``"stored"``: uncompressed, as ``np.savez``. Stored arrays are memory-mapped
+              and compared in chunks, so checking very large arrays needs little memory
+              besides the obtained arrays themselves.
+
+            The codec is recorded in the file, so expected files are read whatever their codec.
+
+        :param shuffle: byte-shuffle the arrays before compressing them: the first bytes of
+            all elements are stored together, then the second bytes, and so on, which often
+            compresses floating point data much better. Shuffled files can only be read by
+            this fixture (not by ``np.load``).
+
+        :param keys: only compare the arrays with these keys, which must be in ``data_dict``.
+            The other arrays of the expected file are not read, which makes it cheap to check
+            a few arrays of a large file (for example one shared by several tests with
+            ``fullpath``). Files written by the check still contain all the arrays of
+            ``data_dict``, so an expected file with other arrays is not regenerated (with
+            ``--force-regen`` or ``--regen-all``), as they would be lost: the check fails
+            instead.
+
         ``basename`` and ``fullpath`` are exclusive.
         """
         try:
@@ -329,10 +484,15 @@ class NDArraysRegressionFixture:
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("NumPy"))
 
-        import functools
-
         __tracebackhide__ = True
 
+        try:
+            from .npz import Codec
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("NumPy"))
+
+        parsed_codec = Codec.parse(codec)
+
         if not isinstance(data_dict, dict):
             raise TypeError(
                 "Only dictionaries with NumPy arrays or array-like objects are "
@@ -366,6 +526,14 @@ class NDArraysRegressionFixture:
                     f"fixture.\nArray '{key}' with type '{array.dtype}' was given."
                 )
 
+        if keys is not None:
+            missing_keys = [k for k in keys if k not in data_dict]
+            if missing_keys:
+                raise ValueError(
+                    f"Keys to compare not in the dictionary: {missing_keys}"
+                )
+        self._keys = keys
+
         if tolerances is None:
             tolerances = {}
         self._tolerances_dict = tolerances
@@ -374,17 +542,37 @@ class NDArraysRegressionFixture:
             default_tolerance = {}
         self._default_tolerance = default_tolerance
 
-        dump_fn = functools.partial(self._dump_fn, data_dict)
+        # The obtained arrays are compared directly, so only the expected ones are read.
+        contents: bytes | None = None
+        if parsed_codec.name == "stored":
+            # Serializing the arrays would copy them all into memory, so they are only
+            # written when the check fails.
+            def dump_fn(filename: Path) -> None:
+                with filename.open("wb") as f:
+                    self._dump_fn(f, data_dict, codec, shuffle)
+
+        else:
+            with timed("dump"):
+                contents = self._serialize_fn(data_dict, codec, shuffle)
+
+            def dump_fn(filename: Path) -> None:
+                assert contents is not None
+                filename.write_bytes(contents)
 
         perform_regression_check(
             datadir=self.datadir,
             original_datadir=self.original_datadir,
             request=self.request,
-            check_fn=self._check_fn,
+            check_fn=None,
             dump_fn=dump_fn,
             extension=".npz",
             basename=basename,
             fullpath=fullpath,
             force_regen=self._force_regen,
             with_test_class_names=self._with_test_class_names,
+            obtained_contents=contents,
+            check_data_fn=partial(self._check_data_fn, data_dict),
+            check_regen_fn=(
+                None if keys is None else partial(self._check_regen_fn, data_dict)
+            ),
         )
@@ -0,0 +1,602 @@
+"""
+Reading and writing of the NPZ files of ``ndarrays_regression``.
+
+NPZ files are ZIP archives with one ``.npy`` member per array. They are written here instead of
+with :mod:`zipfile` so members can be compressed in parallel threads, and are read back with
+:mod:`zipfile`, as the codec of each member is recorded in the archive. Unless they are
+byte-shuffled, the files are regular NPZ files, which ``np.load`` can read.
+
+Requires NumPy.
+"""
+
+import bz2
+import io
+import lzma
+import os
+import struct
+import zipfile
+import zlib
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from typing import IO
+from typing import NamedTuple
+from typing import Protocol
+
+import numpy as np
+
+# Codecs of the members, with the compression method recorded in the archive for them,
+# their default level and their valid levels. The default levels are the ones of zipfile.
+CODECS = {
+    "stored": (zipfile.ZIP_STORED, None, range(0)),
+    "zlib": (zipfile.ZIP_DEFLATED, 6, range(0, 10)),
+    "bz2": (zipfile.ZIP_BZIP2, 9, range(1, 10)),
+    "lzma": (zipfile.ZIP_LZMA, 6, range(0, 10)),
+}
+
+# Byte-shuffled members are recorded with this comment, followed by the number of elements
+# of the shuffled blocks.
+SHUFFLE_COMMENT = b"pytest-regressions-shuffle:"
+
+# Number of elements of the blocks that are byte-shuffled together.
+SHUFFLE_BLOCK_SIZE = 64 * 1024
+
+# Size of the chunks of member data written or given to the compressors at a time.
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Maximum memory of the compressors of the members running at a time, which bounds the number
+# of threads compressing them (to one with ``"lzma:9"``, whose compressor needs ~700 MiB).
+COMPRESSORS_MEMORY = 512 * 1024 * 1024
+
+# Members have a fixed timestamp (1980-01-01 00:00:00, the earliest one possible), so writing
+# the same arrays always produces the same bytes.
+_DOS_TIME = 0
+_DOS_DATE = (1 << 5) | 1
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_RECORD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_END_RECORD_SIGNATURE = b"PK\x06\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_LIMIT = (1 << 31) - 1
+_ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+_CREATE_SYSTEM_UNIX = 3
+_EXTERNAL_ATTR = 0o600 << 16
+_FLAG_LZMA_EOS = 0x02
+_FLAG_UTF8 = 0x800
+_VERSIONS = {
+    zipfile.ZIP_STORED: 45,
+    zipfile.ZIP_DEFLATED: 45,
+    zipfile.ZIP_BZIP2: 46,
+    zipfile.ZIP_LZMA: 63,
+}
+
+# Dictionary sizes of the LZMA presets.
+_LZMA_DICT_SIZES = [
+    256 * 1024,
+    1 << 20,
+    2 << 20,
+    4 << 20,
+    4 << 20,
+    8 << 20,
+    8 << 20,
+    16 << 20,
+    32 << 20,
+    64 << 20,
+]
+
+
+@dataclass(frozen=True)
+class Codec:
+    """
+    Codec of the members of an NPZ file, given as ``"name"`` or ``"name:level"``, like
+    ``"zlib:9"``.
+    """
+
+    name: str
+    level: int | None = None
+
+    @classmethod
+    def parse(cls, codec: str) -> "Codec":
+        name, separator, level = codec.partition(":")
+        if name in CODECS:
+            _, default_level, levels = CODECS[name]
+            if not separator:
+                return cls(name, default_level)
+            if level.isdigit() and int(level) in levels:
+                return cls(name, int(level))
+        raise ValueError(
+            "Invalid codec {!r}, must be one of: stored, zlib[:0-9], bz2[:1-9], "
+            "lzma[:0-9]".format(codec)
+        )
+
+    @property
+    def compress_type(self) -> int:
+        return CODECS[self.name][0]
+
+    @property
+    def compressor_memory(self) -> int:
+        """
+        Approximate memory used by a compressor of the codec, as documented by zlib, bzip2
+        and liblzma.
+        """
+        if self.name == "stored":
+            return 0
+        assert self.level is not None
+        if self.name == "zlib":
+            # Window and hash chains of the default `memLevel`.
+            return 256 * 1024
+        elif self.name == "bz2":
+            return 400 * 1024 + 8 * self.level * 100_000
+        else:
+            assert self.name == "lzma", self.name
+            return 11 * _LZMA_DICT_SIZES[self.level] + (2 << 20)
+
+    def compressor(self) -> "_Compressor":
+        assert self.level is not None
+        if self.name == "zlib":
+            return zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        elif self.name == "bz2":
+            return bz2.BZ2Compressor(self.level)
+        else:
+            assert self.name == "lzma", self.name
+            return _ZipLZMACompressor(self.level)
+
+
+class _Compressor(Protocol):
+    def compress(self, data: Any, /) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _ZipLZMACompressor:
+    """
+    Compresses in the LZMA format of ZIP members: a header with the properties of the LZMA
+    stream, followed by the raw stream.
+    """
+
+    def __init__(self, preset: int) -> None:
+        lc, lp, pb = 3, 0, 2
+        dict_size = _LZMA_DICT_SIZES[preset]
+        self._compressor = lzma.LZMACompressor(
+            format=lzma.FORMAT_RAW,
+            filters=[
+                {
+                    "id": lzma.FILTER_LZMA1,
+                    "preset": preset,
+                    "dict_size": dict_size,
+                    "lc": lc,
+                    "lp": lp,
+                    "pb": pb,
+                }
+            ],
+        )
+        properties = struct.pack("<BL", (pb * 5 + lp) * 9 + lc, dict_size)
+        self._header: bytes | None = (
+            struct.pack("<BBH", 9, 4, len(properties)) + properties
+        )
+
+    def _take_header(self) -> bytes:
+        header, self._header = self._header or b"", None
+        return header
+
+    def compress(self, data: Any, /) -> bytes:
+        return self._take_header() + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._take_header() + self._compressor.flush()
+
+
+@dataclass
+class _Member:
+    name: str
+    compress_type: int
+    crc: int
+    file_size: int
+    compress_size: int
+    chunks: Iterable[Any]
+    comment: bytes = b""
+
+
+def _npy_header(array: Any) -> bytes:
+    header = np.lib.format.header_data_from_array_1_0(array)
+    buffer = io.BytesIO()
+    try:
+        np.lib.format.write_array_header_1_0(buffer, header)
+    except ValueError:
+        buffer = io.BytesIO()
+        np.lib.format.write_array_header_2_0(buffer, header)
+    return buffer.getvalue()
+
+
+def _array_data(array: Any) -> memoryview:
+    """
+    The data of ``array``, as written in a ``.npy`` file.
+    """
+    if array.flags.f_contiguous and not array.flags.c_contiguous:
+        # Written in Fortran order, as recorded in the header.
+        array = array.T
+    array = np.ascontiguousarray(array)
+    return memoryview(array.reshape(-1).view(np.uint8))
+
+
+def _member_chunks(
+    header: bytes, data: memoryview, itemsize: int, shuffle: bool
+) -> Iterator[Any]:
+    yield header
+    if shuffle:
+        # Group the first bytes of all the elements of a block, then the second bytes and so
+        # on, so similar bytes (like the exponents of floats) are together.
+        block_size = SHUFFLE_BLOCK_SIZE * itemsize
+        for start in range(0, len(data), block_size):
+            block = np.frombuffer(data[start : start + block_size], dtype=np.uint8)
+            yield block.reshape(-1, itemsize).T.tobytes()
+    else:
+        for start in range(0, len(data), CHUNK_SIZE):
+            yield data[start : start + CHUNK_SIZE]
+
+
+def _make_member(name: str, array: Any, codec: Codec, shuffle: bool) -> _Member:
+    """
+    Compress an array into a member. The data of stored members is not kept: it is read
+    again from the array when the member is written.
+    """
+    header = _npy_header(array)
+    data = _array_data(array)
+    itemsize = array.dtype.itemsize
+    shuffle = shuffle and itemsize > 1
+    comment = SHUFFLE_COMMENT + str(SHUFFLE_BLOCK_SIZE).encode() if shuffle else b""
+
+    crc = 0
+    file_size = 0
+    compressor = codec.compressor() if codec.name != "stored" else None
+    compressed = []
+    for chunk in _member_chunks(header, data, itemsize, shuffle):
+        crc = zlib.crc32(chunk, crc)
+        file_size += len(chunk)
+        if compressor is not None:
+            compressed.append(compressor.compress(chunk))
+
+    if compressor is None:
+        return _Member(
+            name,
+            codec.compress_type,
+            crc,
+            file_size,
+            file_size,
+            _member_chunks(header, data, itemsize, shuffle),
+            comment,
+        )
+    compressed.append(compressor.flush())
+    return _Member(
+        name,
+        codec.compress_type,
+        crc,
+        file_size,
+        sum(len(x) for x in compressed),
+        compressed,
+        comment,
+    )
+
+
+class _ZipWriter:
+    """
+    Writes a ZIP archive into ``f``, which must be empty.
+    """
+
+    def __init__(self, f: IO[bytes]) -> None:
+        self.f = f
+        self.offset = 0
+        self.central_headers: list[bytes] = []
+
+    def _write(self, data: Any) -> None:
+        self.f.write(data)
+        self.offset += len(data)
+
+    def write_member(self, member: _Member) -> None:
+        name = member.name.encode("utf-8")
+        flags = 0 if member.name.isascii() else _FLAG_UTF8
+        if member.compress_type == zipfile.ZIP_LZMA:
+            flags |= _FLAG_LZMA_EOS
+        version = _VERSIONS[member.compress_type]
+        header_offset = self.offset
+
+        # Sizes always go in a ZIP64 extra field, as in the local headers written by
+        # zipfile with `force_zip64=True`.
+        extra = struct.pack("<HHQQ", 1, 16, member.file_size, member.compress_size)
+        self._write(
+            _LOCAL_HEADER.pack(
+                _LOCAL_HEADER_SIGNATURE,
+                version,
+                0,
+                flags,
+                member.compress_type,
+                _DOS_TIME,
+                _DOS_DATE,
+                member.crc,
+                0xFFFFFFFF,
+                0xFFFFFFFF,
+                len(name),
+                len(extra),
+            )
+        )
+        self._write(name)
+        self._write(extra)
+        for chunk in member.chunks:
+            self._write(chunk)
+
+        zip64 = []
+        file_size = member.file_size
+        compress_size = member.compress_size
+        if file_size > _ZIP64_LIMIT or compress_size > _ZIP64_LIMIT:
+            zip64 += [file_size, compress_size]
+            file_size = compress_size = 0xFFFFFFFF
+        if header_offset > _ZIP64_LIMIT:
+            zip64.append(header_offset)
+            header_offset = 0xFFFFFFFF
+        extra = (
+            struct.pack("<HH" + "Q" * len(zip64), 1, 8 * len(zip64), *zip64)
+            if zip64
+            else b""
+        )
+        self.central_headers.append(
+            _CENTRAL_HEADER.pack(
+                _CENTRAL_HEADER_SIGNATURE,
+                version,
+                _CREATE_SYSTEM_UNIX,
+                version,
+                0,
+                flags,
+                member.compress_type,
+                _DOS_TIME,
+                _DOS_DATE,
+                member.crc,
+                compress_size,
+                file_size,
+                len(name),
+                len(extra),
+                len(member.comment),
+                0,
+                0,
+                _EXTERNAL_ATTR,
+                header_offset,
+            )
+            + name
+            + extra
+            + member.comment
+        )
+
+    def close(self) -> None:
+        central_offset = self.offset
+        for header in self.central_headers:
+            self._write(header)
+        central_size = self.offset - central_offset
+        count = len(self.central_headers)
+        if (
+            count > _ZIP_FILECOUNT_LIMIT
+            or central_offset > _ZIP64_LIMIT
+            or central_size > _ZIP64_LIMIT
+        ):
+            zip64_offset = self.offset
+            self._write(
+                _ZIP64_END_RECORD.pack(
+                    _ZIP64_END_RECORD_SIGNATURE,
+                    _ZIP64_END_RECORD.size - 12,
+                    45,
+                    45,
+                    0,
+                    0,
+                    count,
+                    count,
+                    central_size,
+                    central_offset,
+                )
+            )
+            self._write(
+                _ZIP64_LOCATOR.pack(_ZIP64_LOCATOR_SIGNATURE, 0, zip64_offset, 1)
+            )
+            count = min(count, _ZIP_FILECOUNT_LIMIT)
+            central_size = min(central_size, 0xFFFFFFFF)
+            central_offset = min(central_offset, 0xFFFFFFFF)
+        self._write(
+            _END_RECORD.pack(
+                _END_RECORD_SIGNATURE,
+                0,
+                0,
+                count,
+                count,
+                central_size,
+                central_offset,
+                0,
+            )
+        )
+
+
+def write_npz(
+    f: IO[bytes],
+    arrays: dict[str, Any],
+    codec: str = "zlib",
+    shuffle: bool = False,
+) -> None:
+    """
+    Write ``arrays`` into ``f`` as an NPZ file.
+
+    Members are compressed in parallel threads (see :func:`_max_workers`), and each is
+    written as soon as it and the previous ones are compressed. Stored members are written
+    directly from the arrays.
+
+    :param codec: codec of the members, see :class:`Codec`.
+    :param shuffle: byte-shuffle the data of the arrays before compressing them.
+    """
+    parsed_codec = Codec.parse(codec)
+    members = [(key + ".npy", np.asanyarray(array)) for key, array in arrays.items()]
+
+    def make_member(item: tuple[str, Any]) -> _Member:
+        return _make_member(item[0], item[1], parsed_codec, shuffle)
+
+    writer = _ZipWriter(f)
+    max_workers = _max_workers(parsed_codec, len(members))
+    if parsed_codec.name == "stored" or max_workers <= 1:
+        for member in map(make_member, members):
+            writer.write_member(member)
+    else:
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pytest-regressions-npz"
+        ) as executor:
+            for member in executor.map(make_member, members):
+                writer.write_member(member)
+    writer.close()
+
+
+def _max_workers(codec: Codec, count: int) -> int:
+    """
+    Number of threads compressing ``count`` members with ``codec``: one per CPU, as long as
+    their compressors fit in ``COMPRESSORS_MEMORY``.
+    """
+    max_workers = min(count, os.cpu_count() or 1)
+    if codec.compressor_memory > 0:
+        max_workers = min(max_workers, COMPRESSORS_MEMORY // codec.compressor_memory)
+    return max(max_workers, 1)
+
+
+class ArrayHeader(NamedTuple):
+    """
+    The shape and dtype of an array, as read from the header of its ``.npy`` data.
+    """
+
+    shape: tuple[int, ...]
+    fortran_order: bool
+    dtype: Any
+
+
+def _read_npy_header(f: IO[bytes]) -> ArrayHeader:
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not supported")
+    return ArrayHeader(shape, fortran_order, dtype)
+
+
+def _shuffle_block_size(info: zipfile.ZipInfo) -> int | None:
+    if info.comment.startswith(SHUFFLE_COMMENT):
+        return int(info.comment[len(SHUFFLE_COMMENT) :])
+    return None
+
+
+def _read_shuffled(f: IO[bytes], block_size: int) -> Any:
+    shape, fortran_order, dtype = _read_npy_header(f)
+    array = np.empty(shape, dtype=dtype, order="F" if fortran_order else "C")
+    data = (array.T if fortran_order else array).reshape(-1).view(np.uint8)
+    itemsize = dtype.itemsize
+    block_bytes = block_size * itemsize
+    for start in range(0, len(data), block_bytes):
+        block = f.read(min(block_bytes, len(data) - start))
+        if len(block) != min(block_bytes, len(data) - start):
+            raise ValueError("Truncated array data")
+        shuffled = np.frombuffer(block, dtype=np.uint8).reshape(itemsize, -1)
+        data[start : start + len(block)] = shuffled.T.reshape(-1)
+    return array
+
+
+def _map_member(f: IO[bytes], filename: Path, info: zipfile.ZipInfo) -> Any:
+    """
+    Memory-map the array of a stored member of the NPZ file opened as ``f``: the ``.npy``
+    data of such members is stored as is in the file.
+    """
+    f.seek(info.header_offset)
+    header = f.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header of {info.filename}")
+    # The member data follows its file name and extra field, whose lengths end the header.
+    name_length, extra_length = _LOCAL_HEADER.unpack(header)[-2:]
+    f.seek(info.header_offset + len(header) + name_length + extra_length)
+
+    shape, fortran_order, dtype = _read_npy_header(f)
+    return np.memmap(
+        filename,
+        dtype=dtype,
+        mode="r",
+        offset=f.tell(),
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+class NpzFile(Mapping[str, Any]):
+    """
+    The arrays of the NPZ file opened as ``f``, mapped by their keys.
+
+    Only the list of members is read when the file is opened: each array is read when it is
+    accessed (and not kept), and :meth:`header` reads only the shape and dtype of an array.
+    Use as a context manager, to close the archive (but not ``f``).
+
+    :param filename: the name of the file, to memory-map the arrays of stored members
+        (except byte-shuffled ones) instead of reading them.
+    :raise zipfile.BadZipFile, ValueError: if the file is not a valid NPZ file, when it
+        is opened or an array is read.
+    """
+
+    def __init__(self, f: IO[bytes], filename: Path | None = None) -> None:
+        self._f = f
+        self._filename = filename
+        self._archive = zipfile.ZipFile(f)
+        self._infos = {
+            info.filename.removesuffix(".npy"): info
+            for info in self._archive.infolist()
+        }
+
+    def __enter__(self) -> "NpzFile":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._archive.close()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._infos)
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def header(self, key: str) -> ArrayHeader:
+        """
+        Read the header of the array ``key``, decompressing only the start of its member.
+        """
+        with self._archive.open(self._infos[key]) as member:
+            return _read_npy_header(member)
+
+    def __getitem__(self, key: str) -> Any:
+        info = self._infos[key]
+        block_size = _shuffle_block_size(info)
+        if (
+            self._filename is not None
+            and block_size is None
+            and info.compress_type == zipfile.ZIP_STORED
+        ):
+            return _map_member(self._f, self._filename, info)
+        with self._archive.open(info) as member:
+            if block_size is not None:
+                return _read_shuffled(member, block_size)
+            return np.lib.format.read_array(member)
+
+
+def read_npz(f: IO[bytes], filename: Path | None = None) -> dict[str, Any]:
+    """
+    Read all the arrays of the NPZ file opened as ``f``, see :class:`NpzFile`.
+    """
+    with NpzFile(f, filename) as npz:
+        return dict(npz)
@@ -1,10 +1,30 @@
 import os
 from collections.abc import Sequence
+from pathlib import Path
 from typing import Any
+from typing import NamedTuple
 from typing import Optional
+from typing import TYPE_CHECKING
+
+import pytest
 
 from .common import import_error_message
 from .dataframe_regression import DataFrameRegressionFixture
+from .durations import timed
+from .durations import timed_check
+
+if TYPE_CHECKING:
+    from pytest_datadir.plugin import LazyDataDir
+
+
+class _NumericColumns(NamedTuple):
+    """
+    The arrays of a ``num_regression`` check, written as the columns of a CSV file by
+    ``arrays_to_csv``, without copying them into a data frame.
+    """
+
+    arrays: dict[str, Any]  # 1-D or 2-D arrays, maybe shorter than the index
+    index: Any
 
 
 class NumericRegressionFixture(DataFrameRegressionFixture):
@@ -12,6 +32,186 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
     Numeric Data Regression fixture implementation used on num_regression fixture.
     """
 
+    def __init__(
+        self,
+        datadir: "LazyDataDir",
+        original_datadir: Path,
+        request: pytest.FixtureRequest,
+    ) -> None:
+        super().__init__(datadir, original_datadir, request)
+        self._obtained_columns: _NumericColumns | None = None
+
+    def _serialize_fn(self, data_object: Any, format: str = "csv") -> bytes:
+        """
+        Serialize the arrays of a check (see ``_NumericColumns``), or a data frame.
+        """
+        if isinstance(data_object, _NumericColumns):
+            from .csv_writer import arrays_to_csv
+
+            return arrays_to_csv(data_object.arrays, data_object.index).encode("utf-8")
+        return super()._serialize_fn(data_object, format)
+
+    def _csv_schema_fn(self, data_object: Any) -> dict[str, Any] | None:
+        """
+        Return the schema of the CSV file of the arrays of a check, with the lengths of the
+        shorter ones (see ``arrays_schema``), or of a data frame.
+        """
+        if isinstance(data_object, _NumericColumns):
+            from .csv_schema import arrays_schema
+
+            return arrays_schema(data_object.arrays, data_object.index)
+        return super()._csv_schema_fn(data_object)
+
+    def _check_contents_fn(
+        self,
+        obtained_contents: bytes,
+        obtained_filename: Path,
+        expected_filename: Path,
+        obtained_schema: dict[str, Any] | None = None,
+        expected_schema_filename: Path | None = None,
+        compression: str | None = None,
+    ) -> None:
+        """
+        Same as ``DataFrameRegressionFixture._check_contents_fn``, but compares the obtained
+        arrays themselves, without parsing them back from the obtained contents, when the
+        expected file is read exactly (see ``_load_expected_columns``).
+
+        The columns of the 2-D arrays are first compared together, and then one at a time
+        only if they are not all equal, to report their differences.
+        """
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        from .csv_schema import column_names
+        from .csv_writer import array_column_names
+
+        __tracebackhide__ = True
+
+        obtained_columns = self._obtained_columns
+        expected_data = None
+        if obtained_columns is not None and obtained_schema is not None:
+            names = column_names(obtained_schema)
+            with timed("load"):
+                expected_data = self._load_expected_columns(
+                    expected_filename, expected_schema_filename, names, compression
+                )
+        if obtained_columns is None or expected_data is None:
+            super()._check_contents_fn(
+                obtained_contents,
+                obtained_filename,
+                expected_filename,
+                obtained_schema,
+                expected_schema_filename,
+                compression,
+            )
+            return
+
+        # Views of the obtained arrays, named as the columns of the CSV file.
+        obtained_data = {names[0]: pd.Series(obtained_columns.index, copy=False)}
+        rows = len(obtained_columns.index)
+        for k, array in obtained_columns.arrays.items():
+            for j, name in enumerate(array_column_names(k, array)):
+                values = array if array.ndim == 1 else array[:, j]
+                obtained_data[name] = pd.Series(values, copy=False)
+                expected_column = expected_data.get(name)
+                if (
+                    len(values) < rows
+                    and expected_column is not None
+                    and len(expected_column) == len(expected_data[names[0]])
+                    and expected_column.iloc[len(values) :].isna().all()
+                ):
+                    # References written before the lengths of the arrays were stored,
+                    # with the shorter arrays padded with NaN.
+                    expected_data[name] = expected_column.iloc[: len(values)]
+
+        equal_columns: set[Any] = set()
+        for k, array in obtained_columns.arrays.items():
+            block_names = array_column_names(k, array)
+            if array.ndim == 2 and all(name in expected_data for name in block_names):
+                equal_columns |= self._equal_numeric_columns(
+                    pd.DataFrame(array, columns=block_names, copy=False),
+                    pd.DataFrame({name: expected_data[name] for name in block_names}),
+                )
+
+        differences_dict, warn_diffs = self._compare_data_frames(
+            obtained_data, expected_data, equal_columns
+        )
+        self._report_differences(differences_dict, warn_diffs, obtained_filename)
+
+    def _load_expected_columns(
+        self,
+        expected_filename: Path,
+        expected_schema_filename: Path | None,
+        names: list[str],
+        compression: str | None,
+    ) -> dict[str, Any] | None:
+        """
+        Load the columns of the expected CSV file, the ones of shorter arrays without their
+        missing values (see ``arrays_schema``), as NumPy arrays where possible.
+
+        Return None if the file can not be read exactly with its schema (see
+        ``parses_floats_exactly``), for the obtained arrays to be parsed back from the
+        obtained contents, like the expected ones.
+
+        :param names: names of the obtained columns, the only ones read.
+        :param compression: compression of the expected file.
+        """
+        try:
+            import numpy as np
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("NumPy"))
+        try:
+            import pandas as pd
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(import_error_message("Pandas"))
+
+        from .csv_schema import column_names
+        from .csv_schema import load_schema
+        from .csv_schema import parses_floats_exactly
+        from .csv_schema import read_csv
+
+        if expected_schema_filename is None or not parses_floats_exactly():
+            return None
+        expected_schema = load_schema(expected_schema_filename)
+        if expected_schema is None:
+            return None
+        try:
+            data_frame = read_csv(
+                expected_filename,
+                expected_schema,
+                columns=names,
+                compression=compression,
+            )
+        except ValueError:
+            # Out of date schema.
+            return None
+        lengths = {
+            name: column["length"]
+            for name, column in zip(
+                column_names(expected_schema), expected_schema["columns"]
+            )
+            if "length" in column
+        }
+
+        expected_data = {}
+        for name in data_frame.columns:
+            column = data_frame[name].iloc[: lengths.get(name)]
+            numpy_dtype = getattr(column.dtype, "numpy_dtype", None)
+            if isinstance(
+                column.dtype, pd.api.extensions.ExtensionDtype
+            ) and isinstance(numpy_dtype, np.dtype):
+                # Nullable columns of the shorter arrays, missing values only when they
+                # differ from the obtained ones.
+                if column.hasnans:
+                    column = column.astype(np.float64)
+                else:
+                    column = column.astype(numpy_dtype)
+            expected_data[name] = column
+        return expected_data
+
+    @timed_check
     def check(
         self,
         data_dict: dict[str, Any],
@@ -21,10 +221,13 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
         default_tolerance: dict[str, float] | None = None,
         data_index: Sequence[int] | None = None,
         fill_different_shape_with_nan: bool = True,
+        compression: str | None = None,
+        format: str | None = None,
     ) -> None:
         """
         Checks the given dict against a previously recorded version, or generate a new file.
-        The dict must map from user-defined keys to 1d numpy arrays or array-like values.
+        The dict must map from user-defined keys to 1d or 2d numpy arrays or array-like
+        values.
 
         Example::
 
@@ -38,6 +241,8 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
 
         :param data_dict: dict mapping keys to numpy arrays, or objects that can be
             coerced to 1d numpy arrays with a numeric dtype (e.g. list, tuple, etc).
+            The columns of 2d arrays are stored as the columns ``key[0]``, ``key[1]``, etc,
+            of the file.
 
         :param basename: basename of the file to test/record. If not given the name
             of the test is used.
@@ -47,7 +252,7 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
             in the session data dir for example.
 
         :param tolerances: dict mapping keys from the data_dict to tolerance settings for the
-            given data. Example::
+            given data, which apply to all the columns of 2d arrays. Example::
 
                 tolerances={'U': Tolerance(atol=1e-2)}
 
@@ -61,9 +266,21 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
         :param data_index: If set, will override the indexes shown in the outputs. Default
             is panda's default, which is ``range(0, len(data))``.
 
-        :param fill_different_shape_with_nan: If set, all the data provided in the data_dict
-            that has size lower than the bigger size will be filled with ``np.NaN``, in order to save
-            the data in a CSV file.
+        :param fill_different_shape_with_nan: If set, arrays of different lengths are
+            accepted. In CSV files, the cells after the end of the shorter ones are left
+            empty, and their lengths are stored in the schema file, so they are compared
+            without them. In other formats, they are filled with ``np.NaN``, which is only
+            supported for float arrays.
+
+        :param compression: compress the expected file with ``"gzip"``, ``"bz2"`` or
+            ``"xz"`` (adding ``.gz``, ``.bz2`` or ``.xz`` to its extension), or ``"none"``.
+            Defaults to the ``--regressions-compression`` option. Only supported by the
+            ``"csv"`` format.
+
+        :param format: format of the expected file, ``"csv"``, ``"parquet"`` or
+            ``"feather"``, see ``dataframe_regression.check``. Defaults to the
+            ``--regressions-dataframe-format`` option, or ``"csv"``. Arrays of numbers
+            are written to CSV files and compared without copying them into a data frame.
 
         ``basename`` and ``fullpath`` are exclusive.
         """
@@ -77,49 +294,101 @@ class NumericRegressionFixture(DataFrameRegressionFixture):
         except ModuleNotFoundError:
             raise ModuleNotFoundError(import_error_message("Pandas"))
 
+        from .csv_writer import array_column_names
+
         __tracebackhide__ = True
 
+        arrays = {}
         for k, obj in data_dict.items():
             if not isinstance(obj, np.ndarray):
                 arr = np.atleast_1d(np.asarray(obj))
                 if np.issubdtype(arr.dtype, np.number):
-                    data_dict[k] = arr
+                    obj = arr
+            arrays[k] = obj
 
         data_shapes1 = []
-        for obj in data_dict.values():
+        for obj in arrays.values():
             assert type(obj) in [
                 np.ndarray
             ], "Only objects that can be coerced to numpy arrays are valid for numeric_data_regression fixture.\n"
             shape = obj.shape
 
-            assert len(shape) == 1, (
-                "Only 1D arrays are supported on num_data_regression fixture.\n"
+            assert len(shape) in (1, 2), (
+                "Only 1D and 2D arrays are supported on num_data_regression fixture.\n"
                 "Array with shape %s was given.\n" % (shape,)
             )
             data_shapes1.append(shape[0])
 
         data_shapes2 = np.array(data_shapes1)
-        if not np.all(data_shapes2 == data_shapes2[0]):
-            if not fill_different_shape_with_nan:
-                assert (
-                    False
-                ), "Data dict with different array lengths will not be accepted. Try setting fill_different_shape_with_nan=True."
-            elif len(data_dict) > 1 and not all(
-                np.issubdtype(a.dtype, np.floating) for a in data_dict.values()
+        different_shapes = not np.all(data_shapes2 == data_shapes2[0])
+        if different_shapes and not fill_different_shape_with_nan:
+            assert (
+                False
+            ), "Data dict with different array lengths will not be accepted. Try setting fill_different_shape_with_nan=True."
+        max_size = int(data_shapes2.max())
+
+        names = [x for k, obj in arrays.items() for x in array_column_names(k, obj)]
+        assert len(set(names)) == len(names), (
+            "The columns of the arrays must have unique names on num_data_regression "
+            "fixture.\nColumns: %s\n" % (names,)
+        )
+
+        # The tolerances of 2D arrays apply to each of their columns.
+        tolerances = dict(tolerances or {})
+        for k, obj in arrays.items():
+            if obj.ndim == 2 and k in tolerances:
+                for name in array_column_names(k, obj):
+                    tolerances.setdefault(name, tolerances[k])
+
+        index = np.arange(max_size) if data_index is None else np.asarray(data_index)
+        if self._resolve_format(format) == "csv" and all(
+            x.dtype.kind in "biuf" for x in [index, *arrays.values()]
+        ):
+            if len(index) != max_size:
+                raise ValueError(
+                    "Length of data_index (%d) does not match the length of the arrays "
+                    "(%d)" % (len(index), max_size)
+                )
+            self._tolerances_dict = tolerances
+            self._default_tolerance = default_tolerance or {}
+            self._obtained_columns = _NumericColumns(arrays, index)
+            try:
+                self._perform_check(
+                    self._obtained_columns, basename, fullpath, compression, format
+                )
+            finally:
+                self._obtained_columns = None
+            return
+
+        columns = {}
+        for k, obj in arrays.items():
+            if obj.ndim == 1:
+                columns[k] = obj
+            else:
+                for j, name in enumerate(array_column_names(k, obj)):
+                    columns[name] = obj[:, j]
+        if different_shapes:
+            if len(columns) > 1 and not all(
+                np.issubdtype(a.dtype, np.floating) for a in columns.values()
             ):
                 raise TypeError(
                     "Checking multiple arrays with different shapes are not supported for non-float arrays"
                 )
-            else:
-                max_size = max(data_shapes2)
-                for k, obj in data_dict.items():
-                    new_data = np.empty(shape=(max_size,), dtype=obj.dtype)
-                    new_data[: len(obj)] = obj
-                    new_data[len(obj) :] = np.nan
-                    data_dict[k] = new_data
+            for k, obj in columns.items():
+                new_data = np.empty(shape=(max_size,), dtype=obj.dtype)
+                new_data[: len(obj)] = obj
+                new_data[len(obj) :] = np.nan
+                columns[k] = new_data
 
-        data_frame = pd.DataFrame(data_dict, index=data_index)
+        data_frame = pd.DataFrame(columns, index=data_index)
 
         DataFrameRegressionFixture.check(
-            self, data_frame, basename, fullpath, tolerances, default_tolerance
+            self,
+            data_frame,
+            basename,
+            fullpath,
+            tolerances,
+            default_tolerance,
+            compression=compression,
+            format=format,
         )
@@ -15,6 +15,9 @@ if TYPE_CHECKING:
 
 
 def pytest_addoption(parser: Any) -> None:
+    from .compression import COMPRESSIONS
+    from .dataframe_regression import DATAFRAME_FORMATS
+
     group = parser.getgroup("regressions")
     group.addoption(
         "--force-regen",
@@ -34,6 +37,56 @@ def pytest_addoption(parser: Any) -> None:
         default=False,
         help="Do not ignore the names of the test classes when composing the name of the regression data files.",
     )
+    group.addoption(
+        "--regressions-obtained-dir",
+        default=None,
+        metavar="DIR",
+        help="Write obtained files of failed checks into DIR (for example a RAM-backed directory) "
+        "instead of the temporary data directory of each test.",
+    )
+    group.addoption(
+        "--regressions-read-in-place",
+        action="store_true",
+        default=False,
+        help="Read expected files directly from the data directories, instead of copying "
+        "them into the temporary data directory of each test first.",
+    )
+    group.addoption(
+        "--regressions-store",
+        default=None,
+        metavar="DIR",
+        help="Keep expected files in a content-addressed store in DIR (relative to the root "
+        "directory), where identical files are stored only once.",
+    )
+    group.addoption(
+        "--regressions-compression",
+        choices=["none", *COMPRESSIONS],
+        default=None,
+        help="Compress the expected files of data_regression, dataframe_regression, "
+        "num_regression and file_regression with this codec, unless the check passes its "
+        "own 'compression' argument.",
+    )
+    group.addoption(
+        "--regressions-dataframe-format",
+        choices=list(DATAFRAME_FORMATS),
+        default=None,
+        help="Store the expected files of dataframe_regression and num_regression in this "
+        "format (csv by default), unless the check passes its own 'format' argument.",
+    )
+    group.addoption(
+        "--regressions-durations",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Show the N slowest regression checks (N=0 for all), with the time spent in each "
+        "of their phases.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    from .session import RegressionSession
+
+    config.pluginmanager.register(RegressionSession(config), "regressions-session")
 
 
 @pytest.fixture
@@ -0,0 +1,380 @@
+"""
+State shared by all regression checks of a test session.
+"""
+
+import hashlib
+import os
+import secrets
+import stat
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Optional
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from .durations import CheckDurations
+    from .store import ContentStore
+
+# Sessions currently configured, innermost last (``pytester`` runs nested sessions in the same
+# process).
+_sessions: list["RegressionSession"] = []
+
+
+def current_session() -> Optional["RegressionSession"]:
+    """
+    Return the session of the running pytest invocation, or None if the checks are being used
+    outside of pytest.
+    """
+    return _sessions[-1] if _sessions else None
+
+
+def atomic_write(filename: Path, write_fn: Callable[[Path], object]) -> None:
+    """
+    Call ``write_fn`` to write a temporary file next to ``filename``, then rename it over
+    ``filename``, so ``filename`` is never left half-written. The permissions of an existing
+    ``filename`` are kept.
+
+    :param write_fn: receives the temporary file name, which ends with the name of
+        ``filename`` (so it has the same extension).
+    """
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    temp_filename = filename.with_name(f".{secrets.token_hex(4)}.{filename.name}")
+    try:
+        write_fn(temp_filename)
+        try:
+            mode = stat.S_IMODE(filename.stat().st_mode)
+        except FileNotFoundError:
+            pass
+        else:
+            os.chmod(temp_filename, mode)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        try:
+            temp_filename.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class RegressionSession:
+    """
+    Registered as a plugin while pytest is configured, runs work that tests do not need to wait
+    for (like rendering HTML diffs and writing regenerated files) in background threads, and
+    waits for it to finish at the end of the session.
+    """
+
+    MAX_WORKERS = 4
+
+    # Writes wait for previous ones once this many bytes are pending, to bound memory usage.
+    MAX_PENDING_WRITE_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, config: pytest.Config) -> None:
+        self.config = config
+        self._lock = threading.Condition()
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: list[Future[None]] = []
+        self._pending_writes: dict[Path, Future[None]] = {}
+        self._pending_write_bytes = 0
+        self.write_errors: list[str] = []
+        # Files written into data directories, with the digests of their contents.
+        self.written_files: dict[str, list[str]] = {}
+        # Names in the directories of expected files, mapped to whether they are files.
+        self._dir_listings: dict[Path, dict[str, bool]] = {}
+        # Filled by the checks when --regressions-durations is given.
+        self.check_durations: list["CheckDurations"] = []
+        self.store: "ContentStore | None" = None
+        store_dir = config.getoption("regressions_store", None)
+        if store_dir:
+            from .store import ContentStore
+
+            self.store = ContentStore(config.rootpath / store_dir, config.rootpath)
+        _sessions.append(self)
+
+    @property
+    def worker_id(self) -> str | None:
+        """
+        Id of the pytest-xdist worker running this session (like ``"gw0"``), if any.
+        """
+        workerinput = getattr(self.config, "workerinput", None)
+        return None if workerinput is None else str(workerinput["workerid"])
+
+    def submit(self, fn: Callable[..., None], *args: Any) -> None:
+        """
+        Run ``fn(*args)`` in a background thread. Exceptions raised by ``fn`` are re-raised by
+        :meth:`wait`, so ``fn`` should handle the errors it expects.
+        """
+        with self._lock:
+            self._submit(fn, *args)
+
+    def _submit(self, fn: Callable[..., None], *args: Any) -> Future[None]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.MAX_WORKERS,
+                thread_name_prefix="pytest-regressions",
+            )
+        future = self._executor.submit(fn, *args)
+        self._futures.append(future)
+        return future
+
+    def write_file(self, filename: Path, contents: bytes) -> None:
+        """
+        Atomically write ``contents`` to ``filename`` in a background thread.
+
+        Errors are reported at the end of the session, failing it. Use :meth:`flush` to wait
+        until a file is written.
+        """
+        self.flush(filename)
+        self.record_written(filename, contents)
+        with self._lock:
+            while (
+                self._pending_write_bytes
+                and self._pending_write_bytes + len(contents)
+                > self.MAX_PENDING_WRITE_BYTES
+            ):
+                self._lock.wait()
+            self._pending_write_bytes += len(contents)
+            self._pending_writes[filename] = self._submit(
+                self._write_file, filename, contents
+            )
+
+    def write_stored_file(
+        self,
+        source: Path,
+        contents: bytes,
+        extension: str,
+        stored_contents: bytes | None = None,
+    ) -> None:
+        """
+        Write the expected file ``source`` into the content store (see ``--regressions-store``):
+        a blob named after the digest of ``contents``, unless it is already stored, and that
+        digest into the index.
+
+        :param extension: extension of the blob, as of ``source``.
+        :param stored_contents: contents of the blob, if not ``contents`` (compressed, for
+            example).
+        """
+        from .store import content_digest
+
+        assert self.store is not None
+        digest = content_digest(contents)
+        blob = self.store.blob_path(digest, extension)
+        if not self.is_file(blob):
+            self.write_file(
+                blob, contents if stored_contents is None else stored_contents
+            )
+        self.store.set(source, digest)
+
+    def record_written(self, filename: Path, contents: bytes) -> None:
+        """
+        Record that ``contents`` were written to ``filename``, to report it at the end of the
+        session.
+        """
+        self._record_digest(filename, hashlib.sha256(contents).hexdigest())
+
+    def record_written_file(self, filename: Path) -> None:
+        """
+        Same as :meth:`record_written`, for a file already written, which is read in chunks.
+        """
+        digest = hashlib.sha256()
+        with filename.open("rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        self._record_digest(filename, digest.hexdigest())
+
+    def _record_digest(self, filename: Path, digest: str) -> None:
+        with self._lock:
+            self.written_files.setdefault(str(filename), []).append(digest)
+        self._mark_as_file(filename)
+
+    def _mark_as_file(self, filename: Path) -> None:
+        with self._lock:
+            listing = self._dir_listings.get(filename.parent)
+            if listing is not None:
+                listing[filename.name] = True
+
+    def is_file(self, filename: Path) -> bool:
+        """
+        Return whether ``filename`` is an existing file.
+
+        The directory of ``filename`` is listed once per session, so on slow (for example
+        network) file systems checking many files in the same directory costs a single
+        round trip. Names not in the listing are checked again on disk, so files created
+        during the session are still found.
+        """
+        parent = filename.parent
+        with self._lock:
+            listing = self._dir_listings.get(parent)
+        if listing is None:
+            listing = {}
+            try:
+                with os.scandir(parent) as entries:
+                    for entry in entries:
+                        listing[entry.name] = entry.is_file()
+            except OSError:
+                pass
+            with self._lock:
+                listing = self._dir_listings.setdefault(parent, listing)
+        if listing.get(filename.name):
+            return True
+        result = filename.is_file()
+        if result:
+            with self._lock:
+                listing[filename.name] = True
+        return result
+
+    def forget_file(self, filename: Path) -> None:
+        """
+        Remove ``filename`` from the listing of its directory, when it turns out to have been
+        removed during the session.
+        """
+        with self._lock:
+            self._dir_listings.get(filename.parent, {}).pop(filename.name, None)
+
+    def _write_file(self, filename: Path, contents: bytes) -> None:
+        try:
+            atomic_write(filename, lambda f: f.write_bytes(contents))
+        except OSError as e:
+            with self._lock:
+                self.write_errors.append(f"{filename}: {e}")
+        finally:
+            with self._lock:
+                self._pending_write_bytes -= len(contents)
+                self._lock.notify_all()
+
+    def flush(self, filename: Path) -> None:
+        """
+        Wait until a pending write of ``filename``, if any, is done.
+        """
+        with self._lock:
+            future = self._pending_writes.pop(filename, None)
+        if future is not None:
+            future.result()
+
+    def wait(self) -> None:
+        """
+        Wait until all the work submitted so far is done.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        with self._lock:
+            self._pending_writes = {
+                filename: future
+                for filename, future in self._pending_writes.items()
+                if not future.done()
+            }
+
+    def conflicting_files(self) -> list[str]:
+        """
+        Files written more than once in the session with different contents (for example by
+        two tests sharing the same ``fullpath``), so only one of the writes was kept. With
+        the content store, these are the expected files mapped to different blobs.
+        """
+        conflicting = {
+            filename
+            for filename, digests in self.written_files.items()
+            if len(set(digests)) > 1
+        }
+        if self.store is not None:
+            conflicting.update(
+                str(self.store.rootpath / key) for key in self.store.conflicts
+            )
+        return sorted(conflicting)
+
+    def pytest_sessionfinish(self, session: pytest.Session) -> None:
+        self.wait()
+        workeroutput = getattr(self.config, "workeroutput", None)
+        if workeroutput is not None:
+            # Sent to the pytest-xdist controller, see pytest_testnodedown.
+            workeroutput["regressions_written_files"] = self.written_files
+            workeroutput["regressions_write_errors"] = self.write_errors
+            workeroutput["regressions_check_durations"] = [
+                (x.fixture, x.nodeid, x.phases) for x in self.check_durations
+            ]
+            if self.store is not None:
+                workeroutput["regressions_store_updates"] = self.store.updates
+                workeroutput["regressions_store_conflicts"] = sorted(
+                    self.store.conflicts
+                )
+            return
+        if self.store is not None:
+            try:
+                if self.store.save():
+                    self.record_written_file(self.store.index_path)
+            except OSError as e:
+                self.write_errors.append(f"{self.store.index_path}: {e}")
+        if (
+            self.write_errors or self.conflicting_files()
+        ) and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        """
+        Merge the files written by a pytest-xdist worker into the controller session.
+        """
+        workeroutput = getattr(node, "workeroutput", {})
+        for filename, digests in workeroutput.get(
+            "regressions_written_files", {}
+        ).items():
+            self.written_files.setdefault(filename, []).extend(digests)
+        self.write_errors += workeroutput.get("regressions_write_errors", [])
+        if self.store is not None:
+            self.store.conflicts.update(
+                workeroutput.get("regressions_store_conflicts", [])
+            )
+            self.store.merge_updates(workeroutput.get("regressions_store_updates", {}))
+        if workeroutput.get("regressions_check_durations"):
+            from .durations import CheckDurations
+
+            self.check_durations += [
+                CheckDurations(fixture, nodeid, phases)
+                for fixture, nodeid, phases in workeroutput[
+                    "regressions_check_durations"
+                ]
+            ]
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        durations_count = self.config.getoption("regressions_durations", None)
+        if durations_count is not None and self.check_durations:
+            from .durations import write_durations_summary
+
+            write_durations_summary(
+                terminalreporter, self.check_durations, durations_count
+            )
+
+        if not (self.written_files or self.write_errors):
+            return
+        conflicting_files = self.conflicting_files()
+        failed = bool(self.write_errors or conflicting_files)
+        terminalreporter.section("pytest-regressions", red=failed, green=not failed)
+        count = len(self.written_files)
+        terminalreporter.line(
+            f"{count} file{'' if count == 1 else 's'} written into data directories"
+        )
+        if terminalreporter.verbosity > 0:
+            for filename in sorted(self.written_files):
+                terminalreporter.line(f"- {filename}")
+        if conflicting_files:
+            terminalreporter.line(
+                "Files written more than once with different contents:", red=True
+            )
+            for filename in conflicting_files:
+                terminalreporter.line(f"- {filename}")
+        if self.write_errors:
+            terminalreporter.line("Failed to write files:", red=True)
+            for error in self.write_errors:
+                terminalreporter.line(f"- {error}")
+
+    def pytest_unconfigure(self) -> None:
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+        _sessions.remove(self)
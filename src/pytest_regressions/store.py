@@ -0,0 +1,110 @@
+"""
+Content-addressed storage of expected files, enabled with ``--regressions-store``.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from .session import atomic_write
+
+
+def content_digest(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+class ContentStore:
+    """
+    Stores each distinct expected file once, as a "blob" named after the digest of its
+    contents, with an index mapping the path each expected file would have in its data
+    directory to the digest of its contents.
+
+    Layout of the store directory::
+
+        index.json          {"tests/test_foo/test_1.yml": "<sha256>", ...}
+        blobs/ab/ab...cd.yml
+
+    :param directory: directory of the store.
+    :param rootpath: expected file paths in the index are relative to this directory.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: Path, rootpath: Path) -> None:
+        self.directory = directory
+        self.rootpath = rootpath
+        self._index: dict[str, str] | None = None
+        # Entries changed in this session, to be saved into the index.
+        self.updates: dict[str, str] = {}
+        # Keys of the entries changed more than once in this session, to different digests.
+        self.conflicts: set[str] = set()
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / self.INDEX_NAME
+
+    def key(self, source: Path) -> str:
+        """
+        Key of an expected file in the index: its path relative to the root directory.
+        """
+        try:
+            return source.relative_to(self.rootpath).as_posix()
+        except ValueError:
+            return source.as_posix()
+
+    def _load_index(self) -> dict[str, str]:
+        try:
+            index: dict[str, str] = json.loads(
+                self.index_path.read_text(encoding="UTF-8")
+            )
+        except FileNotFoundError:
+            index = {}
+        return index
+
+    def digest(self, source: Path) -> str | None:
+        """
+        Digest of the contents stored for the expected file ``source``, if any.
+        """
+        if self._index is None:
+            self._index = self._load_index()
+        key = self.key(source)
+        return self.updates.get(key, self._index.get(key))
+
+    def blob_path(self, digest: str, extension: str) -> Path:
+        return self.directory / "blobs" / digest[:2] / (digest + extension)
+
+    def set(self, source: Path, digest: str) -> None:
+        """
+        Map the expected file ``source`` to the blob with the given digest. The caller is
+        responsible for writing the blob.
+        """
+        self.merge_updates({self.key(source): digest})
+
+    def merge_updates(self, updates: dict[str, str]) -> None:
+        """
+        Add entries changed in this session (or by another process of it, like a pytest-xdist
+        worker), recording the conflicts with the entries already changed.
+        """
+        for key, digest in updates.items():
+            if self.updates.setdefault(key, digest) != digest:
+                self.conflicts.add(key)
+                self.updates[key] = digest
+
+    def save(self) -> bool:
+        """
+        Write the entries changed in this session into the index. The index is read again
+        first, so entries written by other processes in the meantime are kept.
+
+        Return whether the index was written, as it is only if entries changed.
+        """
+        if not self.updates:
+            return False
+        index = self._load_index()
+        index.update(self.updates)
+        contents = json.dumps(index, indent=1, sort_keys=True) + "\n"
+        atomic_write(
+            self.index_path, lambda f: f.write_text(contents, encoding="UTF-8")
+        )
+        self._index = index
+        self.updates = {}
+        return True
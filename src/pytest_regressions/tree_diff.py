@@ -0,0 +1,246 @@
+"""
+Structural diff of data trees, used to report the differences of ``data_regression`` by key
+path instead of as a diff of their YAML text.
+
+The trees are made of the values loaded from YAML files: mappings, sequences and scalars.
+Both trees are walked once, depth first and in the order of the obtained mappings, with an
+explicit stack (so deep trees do not hit the recursion limit), and the walk stops after the
+maximum number of differences, so comparing large trees is linear in their size. Key paths
+are only formatted for the differences, and for looking up tolerances when there are any.
+"""
+
+import math
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+# Mapping keys written after a dot in key paths, others are written in brackets.
+_PLAIN_KEY_RE = re.compile(r"[^\W\d]\w*(-\w+)*")
+
+# Types of the values which are equal when ``==``, compared without further checks.
+_SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+
+# Maximum length of the values shown in the differences.
+_MAX_VALUE_LENGTH = 80
+
+
+@dataclass(frozen=True)
+class TreeDifference:
+    """
+    A difference between the obtained and expected trees, at ``path`` (see
+    :func:`format_path`).
+    """
+
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path or '(root)'}: {self.message}"
+
+
+@dataclass(frozen=True)
+class TreeDiff:
+    """
+    The first differences between two trees.
+    """
+
+    differences: list[TreeDifference]
+    # Whether the comparison stopped before finding all the differences.
+    truncated: bool
+
+
+def format_path(keys: tuple[Any, ...]) -> str:
+    """
+    Format the keys and indexes leading to a value of a tree, as ``config.values[3]`` or
+    ``config['a key'][1]``.
+    """
+    path = ""
+    for key in keys:
+        path = _join_path(path, key)
+    return path
+
+
+def _join_path(path: str, key: Any) -> str:
+    if isinstance(key, str) and _PLAIN_KEY_RE.fullmatch(key):
+        return f"{path}.{key}" if path else key
+    return f"{path}[{key!r}]"
+
+
+def _keys(path: Any) -> tuple[Any, ...]:
+    """
+    Return the keys of a path, stored as nested ``(parent, key)`` pairs while walking.
+    """
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    return tuple(reversed(keys))
+
+
+def _count(count: int, noun: str) -> str:
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+
+def _describe(value: Any) -> str:
+    if isinstance(value, Mapping):
+        return f"a mapping of {_count(len(value), 'key')}"
+    elif isinstance(value, list):
+        return f"a sequence of {_count(len(value), 'item')}"
+    text = repr(value)
+    if len(text) > _MAX_VALUE_LENGTH:
+        text = text[: _MAX_VALUE_LENGTH - 3] + "..."
+    return text
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numbers_close(
+    obtained: Any, expected: Any, tolerance: Mapping[str, float] | None
+) -> bool:
+    """
+    Compare numbers as ``numpy.isclose`` with ``equal_nan=True`` would, with the tolerance
+    if any (with the defaults of ``isclose`` for the missing ``atol`` or ``rtol``), or else
+    exactly.
+    """
+    if obtained == expected:
+        return True
+    if isinstance(obtained, float) and isinstance(expected, float):
+        if math.isnan(obtained) and math.isnan(expected):
+            return True
+    if tolerance is None or not (math.isfinite(obtained) and math.isfinite(expected)):
+        return False
+    atol = tolerance.get("atol", 1e-8)
+    rtol = tolerance.get("rtol", 1e-5)
+    return bool(abs(obtained - expected) <= atol + rtol * abs(expected))
+
+
+def _scalar_difference(
+    obtained: Any, expected: Any, tolerance: Mapping[str, float] | None
+) -> str | None:
+    """
+    Return the difference between two values which are not both mappings or both
+    sequences, or ``None`` if they are equal.
+    """
+    if _is_number(obtained) and _is_number(expected):
+        if _numbers_close(obtained, expected, tolerance):
+            return None
+        return (
+            f"obtained {obtained!r}, expected {expected!r} "
+            f"(difference: {abs(obtained - expected)!r})"
+        )
+    elif type(obtained) is type(expected) and obtained == expected:
+        return None
+    return f"obtained {_describe(obtained)}, expected {_describe(expected)}"
+
+
+def tree_diff(
+    obtained: Any,
+    expected: Any,
+    tolerances: Mapping[str, Mapping[str, float]] | None = None,
+    default_tolerance: Mapping[str, float] | None = None,
+    max_differences: int | None = None,
+) -> TreeDiff:
+    """
+    Compare the ``obtained`` tree with the ``expected`` one.
+
+    Numbers are compared by value, so ``1`` and ``1.0`` are equal, but booleans are only
+    equal to booleans. Mappings are compared key by key, whatever their order, and
+    sequences item by item, their extra items being reported by the difference of their
+    lengths. The differences of the values of a mapping or sequence are reported before the
+    ones inside its mappings and sequences.
+
+    :param tolerances: tolerances of the numbers in the subtrees at the given key paths
+        (see :func:`format_path`), like ``{"config.values": dict(atol=1e-6)}``.
+    :param default_tolerance: tolerance of the other numbers, which are compared exactly
+        if not given.
+    :param max_differences: if given, stop after finding this number of differences.
+    """
+    differences: list[TreeDifference] = []
+    tolerances = tolerances or {}
+
+    def add(path: Any, message: str) -> bool:
+        """Add a difference, and return whether the walk must stop."""
+        if max_differences is not None and len(differences) >= max_differences:
+            return True
+        differences.append(TreeDifference(format_path(_keys(path)), message))
+        return False
+
+    root_tolerance = tolerances.get("", default_tolerance)
+    if not (
+        isinstance(obtained, Mapping)
+        and isinstance(expected, Mapping)
+        or isinstance(obtained, list)
+        and isinstance(expected, list)
+    ):
+        message = _scalar_difference(obtained, expected, root_tolerance)
+        if message is not None:
+            add(None, message)
+        return TreeDiff(differences, truncated=False)
+
+    # Mappings and sequences left to compare, with their paths, stored as nested
+    # ``(parent, key)`` pairs, their tolerances, and their formatted paths, only when
+    # there are tolerances to look up. Their other values are compared right away, and
+    # only the paths of their differences are formatted, as there are few.
+    stack: list[tuple[Any, ...]] = [(obtained, expected, None, root_tolerance, "")]
+    while stack:
+        obtained, expected, path, tolerance, path_text = stack.pop()
+        if isinstance(obtained, Mapping):
+            children = []
+            for key, value in obtained.items():
+                if key in expected:
+                    children.append((key, value, expected[key]))
+                elif add((path, key), f"obtained {_describe(value)}, not expected"):
+                    return TreeDiff(differences, truncated=True)
+            for key, value in expected.items():
+                if key not in obtained:
+                    if add((path, key), f"expected {_describe(value)}, not obtained"):
+                        return TreeDiff(differences, truncated=True)
+            items: Any = children
+        else:
+            if len(obtained) != len(expected):
+                message = (
+                    f"obtained {_count(len(obtained), 'item')}, "
+                    f"expected {_count(len(expected), 'item')}"
+                )
+                if add(path, message):
+                    return TreeDiff(differences, truncated=True)
+            items = zip(range(len(obtained)), obtained, expected)
+
+        containers: list[tuple[Any, ...]] = []
+        for key, obtained_value, expected_value in items:
+            value_type = type(obtained_value)
+            if value_type is type(expected_value) and value_type in _SCALAR_TYPES:
+                if obtained_value == expected_value:
+                    continue
+            value_tolerance = tolerance
+            value_path_text = ""
+            if tolerances:
+                value_path_text = _join_path(path_text, key)
+                value_tolerance = tolerances.get(value_path_text, tolerance)
+            if (
+                isinstance(obtained_value, Mapping)
+                and isinstance(expected_value, Mapping)
+                or isinstance(obtained_value, list)
+                and isinstance(expected_value, list)
+            ):
+                containers.append(
+                    (
+                        obtained_value,
+                        expected_value,
+                        (path, key),
+                        value_tolerance,
+                        value_path_text,
+                    )
+                )
+                continue
+            message = _scalar_difference(
+                obtained_value, expected_value, value_tolerance
+            )
+            if message is not None and add((path, key), message):
+                return TreeDiff(differences, truncated=True)
+        # Pushed in reverse, so they are compared in order.
+        stack.extend(reversed(containers))
+    return TreeDiff(differences, truncated=False)
@@ -0,0 +1,259 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from pytest_regressions.common import _file_contents_equal
+from pytest_regressions.common import _text_lines_equal
+from pytest_regressions.compression import compress
+from pytest_regressions.compression import COMPRESSIONS
+from pytest_regressions.compression import open_decompressed
+
+
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS))
+def test_compress(tmp_path, compression: str) -> None:
+    contents = b"a: 1\nb: 2\n" * 1000
+    compressed = compress(contents, compression)
+    assert len(compressed) < len(contents)
+    # Regenerated files do not change.
+    assert compress(contents, compression) == compressed
+
+    filename = tmp_path / ("foo.yml" + COMPRESSIONS[compression])
+    filename.write_bytes(compressed)
+    with open_decompressed(filename, compression) as f:
+        assert f.read() == contents
+
+    assert _file_contents_equal(filename, contents, compression)
+    assert not _file_contents_equal(filename, contents[:-1], compression)
+    assert not _file_contents_equal(filename, contents + b"\n", compression)
+    # Not compressed.
+    filename.write_bytes(contents)
+    assert not _file_contents_equal(filename, contents, compression)
+
+
+def test_text_lines_equal(tmp_path) -> None:
+    filename = tmp_path / "foo.txt.gz"
+    text = "a\r\nb\x0cc\n\nd"
+    filename.write_bytes(compress(text.encode(), "gzip"))
+    lines = text.splitlines()
+    assert _text_lines_equal(lines, filename, "gzip", "UTF-8")
+    assert not _text_lines_equal(lines[:-1], filename, "gzip", "UTF-8")
+    assert not _text_lines_equal(lines + [""], filename, "gzip", "UTF-8")
+
+
+def test_data_regression_compression(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        import sys
+
+        def test_1(data_regression) -> None:
+            data_regression.check({"value": sys.testing_value}, compression="gzip")
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 0
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*test_1.yml.gz"])
+    expected = pytester.path / "test_foo" / "test_1.yml.gz"
+    assert gzip.decompress(expected.read_bytes()) == b"value: 0\n"
+    contents = expected.read_bytes()
+
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 1
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*test_1.obtained.yml", "*-value: 0", "*+value: 1"])
+
+    result = pytester.runpytest("--force-regen")
+    result.assert_outcomes(failed=1)
+    assert gzip.decompress(expected.read_bytes()) == b"value: 1\n"
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 0
+    """)
+    result = pytester.runpytest("--force-regen")
+    assert expected.read_bytes() == contents
+
+
+@pytest.mark.parametrize("binary", [True, False])
+def test_file_regression_compression(pytester, binary: bool) -> None:
+    contents = 'b"foo\\n"' if binary else '"foo\\n"'
+    pytester.makepyfile(test_foo=f"""
+        def test_1(file_regression) -> None:
+            file_regression.check({contents}, binary={binary}, compression="bz2")
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    expected = pytester.path / "test_foo" / "test_1.txt.bz2"
+    assert bz2.decompress(expected.read_bytes()).splitlines() == [b"foo"]
+
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+
+    # The check functions also decompress the expected file.
+    expected.write_bytes(bz2.compress(b"bar\n"))
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+
+
+def test_dataframe_regression_compression(pytester) -> None:
+    # In a subprocess, as numpy can not be imported again in the same process.
+    pytester.makepyfile(test_foo="""
+        import sys
+        import pandas as pd
+
+        def test_1(dataframe_regression) -> None:
+            df = pd.DataFrame({"a": [1.0, 2.0, sys.testing_value]})
+            dataframe_regression.check(df)
+
+        def test_2(num_regression) -> None:
+            num_regression.check({"a": [1.0, 2.0, sys.testing_value]})
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 3.0
+    """)
+    result = pytester.runpytest_subprocess("--regressions-compression=xz")
+    result.assert_outcomes(failed=2)
+    for name in ("test_1", "test_2"):
+        expected = pytester.path / "test_foo" / f"{name}.csv.xz"
+        assert lzma.decompress(expected.read_bytes()).splitlines()[-1] == b"2,3"
+
+    result = pytester.runpytest_subprocess("--regressions-compression=xz")
+    result.assert_outcomes(passed=2)
+
+    # Compare the expected files without the fast path.
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 3.0 + 1e-12
+    """)
+    result = pytester.runpytest_subprocess("--regressions-compression=xz")
+    result.assert_outcomes(passed=2)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 4.0
+    """)
+    result = pytester.runpytest_subprocess("--regressions-compression=xz")
+    result.assert_outcomes(failed=2)
+    result.stdout.fnmatch_lines(["*Values are not sufficiently close*"])
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["data_regression", "structural", "file_regression", "dataframe_regression"],
+)
+def test_fullpath_compression(request, tmp_path, name: str) -> None:
+    """
+    With ``fullpath``, the expected file is compressed without changing its extension, and
+    decompressed with the given compression when it is compared.
+    """
+    fullpath = tmp_path / "expected.txt"
+
+    def check(value: int) -> None:
+        kwargs = dict(fullpath=fullpath, compression="gzip")
+        if name == "data_regression":
+            request.getfixturevalue(name).check({"value": value}, **kwargs)
+        elif name == "structural":
+            request.getfixturevalue("data_regression").check(
+                {"value": value}, structural=True, **kwargs
+            )
+        elif name == "file_regression":
+            request.getfixturevalue(name).check(f"value: {value}\n", **kwargs)
+        else:
+            import pandas as pd
+
+            data_frame = pd.DataFrame({"value": [value, 0]})
+            request.getfixturevalue(name).check(data_frame, **kwargs)
+            request.getfixturevalue("num_regression").check(
+                {"value": data_frame["value"].to_numpy()}, **kwargs
+            )
+
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        check(1)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    contents = gzip.decompress(fullpath.read_bytes())
+    check(1)
+    with pytest.raises(AssertionError):
+        check(2)
+    assert gzip.decompress(fullpath.read_bytes()) == contents
+
+
+def test_fullpath_compression_force_regen(pytester, tmp_path) -> None:
+    fullpath = tmp_path / "expected.yml"
+    pytester.makepyfile(test_foo=f"""
+        import sys
+
+        def test_1(data_regression) -> None:
+            data_regression.check(
+                {{"value": sys.testing_value}}, fullpath={str(fullpath)!r}, compression="xz"
+            )
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 0
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 1
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*FILES DIFFER*", "*-value: 0", "*+value: 1"])
+
+    result = pytester.runpytest("--force-regen")
+    result.assert_outcomes(failed=1)
+    assert lzma.decompress(fullpath.read_bytes()) == b"value: 1\n"
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+
+
+def test_compression_session_default(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression) -> None:
+            data_regression.check({"value": 1})
+
+        def test_2(data_regression) -> None:
+            data_regression.check({"value": 1}, compression="none")
+    """)
+    result = pytester.runpytest("--regressions-compression=gzip")
+    result.assert_outcomes(failed=2)
+    assert sorted(x.name for x in pytester.path.joinpath("test_foo").iterdir()) == [
+        "test_1.yml.gz",
+        "test_2.yml",
+    ]
+
+    result = pytester.runpytest("--regressions-compression=gzip")
+    result.assert_outcomes(passed=2)
+    # Without the option the uncompressed file is expected.
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1, failed=1)
+
+
+def test_compression_with_store(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression) -> None:
+            data_regression.check({"value": 1}, compression="gzip")
+    """)
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(failed=1)
+    (blob,) = pytester.path.joinpath("refs/blobs").glob("*/*.yml.gz")
+    assert gzip.decompress(blob.read_bytes()) == b"value: 1\n"
+
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(passed=1)
+
+
+def test_invalid_compression(data_regression) -> None:
+    with pytest.raises(ValueError, match="Invalid compression 'zip'"):
+        data_regression.check({"value": 1}, compression="zip")
@@ -0,0 +1,240 @@
+import io
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pytest_regressions import csv_schema as csv_schema_module
+from pytest_regressions.csv_schema import arrays_schema
+from pytest_regressions.csv_schema import chunk_rows
+from pytest_regressions.csv_schema import csv_schema
+from pytest_regressions.csv_schema import dump_schema
+from pytest_regressions.csv_schema import inferred_schema
+from pytest_regressions.csv_schema import iter_csv
+from pytest_regressions.csv_schema import load_schema
+from pytest_regressions.csv_schema import read_csv
+from pytest_regressions.csv_schema import schema_filename
+from pytest_regressions.csv_writer import arrays_to_csv
+from pytest_regressions.csv_writer import to_csv
+
+
+@pytest.fixture(params=["pyarrow", "c"])
+def parser(request, monkeypatch) -> str:
+    """Read CSV files with the pyarrow parser, or with the one of pandas without it."""
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+    return str(request.param)
+
+
+def _data_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "values": [1.5, 2.5, np.nan],
+            "float32": np.array([0.1, 0.2, 0.3], dtype=np.float32),
+            "codes": ["1.0", "007", ""],
+            "flags": [True, False, True],
+            "types": pd.Categorical(["a", "b", "a"], categories=["b", "a"]),
+            "counts": pd.array([1, None, 3], dtype="Int64"),
+            "dates": pd.date_range("2020-01-01", periods=3),
+        },
+        index=pd.Index([10, 11, 12], name="id"),
+    )
+
+
+def test_schema(tmp_path) -> None:
+    data_frame = _data_frame()
+    schema = csv_schema(data_frame)
+    assert schema is not None
+    assert schema["index_columns"] == 1
+    assert [(x["name"], x["type"]) for x in schema["columns"]] == [
+        ("id", "int64"),
+        ("values", "float64"),
+        ("float32", "float32"),
+        ("codes", str(data_frame["codes"].dtype)),
+        ("flags", "bool"),
+        ("types", {"categories": ["b", "a"], "ordered": False}),
+        ("counts", "Int64"),
+        # Read as strings, as pandas infers them.
+        ("dates", "str"),
+    ]
+
+    filename = tmp_path / "foo.schema.json"
+    filename.write_bytes(dump_schema(schema))
+    assert load_schema(filename) == schema
+    assert json.loads(filename.read_text()) == schema
+    assert load_schema(tmp_path / "missing.schema.json") is None
+    filename.write_text('{"version": 1000}')
+    assert load_schema(filename) is None
+
+    # Column names must be unique in the CSV file.
+    assert csv_schema(pd.DataFrame([[1, 2]], columns=["a", "a"])) is None
+    assert csv_schema(pd.DataFrame([[1, 2]], columns=[1, "1"])) is None
+    columns = pd.MultiIndex.from_tuples([("a", "b"), ("a", "c")])
+    assert csv_schema(pd.DataFrame([[1, 2]], columns=columns)) is None
+
+
+def test_schema_filename(tmp_path) -> None:
+    assert schema_filename(tmp_path / "foo.csv", "") == tmp_path / "foo.schema.json"
+    assert schema_filename(tmp_path / "foo.csv.gz", ".gz") == (
+        tmp_path / "foo.schema.json"
+    )
+    assert schema_filename(tmp_path / "foo.obtained.csv", ".gz") == (
+        tmp_path / "foo.obtained.schema.json"
+    )
+
+
+def test_read_csv(parser, tmp_path) -> None:
+    data_frame = _data_frame()
+    schema = csv_schema(data_frame)
+    assert schema is not None
+    contents = to_csv(data_frame).encode()
+    filename = tmp_path / "foo.csv"
+    filename.write_bytes(contents)
+
+    expected = data_frame.reset_index()
+    expected["codes"] = expected["codes"].replace("", np.nan)
+    expected["dates"] = expected["dates"].astype(str)
+    for source in (contents, filename):
+        read = read_csv(source, schema)
+        pd.testing.assert_frame_equal(read, expected, check_dtype=False)
+        assert list(read.dtypes.astype(str)) == [
+            "int64",
+            "float64",
+            "float32",
+            str(data_frame["codes"].dtype),
+            "bool",
+            "category",
+            "Int64",
+            str(data_frame["codes"].dtype),
+        ]
+
+    read = read_csv(filename, schema, columns=["counts", "values", "missing"])
+    assert list(read.columns) == ["id", "values", "counts"]
+
+    # Unnamed columns are named as pandas names them.
+    data_frame = pd.DataFrame({"a": [1.5], "": [2.5]})
+    data_frame.index.name = "b"
+    schema = csv_schema(data_frame)
+    assert schema is not None
+    read = read_csv(to_csv(data_frame).encode(), schema)
+    assert list(read.columns) == ["b", "a", "Unnamed: 2"]
+
+
+def test_read_csv_not_matching_schema(parser) -> None:
+    data_frame = pd.DataFrame({"a": [1.5, 2.5], "b": [1, 2]})
+    schema = csv_schema(data_frame)
+    assert schema is not None
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        read_csv(b",a,b\n0,1.5,1.5\n1,2.5,2.5\n", schema)
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        read_csv(b",a,b,c\n0,1.5,1,x\n1,2.5,2,y\n", schema)
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        read_csv(b",a\n0,1.5\n1,2.5\n", schema)
+    # Other columns are ignored when only some are read.
+    read = read_csv(b",a,b,c\n0,1.5,1,x\n1,2.5,2,y\n", schema, columns=["a"])
+    assert list(read.columns) == ["Unnamed: 0", "a"]
+
+
+def test_iter_csv(parser) -> None:
+    data_frame = pd.concat([_data_frame().drop(columns=["dates"])] * 10)
+    schema = csv_schema(data_frame)
+    assert schema is not None
+    contents = to_csv(data_frame).encode()
+
+    chunks = list(iter_csv(contents, schema, 7))
+    assert [len(x) for x in chunks] == [7, 7, 7, 7, 2]
+    for chunk in chunks:
+        assert chunk.index.equals(pd.RangeIndex(len(chunk)))
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True), read_csv(contents, schema)
+    )
+
+    chunks = list(iter_csv(contents, schema, 7, columns=["values"]))
+    assert list(chunks[0].columns) == ["id", "values"]
+
+    # Files without rows have an empty chunk.
+    chunks = list(iter_csv(to_csv(data_frame.iloc[:0]).encode(), schema, 7))
+    assert len(chunks) == 1
+    assert len(chunks[0]) == 0
+
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        list(iter_csv(contents.replace(b"2.5", b"x"), schema, 7))
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        list(iter_csv(b",a\n0,1.5\n", schema, 7))
+
+
+def test_inferred_schema() -> None:
+    data_frame = pd.DataFrame(
+        {
+            "values": [1.0, 2.0, 3.0, 4.5, np.nan],
+            "counts": [1, 2, 3, 4, 5],
+            "names": ["a", "b", "c", "d", "e"],
+            "flags": [True, False, True, False, True],
+        }
+    )
+    contents = to_csv(data_frame).encode()
+    schema = inferred_schema(contents, 3)
+    assert schema["index_columns"] == 0
+    assert [(x["name"], x["type"]) for x in schema["columns"]] == [
+        ("", "float64"),
+        ("values", "float64"),
+        ("counts", "float64"),
+        ("names", str(pd.read_csv(io.BytesIO(contents))["names"].dtype)),
+        ("flags", "bool"),
+    ]
+    # Read in chunks as pandas reads the whole file, but with floats for integers.
+    pd.testing.assert_frame_equal(
+        pd.concat(iter_csv(contents, schema, 3), ignore_index=True),
+        pd.read_csv(io.BytesIO(contents)).astype(
+            {"Unnamed: 0": float, "counts": float}
+        ),
+    )
+    # Types which do not fit the next rows.
+    with pytest.raises(ValueError, match="CSV file does not match its schema"):
+        list(iter_csv(contents.replace(b"4.5", b"x"), schema, 3))
+
+
+def test_chunk_rows(monkeypatch) -> None:
+    monkeypatch.setattr(csv_schema_module, "CHUNK_BYTES", 100)
+    assert chunk_rows(b",a\n" + b"0,1.25\n" * 100) == 14
+    assert chunk_rows(b",a\n" + b"0,1.25" * 100 + b"\n") == 1
+    assert chunk_rows(b"") == 100
+
+
+def test_arrays_schema(parser) -> None:
+    arrays = {
+        "floats": np.array([0.5, 1.5, 2.5]),
+        "ints": np.arange(2, dtype=np.int32),
+        "matrix": np.array([[True, False]]),
+    }
+    index = np.arange(3)
+    schema = arrays_schema(arrays, index)
+    assert schema is not None
+    assert schema["index_columns"] == 1
+    assert schema["columns"] == [
+        {"name": "", "type": "int64"},
+        {"name": "floats", "type": "float64"},
+        {"name": "ints", "type": "int32", "length": 2},
+        {"name": "matrix[0]", "type": "bool", "length": 1},
+        {"name": "matrix[1]", "type": "bool", "length": 1},
+    ]
+
+    # The shorter arrays are read as nullable arrays, with their missing values.
+    read = read_csv(arrays_to_csv(arrays, index).encode(), schema)
+    assert list(read.dtypes.astype(str)) == [
+        "int64",
+        "float64",
+        "Int32",
+        "boolean",
+        "boolean",
+    ]
+    assert read["ints"].tolist() == [0, 1, pd.NA]
+    assert read["matrix[0]"].tolist() == [True, pd.NA, pd.NA]
+
+    assert (
+        arrays_schema({"a[0]": arrays["floats"], "a": np.ones((3, 1))}, index) is None
+    )
@@ -0,0 +1,115 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pytest_regressions import csv_writer
+from pytest_regressions.csv_writer import array_column_names
+from pytest_regressions.csv_writer import arrays_to_csv
+from pytest_regressions.csv_writer import format_floats
+from pytest_regressions.csv_writer import to_csv
+
+
+def _expected_text(value: float) -> str:
+    if np.isnan(value):
+        return ""
+    return repr(value).removesuffix(".0")
+
+
+def test_format_floats() -> None:
+    special = [0.0, -0.0, 3.0, -7.0, 0.1, 1e-5, 1e15, 1e16, 2.0**53, 9999999999999998.0]
+    special += [1e300, 5e-324, np.inf, -np.inf, np.nan, np.finfo(float).max]
+    rng = np.random.default_rng(0)
+    random_bits = rng.integers(0, 2**64, 10_000, dtype=np.uint64).view(np.float64)
+    values = np.concatenate(
+        [special, random_bits, rng.random(1000).round(3), np.float32(rng.random(1000))]
+    )
+    assert format_floats(values) == [_expected_text(x) for x in values.tolist()]
+    assert format_floats(np.array([])) == []
+
+
+def _read(contents: str) -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(contents), float_precision="round_trip", index_col=0)
+
+
+def test_numeric_data_frame(monkeypatch) -> None:
+    # Several chunks of rows.
+    monkeypatch.setattr(csv_writer, "CHUNK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    data_frame = pd.DataFrame(
+        {
+            "floats": rng.random(50),
+            "with nan": np.where(np.arange(50) % 3, rng.normal(size=50), np.nan),
+            "ints": np.arange(50),
+            "bools": np.arange(50) % 2 == 0,
+        },
+        index=pd.Index(np.arange(50) * 2, name="index"),
+    )
+    contents = to_csv(data_frame)
+    pd.testing.assert_frame_equal(_read(contents), data_frame)
+
+    # Same text as pandas, but for floats.
+    expected = data_frame.to_csv(float_format="%.17g")
+    assert contents.splitlines()[0] == expected.splitlines()[0]
+    assert contents.count("\n") == expected.count("\n")
+    assert contents.splitlines()[1].startswith("0,0.6369616873214543,,0,True")
+
+    assert to_csv(data_frame.iloc[:0]) == data_frame.iloc[:0].to_csv()
+
+
+def test_other_data_frames() -> None:
+    """Data frames with other types of data are written by pandas."""
+    data_frame = pd.DataFrame(
+        {
+            "floats": [0.1, 2.0, np.nan],
+            "strings": ["a", "b,c", ""],
+            "dates": pd.to_datetime(["2020-01-01", "2021-02-03", "2022-04-05"]),
+        },
+        index=pd.MultiIndex.from_tuples([("a", 1), ("a", 2), ("b", 1)]),
+    )
+    contents = to_csv(data_frame)
+    assert contents == data_frame.to_csv().replace(",2.0,", ",2,")
+
+    data_frame = pd.DataFrame({"floats": [1.0, 1 / 3]}, index=["x", "y"])
+    assert to_csv(data_frame).splitlines() == [",floats", "x,1", "y,0.3333333333333333"]
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_round_trip(dtype) -> None:
+    values = np.random.default_rng(0).normal(size=1000).astype(dtype)
+    data_frame = pd.DataFrame({"values": values})
+    read = _read(to_csv(data_frame))["values"].to_numpy()
+    np.testing.assert_array_equal(read.astype(dtype), values)
+
+
+def test_arrays_to_csv(monkeypatch) -> None:
+    # Several chunks of rows.
+    monkeypatch.setattr(csv_writer, "CHUNK_ROWS", 3)
+    arrays = {
+        "floats": np.linspace(0.0, 1.0, 10),
+        "ints": np.arange(4),
+        "matrix": np.arange(14).reshape((7, 2)) % 3 == 0,
+    }
+    index = np.arange(10) * 2
+    assert array_column_names("ints", arrays["ints"]) == ["ints"]
+    assert array_column_names("matrix", arrays["matrix"]) == ["matrix[0]", "matrix[1]"]
+
+    # As the data frame with the shorter arrays padded with missing values.
+    data_frame = pd.DataFrame(
+        {
+            "floats": pd.Series(arrays["floats"]),
+            "ints": pd.Series(arrays["ints"]),
+            "matrix[0]": pd.Series(arrays["matrix"][:, 0]),
+            "matrix[1]": pd.Series(arrays["matrix"][:, 1]),
+        }
+    ).set_axis(index)
+    contents = arrays_to_csv(arrays, index)
+    assert contents == to_csv(data_frame)
+    assert contents.splitlines()[:2] == [
+        ",floats,ints,matrix[0],matrix[1]",
+        "0,0,0,True,False",
+    ]
+    assert contents.splitlines()[-1] == "18,1,,,"
+
+    assert arrays_to_csv(arrays, index[:0]) == ",floats,ints,matrix[0],matrix[1]\n"
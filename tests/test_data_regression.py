@@ -1,10 +1,17 @@
+import datetime
+import importlib
+import io
 import sys
 from textwrap import dedent
 
 import pytest
 import yaml
 
+from pytest_regressions.compression import compress
+from pytest_regressions.data_regression import _emitted_alike
 from pytest_regressions.data_regression import DataRegressionFixture
+from pytest_regressions.data_regression import dump_yaml
+from pytest_regressions.data_regression import RegressionYamlDumper
 from pytest_regressions.testing import check_regression_fixture_workflow
 
 
@@ -257,3 +264,260 @@ def test_regen_all(pytester, tmp_path):
         "test_2_a.yml",
         "test_2_b.yml",
     }
+
+
+def test_skips_obtained_write_on_match(
+    data_regression: DataRegressionFixture, lazy_datadir, tmp_path
+) -> None:
+    """When the dumped YAML matches the expected file byte by byte, the check passes
+    without writing the ``.obtained`` file.
+    """
+    golden = tmp_path / "golden.yml"
+    golden.write_text("contents: Foo\nvalue: 11\n", newline="")
+    obtained = lazy_datadir / "test_skips_obtained_write_on_match.obtained.yml"
+
+    data_regression.check({"contents": "Foo", "value": 11}, fullpath=golden)
+    assert not obtained.exists()
+
+    with pytest.raises(AssertionError, match="FILES DIFFER"):
+        data_regression.check({"contents": "Foo", "value": 12}, fullpath=golden)
+    assert obtained.exists()
+
+
+def test_structural(
+    data_regression: DataRegressionFixture, lazy_datadir, tmp_path, monkeypatch
+) -> None:
+    """With ``structural``, the data is compared as trees and its differences are
+    reported by key path.
+    """
+    golden = tmp_path / "golden.yml"
+    golden.write_text(
+        "config:\n  name: foo\n  values:\n  - 1\n  - 2.5\n  - 3.0\nid: 1\n", newline=""
+    )
+    obtained = lazy_datadir / "test_structural.obtained.yml"
+
+    # Formatting and order of the keys do not matter.
+    data = {"id": 1, "config": {"values": [1.0, 2.5, 3], "name": "foo"}}
+    data_regression.check(data, fullpath=golden, structural=True)
+    assert not obtained.exists()
+    with pytest.raises(AssertionError, match="FILES DIFFER"):
+        data_regression.check(data, fullpath=golden)
+
+    data = {"config": {"name": "bar", "values": [1, 2.5, 3.5, 4]}, "extra": [1]}
+    with pytest.raises(AssertionError) as excinfo:
+        data_regression.check(data, fullpath=golden, structural=True)
+    assert obtained.exists()
+    assert str(excinfo.value).splitlines() == [
+        "DATA DIFFERS:",
+        str(golden),
+        str(obtained),
+        "extra: obtained a sequence of 1 item, not expected",
+        "id: expected 1, not obtained",
+        "config.name: obtained 'bar', expected 'foo'",
+        "config.values: obtained 4 items, expected 3 items",
+        "config.values[2]: obtained 3.5, expected 3.0 (difference: 0.5)",
+        "To update values, use --force-regen option.",
+    ]
+
+    monkeypatch.setattr(DataRegressionFixture, "THRESHOLD", 2)
+    with pytest.raises(AssertionError) as excinfo:
+        data_regression.check(data, fullpath=golden, structural=True)
+    assert str(excinfo.value).splitlines()[3:] == [
+        "extra: obtained a sequence of 1 item, not expected",
+        "id: expected 1, not obtained",
+        "Only showing the first 2 differences.",
+        "To update values, use --force-regen option.",
+    ]
+
+
+def test_structural_tolerances(
+    data_regression: DataRegressionFixture, tmp_path
+) -> None:
+    """Numbers within their tolerances are equal, in compressed expected files too."""
+    golden = tmp_path / "golden.yml.gz"
+    golden.write_bytes(compress(b"a:\n- 1.0\n- 2.0\nb: 1.0\n", "gzip"))
+    data = {"a": [1.01, 2.01], "b": 1.001}
+
+    kwargs = dict(fullpath=golden, compression="gzip")
+    data_regression.check(
+        data,
+        tolerances={"a": dict(atol=0.02)},
+        default_tolerance=dict(rtol=0.01),
+        **kwargs,
+    )
+    data_regression.check(data, default_tolerance=dict(atol=0.02), **kwargs)
+    with pytest.raises(AssertionError, match=r"\nb: obtained 1.001, expected 1.0 "):
+        data_regression.check(data, tolerances={"a": dict(atol=0.02)}, **kwargs)
+
+
+def test_obtained_dir(pytester, tmp_path) -> None:
+    """``--regressions-obtained-dir`` redirects obtained files (and HTML diffs) of failed
+    checks, mirroring the data directory layout.
+    """
+    source = """
+        import sys
+        def test_1(data_regression) -> None:
+            data_regression.check({"value": sys.testing_value})
+    """
+    pytester.makepyfile(test_foo=source)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 1
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 2
+    """)
+    obtained_dir = tmp_path / "obtained"
+    result = pytester.runpytest(f"--regressions-obtained-dir={obtained_dir}")
+    result.assert_outcomes(failed=1)
+    assert {x.name for x in obtained_dir.joinpath("test_foo").iterdir()} == {
+        "test_1.obtained.yml",
+        "test_1.obtained.diff.html",
+    }
+
+
+def test_read_in_place(pytester) -> None:
+    """``--regressions-read-in-place`` reads expected files without copying them, and still
+    writes obtained files into the temporary data directory.
+    """
+    pytester.makepyfile(test_foo="""
+        import sys
+
+        def test_1(data_regression, lazy_datadir) -> None:
+            try:
+                data_regression.check({"value": sys.testing_value})
+            finally:
+                # HTML diffs are written in the background, so they may not exist yet.
+                sys.tmp_files = sorted(
+                    x.name
+                    for x in lazy_datadir.tmp_path.iterdir()
+                    if not x.name.endswith(".diff.html")
+                )
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 1
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+
+    result = pytester.inline_run("--regressions-read-in-place")
+    result.assertoutcome(passed=1)
+    assert sys.tmp_files == []  # type: ignore[attr-defined]
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 2
+    """)
+    result = pytester.inline_run("--regressions-read-in-place")
+    result.assertoutcome(failed=1)
+    assert sys.tmp_files == ["test_1.obtained.yml"]  # type: ignore[attr-defined]
+    assert {x.name for x in pytester.path.joinpath("test_foo").iterdir()} == {
+        "test_1.yml"
+    }
+
+
+class _Tagged:
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+@pytest.mark.parametrize(
+    "data, emitted_alike",
+    [
+        (
+            {
+                "name": "Foo: bar",
+                "text": "word " * 50 + "'quoted' and #hashed",
+                "values": [1, 1.5, -0.0, float("inf"), None, True, "null", "1.5"],
+                "nested": {"empty": {}, "list": [], "accents": "éü中", 10: "ten"},
+                "date": datetime.date(2020, 1, 2),
+                "k" * 120: 1,
+            },
+            True,
+        ),
+        ({"lines": "first\nsecond " + "word " * 30}, False),
+        ({"tabs": "\t" + "word " * 30}, False),
+        ({"emoji": "\U0001f600"}, False),
+        ({"": "empty key"}, False),
+        ({"k" * 121: "long key"}, False),
+        ({"é" * 31: "long key"}, False),
+        ({"tagged": _Tagged("")}, False),
+        ({"bytes": b"\x00\x01" * 50}, False),
+    ],
+)
+def test_dump_yaml(monkeypatch, data, emitted_alike: bool) -> None:
+    """
+    Documents are written as by the pure Python dumper, by libyaml when they are emitted
+    alike.
+    """
+    yaml.add_representer(
+        _Tagged,
+        lambda dumper, x: dumper.represent_scalar("!tagged", x.value),
+        Dumper=RegressionYamlDumper,
+    )
+    expected = yaml.dump_all(
+        [data],
+        Dumper=RegressionYamlDumper,
+        default_flow_style=False,
+        allow_unicode=True,
+        indent=2,
+        encoding="utf-8",
+    )
+    for with_libyaml in (yaml.__with_libyaml__, False):
+        monkeypatch.setattr(yaml, "__with_libyaml__", with_libyaml)
+        stream = io.BytesIO()
+        dump_yaml(data, stream)
+        assert stream.getvalue() == expected
+    node = RegressionYamlDumper(io.BytesIO()).represent_data(data)
+    assert _emitted_alike(node) == emitted_alike
+
+
+class _Upper:
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+def test_dump_yaml_safe_dumper_representers(monkeypatch) -> None:
+    """
+    Representers registered with ``yaml.SafeDumper`` after the import of the plugin are
+    used too.
+    """
+    # As imported: with no representers registered with ``RegressionYamlDumper`` itself,
+    # which makes PyYAML copy the registry of ``yaml.SafeDumper`` into it.
+    monkeypatch.delattr(RegressionYamlDumper, "yaml_representers", raising=False)
+    monkeypatch.setattr(
+        yaml.SafeDumper, "yaml_representers", dict(yaml.SafeDumper.yaml_representers)
+    )
+    yaml.add_representer(
+        _Upper,
+        lambda dumper, x: dumper.represent_str(x.value.upper()),
+        Dumper=yaml.SafeDumper,
+    )
+    for with_libyaml in (yaml.__with_libyaml__, False):
+        monkeypatch.setattr(yaml, "__with_libyaml__", with_libyaml)
+        stream = io.BytesIO()
+        dump_yaml({"tagged": _Upper("foo")}, stream)
+        assert stream.getvalue() == b"tagged: FOO\n"
+
+
+def test_yaml_imported_again(monkeypatch) -> None:
+    """
+    Documents are written and read after ``yaml`` is imported again, as by the inline runs
+    of ``pytester``, whose node classes libyaml does not handle.
+    """
+    for name in list(sys.modules):
+        if name.split(".")[0] == "yaml" or name == "pytest_regressions.data_regression":
+            monkeypatch.delitem(sys.modules, name)
+    data_regression = importlib.import_module("pytest_regressions.data_regression")
+    assert data_regression.yaml is not yaml
+    stream = io.BytesIO()
+    data_regression.dump_yaml({"a": [1, 2.5]}, stream)
+    assert stream.getvalue() == b"a:\n- 1\n- 2.5\n"
+    assert data_regression.load_yaml(stream.getvalue()) == {"a": [1, 2.5]}
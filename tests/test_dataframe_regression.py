@@ -1,4 +1,6 @@
+import json
 import sys
+import warnings
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -305,3 +307,533 @@ def test_categorical(dataframe_regression: DataFrameRegressionFixture) -> None:
 
     df = pd.DataFrame.from_dict({"types": types})
     dataframe_regression.check(df)
+
+
+def test_obtained_written_only_on_failure(
+    dataframe_regression: DataFrameRegressionFixture, lazy_datadir, tmp_path
+):
+    """Data within tolerance is compared in memory, without writing the ``.obtained``
+    file; the file is only written when the check fails.
+    """
+    golden = tmp_path / "golden.csv"
+    golden.write_text(",data\n0,1.0\n1,2.0\n")
+    obtained = lazy_datadir / "test_obtained_written_only_on_failure.obtained.csv"
+
+    dataframe_regression.check(
+        pd.DataFrame({"data": [1.0, 2.0 + 1e-12]}), fullpath=golden
+    )
+    assert not obtained.exists()
+
+    with pytest.raises(AssertionError, match="Values are not sufficiently close"):
+        dataframe_regression.check(pd.DataFrame({"data": [1.0, 3.0]}), fullpath=golden)
+    assert obtained.exists()
+
+
+def test_wide_data_frame(
+    dataframe_regression: DataFrameRegressionFixture, monkeypatch, tmp_path
+) -> None:
+    """Columns of the same types and tolerances are compared together, and only the
+    ones that differ are compared (and reported) one at a time.
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.random((5, 300)), columns=[f"f{i}" for i in range(300)])
+    data["ints"] = np.arange(5)
+    data["bools"] = np.arange(5) % 2 == 0
+    data["strings"] = list("abcde")
+    golden = tmp_path / "golden.csv"
+    golden.write_text(data.to_csv())
+
+    compared = []
+    compare_columns = DataFrameRegressionFixture._compare_columns
+
+    def _compare_columns(self, k, *args):
+        compared.append(k)
+        return compare_columns(self, k, *args)
+
+    monkeypatch.setattr(
+        DataFrameRegressionFixture, "_compare_columns", _compare_columns
+    )
+    changed = data.copy()
+    changed["f1"] += 1e-3
+    changed["f2"] += 1e-3
+    changed.loc[2, "ints"] = 7
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(
+            changed, fullpath=golden, tolerances={"f2": dict(atol=1e-2)}
+        )
+    assert compared == ["f1", "ints", "strings"]
+    obtained_error_msg = str(excinfo.value)
+    assert "f1:" in obtained_error_msg
+    assert "ints:" in obtained_error_msg
+    assert "f2:" not in obtained_error_msg
+    assert "WARNING" not in obtained_error_msg
+
+
+@pytest.mark.parametrize("format", ["parquet", "feather"])
+def test_arrow_formats(
+    dataframe_regression: DataFrameRegressionFixture,
+    request,
+    lazy_datadir,
+    tmp_path,
+    format,
+) -> None:
+    """Parquet and Feather files keep the data types of the columns."""
+    df = pd.DataFrame(
+        {
+            "float32": np.linspace(0, 1, 5, dtype=np.float32),
+            "types": pd.Categorical(["a", "b", "a", "c", "b"]),
+            "names": ["u", "v", "w", "x", "y"],
+            "flags": [True, False, True, False, True],
+            "dates": pd.date_range("2020-01-01", periods=5),
+        },
+        index=[10, 11, 12, 13, 14],
+    )
+    golden = tmp_path / f"golden.{format}"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden, format=format)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    stored = pd.read_parquet(golden) if format == "parquet" else pd.read_feather(golden)
+    pd.testing.assert_frame_equal(stored, df.reset_index())
+
+    dataframe_regression.check(df, fullpath=golden, format=format)
+    obtained = lazy_datadir / f"test_arrow_formats_{format}_.obtained.{format}"
+    assert not obtained.exists()
+
+    # Compared without the fast path.
+    df["float32"] += np.float32(1e-9)
+    dataframe_regression.check(df, fullpath=golden, format=format)
+
+    changed = df.copy()
+    changed.loc[12, "float32"] = 5.0
+    changed["types"] = pd.Categorical(["a", "b", "c", "c", "b"])
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden, format=format)
+    obtained_error_msg = str(excinfo.value)
+    assert "obtained_float32" in obtained_error_msg
+    assert "obtained_types" in obtained_error_msg
+    assert "obtained_names" not in obtained_error_msg
+
+    changed = df.astype({"float32": np.float64, "types": str})
+    with pytest.raises(AssertionError, match="Data type for data types"):
+        dataframe_regression.check(changed, fullpath=golden, format=format)
+
+    changed = df.set_index(df.index + 1)
+    with pytest.raises(AssertionError, match="obtained_index"):
+        dataframe_regression.check(changed, fullpath=golden, format=format)
+
+
+@pytest.mark.parametrize("format", ["csv", "parquet"])
+@pytest.mark.parametrize(
+    "dtype",
+    [
+        "Int64",
+        "Float64",
+        "boolean",
+        "str",
+        "string[python]",
+        "string[pyarrow]",
+        "category",
+    ],
+)
+def test_extension_arrays(
+    dataframe_regression: DataFrameRegressionFixture, request, tmp_path, format, dtype
+) -> None:
+    """Extension arrays keep their type, and missing values only equal missing values."""
+    if dtype == "string[pyarrow]":
+        pytest.importorskip("pyarrow")
+    values, changed = {
+        "Int64": ([1, None, 3, 4], [1, 2, None, 4]),
+        "Float64": ([1.5, None, 3.5, 4.5], [1.5, 2.5, None, 4.5]),
+        "boolean": ([True, None, False, True], [True, False, None, True]),
+    }.get(dtype, (["a", None, "c", "d"], ["a", "b", None, "d"]))
+    df = pd.DataFrame(
+        {"values": pd.Series(values, dtype=dtype), "floats": [0.5, 1.5, 2.5, 3.5]}
+    )
+    golden = tmp_path / f"golden.{format}"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden, format=format)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    # Compared without the fast path.
+    df["floats"] += 1e-12
+    dataframe_regression.check(df, fullpath=golden, format=format)
+
+    df["values"] = pd.Series(changed, dtype=dtype)
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(df, fullpath=golden, format=format)
+    obtained_error_msg = str(excinfo.value)
+    assert "Data type" not in obtained_error_msg
+    assert "Number of differences: 2 / 4 (50.0%)" in obtained_error_msg
+    table = obtained_error_msg.split("values:\n")[1].splitlines()
+    assert [line.split()[0] for line in table[1:3]] == ["1", "2"]
+
+
+@pytest.mark.parametrize("dtype", ["float64[pyarrow]", "int64[pyarrow]"])
+def test_arrow_numeric_csv(
+    dataframe_regression: DataFrameRegressionFixture, request, tmp_path, dtype
+) -> None:
+    """Numeric columns backed by pyarrow are compared as numbers in CSV files."""
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {
+            "values": pd.Series([0.5, 1.5, 2.5, 3.5], dtype="float64[pyarrow]"),
+            "counts": pd.Series([1, None, 3, 4], dtype=dtype),
+        }
+    )
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    df["values"] += 1e-12
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dataframe_regression.check(df, fullpath=golden)
+
+    df.loc[2, "values"] = 3.0
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(df, fullpath=golden)
+    obtained_error_msg = str(excinfo.value)
+    assert "Number of differences: 1 / 4 (25.0%)" in obtained_error_msg
+    assert "?" not in obtained_error_msg
+
+
+def test_categorical_categories(
+    dataframe_regression: DataFrameRegressionFixture, request, tmp_path
+) -> None:
+    """Categorical columns are compared by values, whatever their categories."""
+    df = pd.DataFrame({"types": pd.Categorical(["a", "b", None, "a"])})
+    golden = tmp_path / "golden.parquet"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden, format="parquet")
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    same = pd.Categorical(["a", "b", None, "a"], categories=["c", "b", "a"])
+    dataframe_regression.check(
+        pd.DataFrame({"types": same}), fullpath=golden, format="parquet"
+    )
+
+    changed = pd.Categorical(["a", "c", "b", None], categories=["c", "b", "a"])
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(
+            pd.DataFrame({"types": changed}), fullpath=golden, format="parquet"
+        )
+    assert "Number of differences: 3 / 4 (75.0%)" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_csv_schema(
+    dataframe_regression: DataFrameRegressionFixture,
+    request,
+    lazy_datadir,
+    tmp_path,
+    compression,
+) -> None:
+    """CSV files are read with the data types written to their schema file."""
+    df = pd.DataFrame(
+        {
+            "values": [1.5, 2.5, np.nan],
+            "codes": ["1.0", "007", "x"],
+            "missing": [np.nan] * 3,
+            "types": pd.Categorical(["a", "b", "a"], categories=["b", "a"]),
+            "counts": pd.array([1, None, 3], dtype="Int64"),
+        },
+        index=pd.Index([10, 11, 12], name="id"),
+    )
+    extension = ".csv.gz" if compression else ".csv"
+    golden = tmp_path / f"golden{extension}"
+    with pytest.raises(pytest.fail.Exception, match="golden.schema.json"):
+        dataframe_regression.check(df, fullpath=golden, compression=compression)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    schema = json.loads((tmp_path / "golden.schema.json").read_text())
+    assert schema["index_columns"] == 1
+    assert [(x["name"], x["type"]) for x in schema["columns"]] == [
+        ("id", "int64"),
+        ("values", "float64"),
+        ("codes", str(df["codes"].dtype)),
+        ("missing", "float64"),
+        ("types", {"categories": ["b", "a"], "ordered": False}),
+        ("counts", "Int64"),
+    ]
+
+    # Compared without the fast path.
+    df["values"] += 1e-12
+    dataframe_regression.check(df, fullpath=golden, compression=compression)
+
+    # Strings are compared as strings, not as the numbers they look like.
+    changed = df.assign(codes=["1", "007", "x"])
+    with pytest.raises(AssertionError, match="obtained_codes"):
+        dataframe_regression.check(changed, fullpath=golden, compression=compression)
+    obtained = lazy_datadir / "test_csv_schema_{}_.obtained.schema.json".format(
+        compression
+    )
+    assert json.loads(obtained.read_text()) == schema
+
+    # Only the obtained columns are read from the expected file.
+    dataframe_regression.check(
+        df.drop(columns=["codes"]), fullpath=golden, compression=compression
+    )
+
+
+def test_csv_schema_not_resolved_when_equal(
+    dataframe_regression: DataFrameRegressionFixture, monkeypatch, request, tmp_path
+) -> None:
+    """
+    The schema file is only looked up when the expected file is not the obtained contents.
+    """
+    from pytest_regressions import common
+    from pytest_regressions import dataframe_regression as module
+
+    df = pd.DataFrame({"a": [1.5, 2.5], "b": [1, 2]})
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    resolved = []
+
+    def spy(**kwargs):
+        resolved.append(kwargs["extension"])
+        return common.resolve_check_paths(**kwargs)
+
+    monkeypatch.setattr(module, "resolve_check_paths", spy)
+    dataframe_regression.check(df, fullpath=golden)
+    assert resolved == []
+
+    df["a"] += 1e-12
+    dataframe_regression.check(df, fullpath=golden)
+    assert resolved == [".schema.json"]
+
+
+def test_csv_schema_out_of_date(
+    dataframe_regression: DataFrameRegressionFixture, request, tmp_path
+) -> None:
+    """Files which do not match their schema are read inferring their types."""
+    df = pd.DataFrame({"a": [1.5, 2.5], "b": [1, 2]})
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    # Float values in a column of integers in the schema.
+    golden.write_text(",a,b\n0,1.5,1.5\n1,2.5,2.5\n")
+    dataframe_regression.check(df.assign(b=[1.5, 2.5]), fullpath=golden)
+    with pytest.raises(AssertionError, match="obtained_b"):
+        dataframe_regression.check(df, fullpath=golden)
+
+    # Columns which are not in the schema.
+    golden.write_text(",a,b,c\n0,1.5,1,x\n1,2.5,2,y\n")
+    dataframe_regression.check(df, fullpath=golden)
+    dataframe_regression.check(df.assign(c=["x", "y"]), fullpath=golden)
+
+
+def test_large_differences(
+    dataframe_regression: DataFrameRegressionFixture, request, lazy_datadir, tmp_path
+) -> None:
+    """Only the first differences are reported, and all of them written to a file."""
+    df = pd.DataFrame({"a": np.arange(1000.0), "b": ["x"] * 1000})
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    changed = df.assign(a=df["a"] * 1.5, b=["y"] + ["x"] * 999)
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden)
+    message = str(excinfo.value)
+    assert "Number of differences: 999 / 1000 (99.9%)" in message
+    assert "Only showing first 100 differences." in message
+    assert "Stats for abs(obtained - expected):\n    Max:     499.5\n" in message
+    assert (
+        "Stats for abs(obtained - expected) / abs(expected):\n    Max:     0.5\n"
+        in message
+    )
+    assert "Number of differences: 1 / 1000 (0.1%)" in message
+    assert "[100 rows x 3 columns]" in message
+
+    filename = lazy_datadir / "test_large_differences.obtained.mismatches.npz"
+    assert str(filename) in message
+    with np.load(filename) as mismatches:
+        np.testing.assert_array_equal(mismatches["a.rows"], np.arange(1, 1000))
+        np.testing.assert_array_equal(mismatches["a.obtained"], changed["a"][1:])
+        np.testing.assert_array_equal(mismatches["a.expected"], df["a"][1:])
+        np.testing.assert_array_equal(mismatches["b.rows"], [0])
+        np.testing.assert_array_equal(mismatches["b.obtained"], ["y"])
+        np.testing.assert_array_equal(mismatches["b.expected"], ["x"])
+
+    # Few differences are all reported.
+    changed = df.assign(a=df["a"] + np.arange(1000) % 500 // 499)
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden)
+    message = str(excinfo.value)
+    assert "Number of differences: 2 / 1000 (0.2%)" in message
+    assert "Only showing" not in message
+    assert "written to" not in message
+    assert not filename.exists()
+
+
+def test_chunked_comparison(
+    dataframe_regression: DataFrameRegressionFixture,
+    monkeypatch,
+    request,
+    lazy_datadir,
+    tmp_path,
+) -> None:
+    """Long CSV files with a schema are read and compared in chunks of rows."""
+    from pytest_regressions import csv_schema
+
+    monkeypatch.setattr(csv_schema, "CHUNK_BYTES", 256)
+    monkeypatch.setattr(DataFrameRegressionFixture, "CHUNKED_CSV_SIZE", 0)
+    monkeypatch.setattr(DataFrameRegressionFixture, "THRESHOLD", 5)
+    compared_sizes = []
+    compare_data_frames = DataFrameRegressionFixture._compare_data_frames
+
+    def spy(self, obtained_data, expected_data):
+        compared_sizes.append(len(obtained_data))
+        return compare_data_frames(self, obtained_data, expected_data)
+
+    monkeypatch.setattr(DataFrameRegressionFixture, "_compare_data_frames", spy)
+
+    df = pd.DataFrame(
+        {
+            "values": np.linspace(0.0, 1.0, 100),
+            "counts": np.arange(100),
+            "names": [f"name{i}" for i in range(100)],
+        }
+    )
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    # Equal up to the tolerance, so not equal as bytes.
+    dataframe_regression.check(df.assign(values=df["values"] + 1e-12), fullpath=golden)
+    assert len(compared_sizes) > 2
+    assert sum(compared_sizes) == 100
+
+    changed = df.copy()
+    changed.loc[[3, 95], "values"] += 1.0
+    changed.loc[50, "names"] = "other"
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden)
+    message = str(excinfo.value)
+    assert "Number of differences: 2 / 100 (2.0%)" in message
+    assert "Number of differences: 1 / 100 (1.0%)" in message
+    assert "counts" not in message
+    table = message[message.index("values:") : message.index("names:")]
+    assert [line.split()[0] for line in table.splitlines()[2:4]] == ["3", "95"]
+    assert "\n50          other" in message
+
+    # All the differences are dumped.
+    changed = df.assign(counts=df["counts"] + 1)
+    with pytest.raises(AssertionError, match="Only showing first 5 differences"):
+        dataframe_regression.check(changed, fullpath=golden)
+    filename = lazy_datadir / "test_chunked_comparison.obtained.mismatches.npz"
+    with np.load(filename) as mismatches:
+        np.testing.assert_array_equal(mismatches["counts.rows"], np.arange(100))
+        np.testing.assert_array_equal(mismatches["counts.obtained"], df["counts"] + 1)
+
+    with pytest.raises(AssertionError, match=r"Obtained: \(101,\)\nExpected: \(100,\)"):
+        dataframe_regression.check(pd.concat([df, df.iloc[:1]]), fullpath=golden)
+    with pytest.raises(AssertionError, match=r"Obtained: \(90,\)\nExpected: \(100,\)"):
+        dataframe_regression.check(df.iloc[:90], fullpath=golden)
+
+
+def test_chunked_comparison_without_schema(
+    dataframe_regression: DataFrameRegressionFixture,
+    monkeypatch,
+    request,
+    tmp_path,
+) -> None:
+    """
+    Long CSV files without a schema are read and compared in chunks of rows, with the
+    types inferred from the first chunk, or else whole.
+    """
+    from pytest_regressions import csv_schema
+
+    monkeypatch.setattr(csv_schema, "CHUNK_BYTES", 256)
+    monkeypatch.setattr(DataFrameRegressionFixture, "CHUNKED_CSV_SIZE", 0)
+    compared_sizes = []
+    compare_data_frames = DataFrameRegressionFixture._compare_data_frames
+
+    def spy(self, obtained_data, expected_data):
+        compared_sizes.append(len(obtained_data))
+        return compare_data_frames(self, obtained_data, expected_data)
+
+    monkeypatch.setattr(DataFrameRegressionFixture, "_compare_data_frames", spy)
+
+    # Whole floats in the first chunk, written without decimals.
+    values = np.arange(100.0)
+    values[60:] += 0.5
+    df = pd.DataFrame(
+        {
+            "values": values,
+            "counts": np.arange(100),
+            "codes": [str(i) for i in range(90)] + ["x"] * 10,
+        }
+    )
+    golden = tmp_path / "golden.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df.drop(columns="codes"), fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    tmp_path.joinpath("golden.schema.json").unlink()
+
+    changed = df.drop(columns="codes")
+    changed.loc[80, "values"] += 1e-12
+    dataframe_regression.check(changed, fullpath=golden)
+    assert len(compared_sizes) > 2
+    assert sum(compared_sizes) == 100
+
+    # Differences past the first chunk.
+    changed.loc[95, "values"] += 1.0
+    compared_sizes.clear()
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden)
+    assert len(compared_sizes) > 2
+    message = str(excinfo.value)
+    assert "Number of differences: 1 / 100 (1.0%)" in message
+    assert "\n95 " in message
+
+    # The codes of the first chunk are numbers, but not the next ones.
+    golden = tmp_path / "codes.csv"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        dataframe_regression.check(df, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    tmp_path.joinpath("codes.schema.json").unlink()
+    changed = df.assign(codes=df["codes"].replace({"85": "other"}))
+    compared_sizes.clear()
+    with pytest.raises(AssertionError) as excinfo:
+        dataframe_regression.check(changed, fullpath=golden)
+    assert compared_sizes[-1] == 100
+    message = str(excinfo.value)
+    assert "Number of differences: 1 / 100 (1.0%)" in message
+    assert "other" in message
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_17_digits_reference(
+    dataframe_regression: DataFrameRegressionFixture, monkeypatch, tmp_path, chunked
+) -> None:
+    """
+    Expected files without a schema, written with 17 significant digits before floats were
+    written as ``repr``, still match the same floats exactly.
+    """
+    if chunked:
+        monkeypatch.setattr(DataFrameRegressionFixture, "CHUNKED_CSV_SIZE", 0)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.random(1000), "b": rng.lognormal(0, 20, 1000)})
+    golden = tmp_path / "golden.csv"
+    df.to_csv(golden, float_format="%.17g")
+    dataframe_regression.check(
+        df, fullpath=golden, default_tolerance=dict(atol=0, rtol=0)
+    )
+
+
+def test_invalid_format(dataframe_regression: DataFrameRegressionFixture) -> None:
+    df = pd.DataFrame({"a": [1.0]})
+    with pytest.raises(ValueError, match="Invalid format 'hdf5'"):
+        dataframe_regression.check(df, format="hdf5")
+    with pytest.raises(ValueError, match="only supported by the csv format"):
+        dataframe_regression.check(df, format="parquet", compression="gzip")
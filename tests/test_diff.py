@@ -0,0 +1,84 @@
+import difflib
+import random
+
+import pytest
+
+from pytest_regressions.diff import diff_opcodes
+from pytest_regressions.diff import html_diff
+from pytest_regressions.diff import unified_diff
+
+
+def _apply(a: list[str], b: list[str]) -> list[str]:
+    result = []
+    for tag, i1, i2, j1, j2 in diff_opcodes(a, b):
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            result += a[i1:i2]
+        else:
+            result += b[j1:j2]
+    return result
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_opcodes_reconstruct(seed: int) -> None:
+    rng = random.Random(seed)
+    a = [rng.choice("abcdef") for _ in range(rng.randint(0, 200))]
+    b = list(a)
+    for _ in range(rng.randint(0, 20)):
+        pos = rng.randint(0, len(b))
+        if b and rng.random() < 0.5:
+            del b[pos : pos + rng.randint(1, 5)]
+        else:
+            b[pos:pos] = [rng.choice("abcxyz") for _ in range(rng.randint(1, 5))]
+    assert _apply(a, b) == b
+
+
+def test_matches_difflib() -> None:
+    a = [f"line {i}" for i in range(100)]
+    b = list(a)
+    b[10] = "changed"
+    del b[50:53]
+    b.insert(80, "inserted")
+    diff = unified_diff(a, b, "expected", "obtained")
+    assert diff.lines == list(
+        difflib.unified_diff(a, b, "expected", "obtained", lineterm="")
+    )
+    assert not diff.truncated
+    assert (diff.hunk_count, diff.removed_line_count, diff.added_line_count) == (
+        3,
+        4,
+        2,
+    )
+
+
+def test_max_lines() -> None:
+    a = [f"line {i}" for i in range(1000)]
+    b = [f"new {i}" if i % 100 == 0 else x for i, x in enumerate(a)]
+    full = unified_diff(a, b)
+    assert full.hunk_count == 10 and not full.truncated
+
+    diff = unified_diff(a, b, max_lines=25)
+    assert diff.truncated
+    assert diff.shown_hunk_count == 2
+    assert diff.lines == full.lines[: len(diff.lines)]
+    assert diff.total_line_count == full.total_line_count
+
+
+def test_first_hunk_too_big() -> None:
+    a = [f"line {i}" for i in range(100)]
+    b = [f"new {i}" for i in range(100)]
+    diff = unified_diff(a, b, max_lines=10)
+    assert diff.truncated
+    assert len(diff.lines) == 10
+    assert diff.shown_hunk_count == 1
+    assert (diff.removed_line_count, diff.added_line_count) == (100, 100)
+
+
+def test_html_diff() -> None:
+    a = [f"line {i}" for i in range(100)]
+    b = list(a)
+    b[50] = "<changed>"
+    html = html_diff(a, b, "expected", "obtained")
+    assert '<td class="diff_chg">&lt;changed&gt;</td>' in html
+    assert ">line 45<" in html
+    assert ">line 44<" not in html
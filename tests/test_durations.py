@@ -0,0 +1,70 @@
+import pytest
+
+from pytest_regressions.durations import CheckDurations
+from pytest_regressions.durations import timed
+
+
+def test_durations(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression) -> None:
+            data_regression.check({"a": list(range(1000))})
+
+        def test_2(data_regression) -> None:
+            data_regression.check({"b": 1})
+
+        def test_3(file_regression) -> None:
+            file_regression.check("contents")
+    """)
+    result = pytester.runpytest("--regressions-durations=2")
+    result.assert_outcomes(failed=3)
+    result = pytester.runpytest("--regressions-durations=2")
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        [
+            "*= slowest 2 regression checks =*",
+            "*s data_regression test_foo.py::test_1 (*dump *s*)",
+            "*s * test_foo.py::test_*",
+            "*= regression checks duration by fixture =*",
+            "*s data_regression, 2 checks*",
+            "*s file_regression, 1 check*",
+        ]
+    )
+    output = result.stdout.str()
+    slowest = output.split("slowest 2 regression checks")[1].split("by fixture")[0]
+    assert slowest.count("test_foo.py::") == 2
+
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=3)
+    assert "regression checks" not in result.stdout.str()
+
+
+def test_durations_xdist(pytester) -> None:
+    pytest.importorskip("xdist")
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("value", range(4))
+        def test_1(data_regression, value) -> None:
+            data_regression.check({"a": value})
+    """)
+    result = pytester.runpytest("-n", "2", "--regen-all", "--regressions-durations=0")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        [
+            "*= slowest regression checks =*",
+            "*= regression checks duration by fixture =*",
+            "*s data_regression, 4 checks*",
+        ]
+    )
+
+
+def test_timed_without_check() -> None:
+    # Outside of a timed check, phases are not recorded.
+    with timed("dump"):
+        pass
+
+
+def test_check_durations_total() -> None:
+    durations = CheckDurations("data_regression", "test_foo.py::test_1")
+    durations.phases.update(dump=1.5, compare=0.5)
+    assert durations.total == 2.0
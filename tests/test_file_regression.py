@@ -85,6 +85,41 @@ def test_writes_obtained_on_mismatch(file_regression: FileRegressionFixture, tmp
     assert obtained.exists()
 
 
+def test_large_diff_is_truncated(
+    file_regression: FileRegressionFixture, tmp_path, request
+):
+    """Big diffs show the first hunks and a summary of the whole diff, and the HTML report
+    only shows the changes.
+    """
+    lines = [f"line {i}" for i in range(100_000)]
+    golden = tmp_path / "golden.txt"
+    golden.write_text("\n".join(lines) + "\n", newline="")
+    for i in range(0, 100_000, 1000):
+        lines[i] = f"changed {i}"
+
+    with pytest.raises(AssertionError) as excinfo:
+        file_regression.check(
+            "\n".join(lines) + "\n",
+            extension=".txt",
+            newline="",
+            fullpath=golden,
+            obtained_filename=tmp_path / "golden.obtained.txt",
+        )
+
+    msg = str(excinfo.value)
+    assert "-line 0\n+changed 0" in msg
+    assert (
+        "Diff too big, showing 55 of 100 hunks "
+        "(100 lines removed and 100 lines added in total)." in msg
+    )
+
+    # HTML diffs are rendered in the background.
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    html = (tmp_path / "golden.obtained.diff.html").read_text(encoding="UTF-8")
+    assert "changed 99000" in html
+    assert "line 500<" not in html
+
+
 def test_custom_check_fn_disables_fast_path(
     file_regression: FileRegressionFixture, tmp_path
 ):
@@ -137,3 +172,19 @@ def test_file_regression_workflow(pytester, monkeypatch):
         expected_data_1="foo",
         expected_data_2="foobar",
     )
+
+
+@pytest.mark.parametrize("newline", [None, "", "\n", "\r\n"])
+def test_regen_newline(pytester, newline) -> None:
+    """Regenerated files have the same newlines as the ones written by ``open``."""
+    pytester.makepyfile(test_foo=f"""
+        def test_1(file_regression):
+            file_regression.check("a\\nb\\n", newline={newline!r})
+    """)
+    result = pytester.runpytest("--regen-all")
+    result.assert_outcomes(passed=1)
+    with open(pytester.path / "expected.txt", "w", newline=newline) as f:
+        f.write("a\nb\n")
+    assert (pytester.path / "test_foo/test_1.txt").read_bytes() == (
+        pytester.path / "expected.txt"
+    ).read_bytes()
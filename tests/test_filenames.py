@@ -14,7 +14,8 @@ def test_foo(lazy_datadir, num_regression: NumericRegressionFixture):
     expected_filename = f"{test_foo.__name__}.csv"
     obtained_filename = f"{test_foo.__name__}.obtained.csv"
     assert (lazy_datadir / expected_filename).exists()
-    assert (lazy_datadir / obtained_filename).exists()
+    # The check passes with byte-identical contents, so no obtained file is written.
+    assert not (lazy_datadir / obtained_filename).exists()
 
 
 class TestClass:
@@ -34,7 +35,7 @@ class TestClass:
             f"{TestClass.__name__}_{TestClass.test_foo.__name__}.obtained.csv"
         )
         assert (lazy_datadir / expected_filename).exists()
-        assert (lazy_datadir / obtained_filename).exists()
+        assert not (lazy_datadir / obtained_filename).exists()
 
 
 class TestClassWithIgnoredName:
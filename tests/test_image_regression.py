@@ -87,3 +87,18 @@ def test_image_regression_workflow(pytester, monkeypatch, image_type):
         expected_data_1=get_image("white"),
         expected_data_2=get_image("black"),
     )
+
+
+def test_identical_image_expect_not_equal(
+    image_regression: ImageRegressionFixture, tmp_path
+):
+    """Identical images must not take the byte-identical shortcut when
+    ``expect_equal=False``.
+    """
+    image = Image.new("RGB", (10, 10), "white")
+    golden = tmp_path / "golden.png"
+    image.save(golden, "PNG")
+
+    image_regression.check(image, fullpath=golden)
+    with pytest.raises(AssertionError, match="Difference between images too small"):
+        image_regression.check(image, fullpath=golden, expect_equal=False)
@@ -1,9 +1,11 @@
 import sys
+import zipfile
 
 import numpy as np
 import pytest
 
 from pytest_regressions.ndarrays_regression import NDArraysRegressionFixture
+from pytest_regressions.npz import read_npz
 from pytest_regressions.testing import check_regression_fixture_workflow
 
 
@@ -636,3 +638,233 @@ def test_corrupt_npz(ndarrays_regression: NDArraysRegressionFixture, tmp_path, p
     obtained_error_msg = str(excinfo.value)
     expected = f"NPZ file {fn_npz} could not be loaded. Corrupt file?"
     assert expected in obtained_error_msg
+
+
+def test_dump_is_deterministic(
+    ndarrays_regression: NDArraysRegressionFixture, lazy_datadir, tmp_path
+):
+    """Dumping the same arrays twice produces the same bytes, so an unchanged reference
+    passes without writing the ``.obtained`` file.
+    """
+    data = {"ar1": np.array([2.3, 9.4]), "ar2": np.array([3, 4, 9])}
+    contents = ndarrays_regression._serialize_fn(data)
+    assert ndarrays_regression._serialize_fn(data) == contents
+
+    golden = tmp_path / "golden.npz"
+    golden.write_bytes(contents)
+    loaded = dict(np.load(golden))
+    assert set(loaded) == {"ar1", "ar2"}
+    np.testing.assert_array_equal(loaded["ar2"], data["ar2"])
+
+    ndarrays_regression.check(data, fullpath=golden)
+    obtained = lazy_datadir / "test_dump_is_deterministic.obtained.npz"
+    assert not obtained.exists()
+
+
+def test_stored_codec(
+    ndarrays_regression: NDArraysRegressionFixture, lazy_datadir, tmp_path, monkeypatch
+):
+    """Arrays stored uncompressed are memory-mapped, and compared in chunks."""
+    monkeypatch.setattr(ndarrays_regression, "COMPARE_CHUNK_SIZE", 7)
+    data = {
+        "ar1": np.arange(60, dtype=float).reshape((3, 4, 5)),
+        "ar2": np.asfortranarray(np.arange(30).reshape((5, 6))),
+        "ar3": np.array("foo"),
+        "ar4": np.array([], dtype=float),
+    }
+    golden = tmp_path / "golden.npz"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        ndarrays_regression.check(data, fullpath=golden, codec="stored")
+
+    with zipfile.ZipFile(golden) as archive:
+        assert {x.compress_type for x in archive.infolist()} == {zipfile.ZIP_STORED}
+    with golden.open("rb") as f:
+        loaded = read_npz(f, golden)
+        assert set(loaded) == set(data)
+        for key, array in data.items():
+            assert isinstance(loaded[key], np.memmap)
+            assert loaded[key].dtype == array.dtype
+            np.testing.assert_array_equal(loaded[key], array)
+        del loaded
+
+    ndarrays_regression.check(data, fullpath=golden, codec="stored")
+    # The codec of the expected file does not matter when reading it.
+    ndarrays_regression.check(data, fullpath=golden)
+    obtained = lazy_datadir / "test_stored_codec.obtained.npz"
+    assert not obtained.exists()
+
+    data["ar1"][2, 3, 4] += 1
+    data["ar2"][4, 0] += 1
+    with pytest.raises(AssertionError) as excinfo:
+        ndarrays_regression.check(data, fullpath=golden, codec="stored")
+    obtained_error_msg = str(excinfo.value)
+    assert "      (2, 3, 4)                  60.0                  59.0" in (
+        obtained_error_msg
+    )
+    assert "         (4, 0)                    25                    24" in (
+        obtained_error_msg
+    )
+    with np.load(obtained) as obtained_data:
+        np.testing.assert_array_equal(obtained_data["ar1"], data["ar1"])
+
+
+@pytest.mark.parametrize("codec", ["zlib:1", "bz2", "lzma:9"])
+def test_codec_and_shuffle(
+    ndarrays_regression: NDArraysRegressionFixture, request, tmp_path, codec
+):
+    data: dict[str, np.ndarray] = {
+        "ar1": np.linspace(0.0, 1.0, 1000),
+        "ar2": np.arange(30, dtype=np.int32).reshape((5, 6)),
+        "ar3": np.array(["a", "bcd"]),
+    }
+    golden = tmp_path / "golden.npz"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        ndarrays_regression.check(data, fullpath=golden, codec=codec, shuffle=True)
+
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    with zipfile.ZipFile(golden) as archive:
+        assert len({x.compress_type for x in archive.infolist()}) == 1
+        assert archive.infolist()[0].compress_type != zipfile.ZIP_STORED
+    ndarrays_regression.check(data, fullpath=golden, codec=codec, shuffle=True)
+    ndarrays_regression.check(data, fullpath=golden)
+
+    data["ar1"][10] = 2.0
+    with pytest.raises(AssertionError, match="ar1"):
+        ndarrays_regression.check(data, fullpath=golden, codec=codec, shuffle=True)
+
+
+def test_invalid_codec(ndarrays_regression: NDArraysRegressionFixture):
+    with pytest.raises(ValueError, match="Invalid codec 'zip'"):
+        ndarrays_regression.check({"ar1": np.array([1])}, codec="zip")
+
+
+@pytest.fixture
+def read_keys(monkeypatch) -> list[str]:
+    """Keys of the arrays read from NPZ files."""
+    from pytest_regressions.npz import NpzFile
+
+    read_keys = []
+    getitem = NpzFile.__getitem__
+
+    def record_getitem(self, key):
+        read_keys.append(key)
+        return getitem(self, key)
+
+    monkeypatch.setattr(NpzFile, "__getitem__", record_getitem)
+    return read_keys
+
+
+def test_headers_checked_before_reading(
+    ndarrays_regression: NDArraysRegressionFixture, request, tmp_path, read_keys
+):
+    data = {
+        "ar1": np.arange(10.0),
+        "ar2": np.arange(20),
+        "ar3": np.arange(30.0),
+    }
+    golden = tmp_path / "golden.npz"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        ndarrays_regression.check(data, fullpath=golden)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    data["ar1"] = data["ar1"] + 1
+    data["ar3"] = np.arange(31.0)
+    with pytest.raises(AssertionError, match="Shapes are not the same"):
+        ndarrays_regression.check(data, fullpath=golden)
+    data["ar3"] = np.arange(30, dtype=np.int8) > 0
+    with pytest.raises(AssertionError, match="Data types are not the same"):
+        ndarrays_regression.check(data, fullpath=golden)
+    del data["ar3"]
+    with pytest.raises(AssertionError, match="Missing from obtained: \\['ar3'\\]"):
+        ndarrays_regression.check(data, fullpath=golden)
+    assert read_keys == []
+
+    data["ar3"] = np.arange(30.0)
+    with pytest.raises(AssertionError, match="ar1"):
+        ndarrays_regression.check(data, fullpath=golden)
+    assert read_keys == ["ar1", "ar2", "ar3"]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "stored"])
+def test_keys(
+    ndarrays_regression: NDArraysRegressionFixture,
+    request,
+    tmp_path,
+    read_keys,
+    codec,
+):
+    data = {
+        "ar1": np.arange(10.0),
+        "ar2": np.arange(20),
+        "ar3": np.arange(30.0),
+    }
+    golden = tmp_path / "golden.npz"
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        ndarrays_regression.check(data, fullpath=golden, codec=codec)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+
+    # Other arrays are neither compared nor read.
+    ndarrays_regression.check(
+        {"ar2": np.arange(20), "ar4": np.arange(5)},
+        fullpath=golden,
+        codec=codec,
+        keys=["ar2"],
+    )
+    assert read_keys == ["ar2"]
+
+    with pytest.raises(AssertionError, match="ar2"):
+        ndarrays_regression.check(
+            {"ar2": np.arange(1, 21)}, fullpath=golden, codec=codec, keys=["ar2"]
+        )
+    with pytest.raises(AssertionError, match="New in obtained: \\['ar4'\\]"):
+        ndarrays_regression.check(
+            {"ar4": np.arange(5)}, fullpath=golden, codec=codec, keys=["ar4"]
+        )
+    with pytest.raises(ValueError, match="Keys to compare not in the dictionary"):
+        ndarrays_regression.check(
+            {"ar1": np.arange(10.0)}, fullpath=golden, codec=codec, keys=["ar2"]
+        )
+
+
+def test_keys_shared_file_regen(pytester) -> None:
+    """
+    An expected file shared by tests checking different keys is not regenerated without
+    the arrays of the other tests.
+    """
+    golden = pytester.path / "shared.npz"
+    np.savez_compressed(golden, a=np.arange(3), b=np.arange(4))
+    pytester.makepyfile(test_shared=f"""
+        import numpy as np
+
+        def test_a(ndarrays_regression):
+            data = {{"a": np.arange(3) + 1}}
+            ndarrays_regression.check(data, fullpath={str(golden)!r}, keys=["a"])
+
+        def test_b(ndarrays_regression):
+            data = {{"b": np.arange(4)}}
+            ndarrays_regression.check(data, fullpath={str(golden)!r}, keys=["b"])
+        """)
+    result = pytester.runpytest("--force-regen")
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(
+        ["*shared.npz not regenerated, as it has arrays which are not in the*: ?'b'?"]
+    )
+    assert "more than once" not in result.stdout.str()
+    with np.load(golden) as npz:
+        assert set(npz) == {"a", "b"}
+        np.testing.assert_array_equal(npz["a"], np.arange(3))
+
+    # Regenerated with all of its arrays.
+    pytester.makepyfile(test_shared=f"""
+        import numpy as np
+
+        def test_a(ndarrays_regression):
+            data = {{"a": np.arange(3) + 1, "b": np.arange(4)}}
+            ndarrays_regression.check(data, fullpath={str(golden)!r}, keys=["a"])
+        """)
+    result = pytester.runpytest("--force-regen")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*regenerating file*"])
+    with np.load(golden) as npz:
+        assert set(npz) == {"a", "b"}
+        np.testing.assert_array_equal(npz["a"], np.arange(3) + 1)
@@ -0,0 +1,138 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from pytest_regressions import npz
+from pytest_regressions.npz import Codec
+from pytest_regressions.npz import NpzFile
+from pytest_regressions.npz import read_npz
+from pytest_regressions.npz import write_npz
+
+
+def _arrays():
+    return {
+        "floats": np.linspace(0.0, 1.0, 1000).reshape((10, 100)),
+        "fortran": np.asfortranarray(np.arange(30, dtype=np.int32).reshape((5, 6))),
+        "strided": np.arange(100, dtype=np.int16)[::3],
+        "scalar": np.array(1.5),
+        "empty": np.array([], dtype=float),
+        "strings": np.array(["a", "bcd", "éf"]),
+        "bools": np.array([True, False, True]),
+        "complex": np.array([1 + 2j, 3 - 4j]),
+    }
+
+
+def _assert_arrays_equal(loaded, arrays):
+    assert list(loaded) == list(arrays)
+    for key, array in arrays.items():
+        assert loaded[key].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[key], array)
+
+
+@pytest.mark.parametrize(
+    "codec", ["stored", "zlib", "zlib:0", "zlib:9", "bz2", "bz2:1", "lzma", "lzma:0"]
+)
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_write_and_read(tmp_path, monkeypatch, codec: str, shuffle: bool) -> None:
+    # Several chunks and shuffled blocks per array.
+    monkeypatch.setattr(npz, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(npz, "SHUFFLE_BLOCK_SIZE", 64)
+    arrays = _arrays()
+
+    buffer = io.BytesIO()
+    write_npz(buffer, arrays, codec=codec, shuffle=shuffle)
+    contents = buffer.getvalue()
+
+    # Regular archives, with the codec recorded in them.
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        assert archive.testzip() is None
+        assert {x.compress_type for x in archive.infolist()} == {
+            Codec.parse(codec).compress_type
+        }
+        assert archive.namelist() == [key + ".npy" for key in arrays]
+
+    _assert_arrays_equal(read_npz(io.BytesIO(contents)), arrays)
+    filename = tmp_path / "arrays.npz"
+    filename.write_bytes(contents)
+    with filename.open("rb") as f:
+        loaded = read_npz(f, filename)
+    _assert_arrays_equal(loaded, arrays)
+    assert isinstance(loaded["floats"], np.memmap) == (
+        codec == "stored" and not shuffle
+    )
+    del loaded
+
+    if not shuffle:
+        with np.load(filename) as loaded_by_numpy:
+            _assert_arrays_equal(dict(loaded_by_numpy), arrays)
+
+    # Writing the same arrays again produces the same bytes.
+    buffer = io.BytesIO()
+    write_npz(buffer, arrays, codec=codec, shuffle=shuffle)
+    assert buffer.getvalue() == contents
+
+
+@pytest.mark.parametrize("codec", ["stored", "bz2"])
+def test_npz_file(codec: str) -> None:
+    arrays = _arrays()
+    buffer = io.BytesIO()
+    write_npz(buffer, arrays, codec=codec, shuffle=True)
+    with NpzFile(buffer) as npz_file:
+        assert list(npz_file) == list(arrays)
+        assert len(npz_file) == len(arrays)
+        for key, array in arrays.items():
+            header = npz_file.header(key)
+            assert header.shape == array.shape
+            assert header.dtype == array.dtype
+            assert header.fortran_order == (key == "fortran")
+        np.testing.assert_array_equal(npz_file["strided"], arrays["strided"])
+        with pytest.raises(KeyError):
+            npz_file["missing"]
+
+
+def test_shuffle_compresses_floats_better() -> None:
+    arrays = {"values": np.linspace(0.0, 1.0, 100_000)}
+    sizes = {}
+    for shuffle in (False, True):
+        buffer = io.BytesIO()
+        write_npz(buffer, arrays, shuffle=shuffle)
+        sizes[shuffle] = len(buffer.getvalue())
+    assert sizes[True] < sizes[False]
+
+
+def test_zip64(monkeypatch) -> None:
+    """Archives too large for the regular ZIP records get ZIP64 ones."""
+    monkeypatch.setattr(npz, "_ZIP64_LIMIT", 100)
+    monkeypatch.setattr(npz, "_ZIP_FILECOUNT_LIMIT", 2)
+    arrays = _arrays()
+    buffer = io.BytesIO()
+    write_npz(buffer, arrays)
+    contents = buffer.getvalue()
+    assert npz._ZIP64_END_RECORD_SIGNATURE in contents
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        assert archive.testzip() is None
+    _assert_arrays_equal(read_npz(io.BytesIO(contents)), arrays)
+
+
+@pytest.mark.parametrize(
+    "codec", ["", "zip", "stored:1", "zlib:", "zlib:10", "zlib:-1", "bz2:0"]
+)
+def test_invalid_codec(codec: str) -> None:
+    with pytest.raises(ValueError, match="Invalid codec"):
+        Codec.parse(codec)
+
+
+def test_max_workers(monkeypatch) -> None:
+    monkeypatch.setattr("os.cpu_count", lambda: 32)
+    assert npz._max_workers(Codec.parse("zlib"), 100) == 32
+    assert npz._max_workers(Codec.parse("zlib"), 3) == 3
+    assert npz._max_workers(Codec.parse("bz2"), 100) == 32
+    # The compressors of the higher LZMA presets need hundreds of MiB each.
+    assert npz._max_workers(Codec.parse("lzma"), 100) == 5
+    assert npz._max_workers(Codec.parse("lzma:9"), 100) == 1
+    total = npz._max_workers(Codec.parse("lzma:7"), 100) * (
+        Codec.parse("lzma:7").compressor_memory
+    )
+    assert total <= npz.COMPRESSORS_MEMORY
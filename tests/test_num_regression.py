@@ -1,3 +1,4 @@
+import json
 import sys
 
 import numpy as np
@@ -164,10 +165,10 @@ def test_different_data_types(num_regression: NumericRegressionFixture, no_regen
 
 
 def test_n_dimensions(num_regression: NumericRegressionFixture, no_regen):
-    data1 = np.ones(shape=(10, 10), dtype=int)
+    data1 = np.ones(shape=(10, 10, 10), dtype=int)
     with pytest.raises(
         AssertionError,
-        match="Only 1D arrays are supported on num_data_regression fixture.",
+        match="Only 1D and 2D arrays are supported on num_data_regression fixture.",
     ):
         num_regression.check({"data1": data1})
 
@@ -227,7 +228,10 @@ def test_fill_different_shape_with_nan_for_non_float_array(
         TypeError,
         match="Checking multiple arrays with different shapes are not supported for non-float arrays",
     ):
-        num_regression.check({"data1": data1, "data2": data2, "data3": data3})
+        # Only in formats other than CSV, whose arrays are filled with NaN.
+        num_regression.check(
+            {"data1": data1, "data2": data2, "data3": data3}, format="feather"
+        )
 
 
 def test_bool_array(num_regression: NumericRegressionFixture, no_regen):
@@ -307,3 +311,161 @@ def test_array_dtype_stored_correctly(num_regression):
     """
     data1 = np.array([1.100001, np.nan, 1.1])
     num_regression.check({"data1": data1})
+
+
+def test_session_dataframe_format(pytester) -> None:
+    # In a subprocess, as numpy can not be imported again in the same process.
+    pytester.makepyfile(test_foo="""
+        import sys
+        import numpy as np
+
+        def test_1(num_regression) -> None:
+            num_regression.check(
+                {"a": np.array([1.0, 2.0, sys.testing_value], dtype=np.float32)}
+            )
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 3.0
+    """)
+    args = ["--regressions-dataframe-format=feather", "--regressions-compression=gzip"]
+    result = pytester.runpytest_subprocess(*args)
+    result.assert_outcomes(failed=1)
+    expected = pytester.path / "test_foo" / "test_1.feather"
+    stored = pd.read_feather(expected)
+    assert stored["a"].dtype == np.float32
+    assert stored["a"].tolist() == [1.0, 2.0, 3.0]
+
+    result = pytester.runpytest_subprocess(*args)
+    result.assert_outcomes(passed=1)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 4.0
+    """)
+    result = pytester.runpytest_subprocess(*args)
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        ["*Values are not sufficiently close*", "*obtained_a*", "*4.0*3.0*1.0"]
+    )
+
+
+def _check_golden(num_regression, request, data_dict, golden, **kwargs) -> None:
+    """Record the golden file of ``data_dict``, and check it against it."""
+    with pytest.raises(pytest.fail.Exception, match="File not found"):
+        num_regression.check(data_dict, fullpath=golden, **kwargs)
+    request.config.pluginmanager.get_plugin("regressions-session").wait()
+    num_regression.check(data_dict, fullpath=golden, **kwargs)
+
+
+def test_ragged_arrays(num_regression: NumericRegressionFixture, request, tmp_path):
+    data_dict = {
+        "ints": np.arange(3),
+        "floats": np.array([0.5, 1.5, 2.5, 3.5, 4.5]),
+        "bools": np.array([True, False]),
+        "matrix": np.arange(8.0).reshape((4, 2)),
+    }
+    golden = tmp_path / "golden.csv"
+    _check_golden(num_regression, request, data_dict, golden)
+    assert golden.read_text().splitlines() == [
+        ",ints,floats,bools,matrix[0],matrix[1]",
+        "0,0,0.5,True,0,1",
+        "1,1,1.5,False,2,3",
+        "2,2,2.5,,4,5",
+        "3,,3.5,,6,7",
+        "4,,4.5,,,",
+    ]
+    schema = json.loads((tmp_path / "golden.schema.json").read_text())
+    assert [x.get("length") for x in schema["columns"]] == [None, 3, None, 2, 4, 4]
+
+    changed = dict(data_dict, ints=np.array([0, 1, 5]))
+    with pytest.raises(AssertionError) as excinfo:
+        num_regression.check(changed, fullpath=golden)
+    assert (
+        "ints:\n   obtained_ints  expected_ints  diff\n2              5              2     3\n"
+        in str(excinfo.value)
+    )
+
+    changed = dict(data_dict, ints=np.arange(4))
+    with pytest.raises(AssertionError, match=r"Obtained: \(4,\)\nExpected: \(3,\)"):
+        num_regression.check(changed, fullpath=golden)
+
+
+@pytest.mark.parametrize("parser", ["pyarrow", "c"])
+def test_exact_floats(
+    num_regression: NumericRegressionFixture, request, tmp_path, monkeypatch, parser
+):
+    """
+    Floats are compared exactly, whether the expected file is parsed exactly (with
+    pyarrow) or not (then the obtained contents are parsed alike).
+    """
+    if parser == "pyarrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+    rng = np.random.default_rng(0)
+    data_dict = {"a": rng.random(1000), "b": rng.lognormal(0, 20, 500)}
+    golden = tmp_path / "golden.csv"
+    _check_golden(num_regression, request, data_dict, golden)
+
+    # Same values, but not the same bytes, so they are parsed.
+    golden.write_bytes(golden.read_bytes().replace(b"\n", b"\r\n"))
+    num_regression.check(
+        data_dict, fullpath=golden, default_tolerance=dict(atol=0, rtol=0)
+    )
+
+
+def test_17_digits_reference(num_regression: NumericRegressionFixture, tmp_path):
+    """
+    Expected files without a schema, written with 17 significant digits before floats were
+    written as ``repr``, still match the same floats exactly.
+    """
+    rng = np.random.default_rng(0)
+    data_dict = {"a": rng.random(1000), "b": rng.lognormal(0, 20, 1000)}
+    golden = tmp_path / "golden.csv"
+    pd.DataFrame(data_dict).to_csv(golden, float_format="%.17g")
+    num_regression.check(
+        data_dict, fullpath=golden, default_tolerance=dict(atol=0, rtol=0)
+    )
+
+
+def test_2d_arrays(num_regression: NumericRegressionFixture, request, tmp_path):
+    matrix = np.linspace(0.0, 1.0, 30).reshape((10, 3))
+    golden = tmp_path / "golden.csv"
+    tolerances = {"matrix": dict(atol=0.01)}
+    _check_golden(num_regression, request, {"matrix": matrix}, golden)
+
+    num_regression.check(
+        {"matrix": matrix + 0.005}, fullpath=golden, tolerances=tolerances
+    )
+    changed = matrix.copy()
+    changed[4, 1] += 0.1
+    with pytest.raises(AssertionError) as excinfo:
+        num_regression.check(
+            {"matrix": changed}, fullpath=golden, tolerances=tolerances
+        )
+    message = str(excinfo.value)
+    assert "matrix[1]:\n" in message
+    assert "matrix[0]:\n" not in message
+    assert "matrix[2]:\n" not in message
+
+    # Columns of 2D arrays can not have the name of other arrays.
+    with pytest.raises(AssertionError, match="must have unique names"):
+        num_regression.check({"matrix": matrix, "matrix[0]": matrix[:, 0]})
+
+
+def test_padded_reference(num_regression: NumericRegressionFixture, tmp_path):
+    """Shorter arrays are compared with references where they are padded with NaN."""
+    golden = tmp_path / "golden.csv"
+    golden.write_text(",a,b\n0,1.5,2\n1,2.5,\n2,3.5,\n")
+    data_dict = {"a": np.array([1.5, 2.5, 3.5]), "b": np.array([2.0])}
+    num_regression.check(data_dict, fullpath=golden)
+
+    # As when they were padded with NaN.
+    data_dict["b"] = np.array([2.0, 3.0])
+    with pytest.raises(AssertionError) as excinfo:
+        num_regression.check(data_dict, fullpath=golden)
+    assert (
+        "b:\n   obtained_b  expected_b  diff\n1         3.0         NaN   NaN\n"
+        in str(excinfo.value)
+    )
@@ -0,0 +1,161 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from pytest_regressions.session import atomic_write
+from pytest_regressions.session import RegressionSession
+
+
+def test_atomic_write(tmp_path) -> None:
+    filename = tmp_path / "sub" / "data.yml"
+    atomic_write(filename, lambda f: f.write_text("a"))
+    assert filename.read_text() == "a"
+
+    def fail(f):
+        f.write_text("partial")
+        raise RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(filename, fail)
+    assert filename.read_text() == "a"
+    assert [x.name for x in filename.parent.iterdir()] == ["data.yml"]
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="POSIX permissions")
+def test_atomic_write_keeps_permissions(tmp_path) -> None:
+    filename = tmp_path / "data.yml"
+    filename.write_text("a")
+    os.chmod(filename, 0o640)
+    atomic_write(filename, lambda f: f.write_text("b"))
+    assert filename.read_text() == "b"
+    assert stat.S_IMODE(filename.stat().st_mode) == 0o640
+
+
+def test_write_file(request, tmp_path) -> None:
+    session = RegressionSession(request.config)
+    try:
+        filename = tmp_path / "data.bin"
+        for i in range(10):
+            session.write_file(filename, b"%d" % i)
+        session.flush(filename)
+        assert filename.read_bytes() == b"9"
+        assert session.conflicting_files() == [str(filename)]
+    finally:
+        session.pytest_unconfigure()
+
+
+def test_write_errors_fail_session(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression, tmp_path) -> None:
+            (tmp_path / "file").touch()
+            data_regression.check({"a": 1}, fullpath=tmp_path / "file" / "data.yml")
+    """)
+    result = pytester.runpytest("--regen-all")
+    result.assert_outcomes(passed=1)
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+    result.stdout.fnmatch_lines(
+        ["*= pytest-regressions =*", "Failed to write files:", "- *file*data.yml: *"]
+    )
+
+
+def test_summary(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("value", [1, 2])
+        def test_1(data_regression, value) -> None:
+            data_regression.check({"a": value}, basename="shared")
+
+        def test_2(data_regression) -> None:
+            data_regression.check({"b": 1})
+    """)
+    result = pytester.runpytest("--regen-all", "-v")
+    result.assert_outcomes(passed=3)
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+    result.stdout.fnmatch_lines(
+        [
+            "*= pytest-regressions =*",
+            "2 files written into data directories",
+            "- *shared.yml",
+            "- *test_2.yml",
+            "Files written more than once with different contents:",
+            "- *shared.yml",
+        ]
+    )
+
+
+def test_xdist(pytester, tmp_path) -> None:
+    pytest.importorskip("xdist")
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("value", range(8))
+        def test_1(data_regression, value) -> None:
+            data_regression.check({"a": value})
+    """)
+    result = pytester.runpytest("-n", "2", "--regen-all")
+    result.assert_outcomes(passed=8)
+    assert result.ret == pytest.ExitCode.OK
+    result.stdout.fnmatch_lines(["8 files written into data directories"])
+
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("value", range(8))
+        def test_1(data_regression, value) -> None:
+            data_regression.check({"a": value + 1})
+    """)
+    obtained_dir = tmp_path / "obtained"
+    result = pytester.runpytest("-n", "2", f"--regressions-obtained-dir={obtained_dir}")
+    result.assert_outcomes(failed=8)
+    obtained = sorted(obtained_dir.glob("*/test_foo/*.obtained.yml"))
+    assert len(obtained) == 8
+    assert {x.parent.parent.name for x in obtained} <= {"gw0", "gw1"}
+
+
+def test_is_file(request, tmp_path, monkeypatch) -> None:
+    (tmp_path / "a.yml").touch()
+    (tmp_path / "sub").mkdir()
+    session = RegressionSession(request.config)
+    try:
+        listed = []
+        scandir = os.scandir
+
+        def scandir_spy(path):
+            listed.append(path)
+            return scandir(path)
+
+        monkeypatch.setattr(os, "scandir", scandir_spy)
+        assert session.is_file(tmp_path / "a.yml")
+        assert not session.is_file(tmp_path / "sub")
+        assert not session.is_file(tmp_path / "b.yml")
+
+        # Files created during the session are found too.
+        (tmp_path / "b.yml").touch()
+        assert session.is_file(tmp_path / "b.yml")
+
+        # Files written by the session are known before they are on disk.
+        session.record_written(tmp_path / "c.yml", b"")
+        assert session.is_file(tmp_path / "c.yml")
+
+        assert listed == [tmp_path]
+    finally:
+        session.pytest_unconfigure()
+
+
+def test_expected_file_removed_during_session(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression) -> None:
+            data_regression.check({"a": 1}, basename="data")
+
+        def test_2(data_regression, original_datadir) -> None:
+            (original_datadir / "data.yml").unlink()
+            data_regression.check({"a": 1}, basename="data")
+    """)
+    result = pytester.runpytest("-k", "test_1")
+    result.assert_outcomes(failed=1)
+    result = pytester.runpytest()
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*File not found in data directory, created:*"])
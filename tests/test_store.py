@@ -0,0 +1,190 @@
+import json
+
+import pytest
+
+from pytest_regressions.store import content_digest
+from pytest_regressions.store import ContentStore
+
+
+def test_content_store(tmp_path) -> None:
+    store = ContentStore(tmp_path / "store", tmp_path)
+    source = tmp_path / "tests" / "test_foo" / "test_1.yml"
+    assert store.key(source) == "tests/test_foo/test_1.yml"
+    assert store.digest(source) is None
+
+    digest = content_digest(b"a: 1\n")
+    store.set(source, digest)
+    assert store.digest(source) == digest
+    assert store.blob_path(digest, ".yml") == (
+        tmp_path / "store" / "blobs" / digest[:2] / (digest + ".yml")
+    )
+
+    # Entries saved by other processes in the meantime are kept.
+    store.index_path.parent.mkdir()
+    store.index_path.write_text(json.dumps({"other.yml": "0" * 64}))
+    assert store.save()
+    assert json.loads(store.index_path.read_text()) == {
+        "other.yml": "0" * 64,
+        "tests/test_foo/test_1.yml": digest,
+    }
+    assert ContentStore(tmp_path / "store", tmp_path).digest(source) == digest
+    assert not store.save()
+
+    # Entries changed again in the session, to other digests, are conflicts.
+    store.set(source, digest)
+    store.merge_updates({"other.yml": "0" * 64})
+    assert store.conflicts == set()
+    store.merge_updates({"other.yml": "1" * 64})
+    assert store.conflicts == {"other.yml"}
+
+
+def test_regression_store(pytester) -> None:
+    pytester.makepyfile(test_foo="""
+        import sys
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_1(data_regression, i) -> None:
+            data_regression.check({"value": sys.testing_value if i == 0 else 0})
+    """)
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 0
+    """)
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(failed=4)
+    assert not pytester.path.joinpath("test_foo").exists()
+
+    index = json.loads(pytester.path.joinpath("refs/index.json").read_text())
+    assert sorted(index) == [f"test_foo/test_1_{i}_.yml" for i in range(4)]
+    assert len(set(index.values())) == 1
+    assert len(list(pytester.path.joinpath("refs/blobs").glob("*/*.yml"))) == 1
+
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(passed=4)
+
+    pytester.makeconftest("""
+        import sys
+        sys.testing_value = 1
+    """)
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(passed=3, failed=1)
+    result.stdout.fnmatch_lines(["*-value: 0", "*+value: 1"])
+
+    result = pytester.runpytest("--regressions-store=refs", "--force-regen")
+    result.assert_outcomes(passed=3, failed=1)
+    index = json.loads(pytester.path.joinpath("refs/index.json").read_text())
+    assert len(set(index.values())) == 2
+    assert len(list(pytester.path.joinpath("refs/blobs").glob("*/*.yml"))) == 2
+
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(passed=4)
+
+
+def test_regression_store_existing_files(pytester) -> None:
+    """Expected files not in the store yet are still used."""
+    pytester.makepyfile(test_foo="""
+        def test_1(data_regression) -> None:
+            data_regression.check({"value": 1})
+    """)
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(passed=1)
+    assert not pytester.path.joinpath("refs").exists()
+
+    result = pytester.runpytest("--regressions-store=refs", "--regen-all")
+    result.assert_outcomes(passed=1)
+    assert json.loads(pytester.path.joinpath("refs/index.json").read_text()) == {
+        "test_foo/test_1.yml": content_digest(b"value: 1\n")
+    }
+
+
+def test_regression_store_xdist(pytester) -> None:
+    pytest.importorskip("xdist")
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(8))
+        def test_1(data_regression, i) -> None:
+            data_regression.check({"value": i % 2})
+    """)
+    result = pytester.runpytest("-n", "2", "--regressions-store=refs")
+    result.assert_outcomes(failed=8)
+    index = json.loads(pytester.path.joinpath("refs/index.json").read_text())
+    assert len(index) == 8
+    assert len(set(index.values())) == 2
+
+    result = pytester.runpytest("-n", "2", "--regressions-store=refs")
+    result.assert_outcomes(passed=8)
+
+
+def test_regression_store_summary(pytester) -> None:
+    """
+    Only the blobs and index written are reported, and expected files mapped to different
+    blobs are conflicts.
+    """
+    pytester.makepyfile(test_foo="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(3))
+        def test_1(data_regression, tmp_path, i) -> None:
+            data_regression.check({"value": 0})
+
+        @pytest.mark.parametrize("i", range(2))
+        def test_2(data_regression, request, i) -> None:
+            fullpath = request.config.rootpath / "shared.yml"
+            data_regression.check({"value": i}, fullpath=fullpath)
+    """)
+    result = pytester.runpytest("--regressions-store=refs", "--force-regen", "-v")
+    result.assert_outcomes(failed=5)
+    digests = {content_digest(f"value: {i}\n".encode()) for i in range(2)}
+    blobs = sorted(
+        str(pytester.path / "refs" / "blobs" / x[:2] / f"{x}.yml") for x in digests
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "3 files written into data directories",
+            f"- {blobs[0]}",
+            f"- {blobs[1]}",
+            f"- {pytester.path / 'refs' / 'index.json'}",
+            "Files written more than once with different contents:",
+            f"- {pytester.path / 'shared.yml'}",
+        ]
+    )
+    assert not pytester.path.joinpath("shared.yml").exists()
+
+
+def test_regression_store_csv_schema(pytester) -> None:
+    """The schema files of CSV files are in the store too."""
+    # Imported before the inline runs, as NumPy can not be imported again.
+    pytest.importorskip("pandas")
+    pytester.makepyfile(test_foo="""
+        import pandas as pd
+
+        def test_1(dataframe_regression) -> None:
+            dataframe_regression.check(pd.DataFrame({"codes": ["007", "1.0"]}))
+    """)
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(failed=1)
+    assert not pytester.path.joinpath("test_foo").exists()
+    index = json.loads(pytester.path.joinpath("refs/index.json").read_text())
+    assert sorted(index) == ["test_foo/test_1.csv", "test_foo/test_1.schema.json"]
+    schema = pytester.path.joinpath(
+        "refs/blobs",
+        index["test_foo/test_1.schema.json"][:2],
+        index["test_foo/test_1.schema.json"] + ".schema.json",
+    )
+    assert '"type": "str"' in schema.read_text()
+
+    # The codes are read as strings with the schema, and not as the numbers they look like.
+    pytester.makepyfile(test_foo="""
+        import pandas as pd
+
+        def test_1(dataframe_regression) -> None:
+            dataframe_regression.check(pd.DataFrame({"codes": ["7", "1"]}))
+    """)
+    result = pytester.runpytest("--regressions-store=refs")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*obtained_codes*"])
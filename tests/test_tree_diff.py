@@ -0,0 +1,104 @@
+from typing import Any
+
+import pytest
+
+from pytest_regressions.tree_diff import format_path
+from pytest_regressions.tree_diff import tree_diff
+
+
+def _differences(*args, **kwargs) -> list[str]:
+    return [str(x) for x in tree_diff(*args, **kwargs).differences]
+
+
+def test_format_path() -> None:
+    assert format_path(()) == ""
+    assert format_path(("config", "values", 3)) == "config.values[3]"
+    assert format_path(("a key", 1, "b-c", "é")) == "['a key'][1].b-c.é"
+    assert format_path(("a.b", "1", None)) == "['a.b']['1'][None]"
+
+
+def test_tree_diff() -> None:
+    expected = {
+        "config": {"name": "foo", "values": [1, 2.5, 3.0], "gone": {"a": 1}},
+        "flags": [True, None],
+        "nan": float("nan"),
+        "same": {"a": [1, {"b": "c"}]},
+    }
+    assert tree_diff(expected, expected).differences == []
+
+    obtained = {
+        "config": {"name": "bar", "values": [1.0, 2.5, 3.5, 4.0], "new": "x" * 100},
+        "flags": [1, None],
+        "nan": float("nan"),
+        "same": {"a": [1, {"b": "c"}]},
+    }
+    assert _differences(obtained, expected) == [
+        "config.new: obtained '" + "x" * 76 + "..., not expected",
+        "config.gone: expected a mapping of 1 key, not obtained",
+        "config.name: obtained 'bar', expected 'foo'",
+        "config.values: obtained 4 items, expected 3 items",
+        "config.values[2]: obtained 3.5, expected 3.0 (difference: 0.5)",
+        "flags[0]: obtained 1, expected True",
+    ]
+
+    assert _differences([1, 2], {"a": 1}) == [
+        "(root): obtained a sequence of 2 items, expected a mapping of 1 key"
+    ]
+    assert _differences({"a": [1]}, {"a": {}}) == [
+        "a: obtained a sequence of 1 item, expected a mapping of 0 keys"
+    ]
+    assert _differences(1, "1") == ["(root): obtained 1, expected '1'"]
+
+
+def test_tolerances() -> None:
+    expected = {"a": {"b": [1.0, 2.0], "c": 1.0}, "d": 1.0}
+    obtained = {"a": {"b": [1.01, 2.01], "c": 1.01}, "d": 1.01}
+    assert len(tree_diff(obtained, expected).differences) == 4
+
+    # Tolerances of subtrees.
+    assert _differences(obtained, expected, tolerances={"a.b": dict(atol=0.02)}) == [
+        "d: obtained 1.01, expected 1.0 (difference: 0.010000000000000009)",
+        "a.c: obtained 1.01, expected 1.0 (difference: 0.010000000000000009)",
+    ]
+    assert _differences(
+        obtained,
+        expected,
+        tolerances={"a": dict(rtol=0.02), "a.c": dict(atol=0.001)},
+        default_tolerance=dict(atol=0.1),
+    ) == ["a.c: obtained 1.01, expected 1.0 (difference: 0.010000000000000009)"]
+    assert (
+        tree_diff(obtained, expected, tolerances={"": dict(atol=0.1)}).differences == []
+    )
+
+    # Only numbers have tolerances.
+    assert _differences(
+        {"a": True, "b": float("inf")},
+        {"a": 1, "b": 1e308},
+        default_tolerance=dict(atol=10),
+    ) == [
+        "a: obtained True, expected 1",
+        "b: obtained inf, expected 1e+308 (difference: inf)",
+    ]
+
+
+@pytest.mark.parametrize("max_differences", [1, 3, 6])
+def test_max_differences(max_differences: int) -> None:
+    obtained = {"a": list(range(4)), "b": {"c": 1, "d": 2}}
+    expected = {"a": list(range(1, 5)), "b": {"c": 0}}
+    diff = tree_diff(obtained, expected, max_differences=max_differences)
+    assert diff.truncated == (max_differences < 6)
+    assert (
+        diff.differences == tree_diff(obtained, expected).differences[:max_differences]
+    )
+
+
+def test_deep_tree() -> None:
+    obtained: dict[str, Any] = {}
+    expected: dict[str, Any] = {}
+    for i in range(10_000):
+        obtained = {"a": obtained, "i": i}
+        expected = {"a": expected, "i": i}
+    expected["a"]["i"] = -1
+    assert _differences(obtained, expected) == [
+        "a.i: obtained 9998, expected -1 (difference: 9999)"
+    ]